@@ -0,0 +1,469 @@
+"""
+TieBreaker benchmarks — time and peak memory of loaders, lookups and dataset build.
+
+Runs against the shipped ``data/`` tree, stores results as JSON and compares two
+runs to flag regressions:
+
+    python benchmarks/bench.py run --suite quick
+    python benchmarks/bench.py compare benchmarks/results/base.json benchmarks/results/new.json
+    python benchmarks/bench.py startup --budget-ms 50
+    python benchmarks/bench.py scaling --max-workers 8
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_ROOT / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import pandas as pd
+
+import build_dataset
+import tiebreaker_cli
+from models import DataHub
+
+QUICK_YEARS = [2022, 2023, 2024]
+SUITES = ("quick", "full")
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+
+
+@dataclass(slots=True)
+class Case:
+    name: str
+    setup: Callable[[Path], Callable[[], Any]]
+    suites: tuple[str, ...]
+    repeat: int
+
+
+CASES: list[Case] = []
+# Scratch directories created by case setups, removed once the case has been measured.
+_SCRATCH = contextlib.ExitStack()
+
+
+def case(name: str, suites: tuple[str, ...] = SUITES, repeat: int = 5) -> Callable:
+    def register(setup: Callable[[Path], Callable[[], Any]]) -> Callable[[Path], Callable[[], Any]]:
+        CASES.append(Case(name=name, setup=setup, suites=suites, repeat=repeat))
+        return setup
+    return register
+
+
+def scratch_dir(prefix: str) -> Path:
+    return Path(_SCRATCH.enter_context(tempfile.TemporaryDirectory(prefix=prefix)))
+
+
+@case("load_players")
+def _load_players(data_root: Path):
+    return lambda: DataHub(data_root).load_players()
+
+
+@case("load_rankings")
+def _load_rankings(data_root: Path):
+    return lambda: DataHub(data_root).load_rankings()
+
+
+@case("load_matches_quick_years")
+def _load_matches_quick(data_root: Path):
+    return lambda: DataHub(data_root).load_matches(years=QUICK_YEARS)
+
+
+@case("load_matches_all_years", suites=("full",), repeat=3)
+def _load_matches_all(data_root: Path):
+    return lambda: DataHub(data_root).load_matches()
+
+
+@case("load_matches_all_years_no_cache", suites=("full",), repeat=3)
+def _load_matches_all_no_cache(data_root: Path):
+    return lambda: DataHub(data_root, cache=False).load_matches()
+
+
+@case("validate_all_years", suites=("full",), repeat=3)
+def _validate_all_years(data_root: Path):
+    import validation
+    hub = DataHub(data_root, validate=False)
+    matches, rankings = hub.load_matches(), hub.load_rankings()
+
+    def call():
+        report = validation.ValidationReport()
+        validation.validate_matches(matches, report)
+        validation.validate_rankings(rankings, report)
+    return call
+
+
+@case("ingest_apply_100_matches")
+def _ingest_apply_100_matches(data_root: Path):
+    import ingest
+    hub = DataHub(data_root)
+    idx, _ = ingest.load_or_build_indexes(hub)
+    new = hub.load_matches(years=[QUICK_YEARS[-1]]).head(100)
+    return lambda: idx.apply_matches(new)
+
+
+@case("doubles_partner_record")
+def _doubles_partner_record(data_root: Path):
+    from doubles import load_index
+    hub = DataHub(data_root)
+    pid = int(load_index(hub).matches["winner1_id"].dropna().iloc[0])
+    return lambda: load_index(hub).partner_record(pid)
+
+
+@case("resolve_player_id")
+def _resolve_player_id(data_root: Path):
+    hub = DataHub(data_root)
+    hub.load_players()
+    names = ["Novak Djokovic", "carlos alcaraz", "Rafael Nadl", "Roger Federer", "Jannik Sinner"]
+    return lambda: [tiebreaker_cli.resolve_player_id(hub, n) for n in names]
+
+
+def _cmd_match_case(data_root: Path, argv: list[str]):
+    args = tiebreaker_cli.build_parser().parse_args(["--data-root", str(data_root), *argv])
+
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return args.func(args, DataHub(data_root))
+    return call
+
+
+@case("cmd_match_year")
+def _cmd_match_year(data_root: Path):
+    return _cmd_match_case(data_root, ["match", "--p1", "Carlos Alcaraz", "--p2", "Novak Djokovic", "--year", "2023"])
+
+
+@case("cmd_match_all_years", suites=("full",), repeat=3)
+def _cmd_match_all_years(data_root: Path):
+    return _cmd_match_case(data_root, ["match", "--p1", "Rafael Nadal", "--p2", "Novak Djokovic", "--all-years"])
+
+
+@case("cmd_match_all_years_jsonl", suites=("full",), repeat=3)
+def _cmd_match_all_years_jsonl(data_root: Path):
+    return _cmd_match_case(data_root, ["match", "--p1", "Rafael Nadal", "--p2", "Novak Djokovic", "--all-years", "--format", "jsonl"])
+
+
+@case("player_profile_read")
+def _player_profile_read(data_root: Path):
+    import profiles
+    hub = DataHub(data_root)
+    if not profiles.profiles_fresh(hub):
+        profiles.build_profiles(hub)
+    return lambda: profiles.load_profile(hub, 104925)
+
+
+@case("features_assemble_year", suites=("full",))
+def _features_assemble_year(data_root: Path):
+    import features
+    store = features.FeatureStore(DataHub(data_root))
+    store.materialize()
+    return lambda: store.assemble(list(features.FEATURE_GROUPS), years=[2024])
+
+
+@case("matchup_grid_top100", suites=("full",))
+def _matchup_grid_top100(data_root: Path):
+    from matchup_grid import GridService
+    service = GridService(DataHub(data_root), cache_size=0)
+    service.warm()
+    return lambda: service.grid("2024-06-01", "Clay", top=100)
+
+
+@case("get_rank_on_or_before")
+def _get_rank_on_or_before(data_root: Path):
+    hub = DataHub(data_root)
+    rankings = build_dataset.prepare_rankings(hub.load_rankings())
+    matches = hub.load_matches(years=QUICK_YEARS).head(1000)
+    queries = list(zip(pd.to_numeric(matches["winner_id"], errors="coerce"), matches["winner_name"], matches["tourney_date"]))
+    build_dataset.get_rank_on_or_before(rankings, None, "", datetime(2023, 1, 1))
+
+    def call():
+        for pid, name, when in queries:
+            build_dataset.get_rank_on_or_before(rankings, int(pid) if pd.notna(pid) else None, name, when)
+    return call
+
+
+def _build_dataset_case(data_root: Path, years: list[int] | None, limit: int | None):
+    out_dir = scratch_dir("tiebreaker_bench_")
+
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return build_dataset.run(
+                data_root=data_root,
+                years=years,
+                include_all_years=years is None,
+                limit=limit,
+                out_path=out_dir / "dataset.parquet",
+            )
+    return call
+
+
+@case("build_dataset_quick_years", repeat=2)
+def _build_dataset_quick(data_root: Path):
+    return _build_dataset_case(data_root, QUICK_YEARS, limit=2000)
+
+
+@case("build_dataset_all_years", suites=("full",), repeat=1)
+def _build_dataset_all(data_root: Path):
+    return _build_dataset_case(data_root, None, limit=None)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    # Peak memory comes from a separate run so tracemalloc overhead stays out of the timings.
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def run_suite(data_root: Path, suite: str, only: list[str] | None = None, repeat: int | None = None) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for c in CASES:
+        if suite not in c.suites or (only and c.name not in only):
+            continue
+        try:
+            results[c.name] = measure(c.setup(data_root), repeat or c.repeat)
+        finally:
+            _SCRATCH.close()
+        r = results[c.name]
+        print(f"{c.name:<28} median {r['median_s'] * 1000:9.1f} ms   min {r['min_s'] * 1000:9.1f} ms   peak {r['peak_mb']:8.1f} MB", flush=True)
+    return {
+        "meta": {
+            "suite": suite,
+            "data_root": str(data_root),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(base: dict[str, Any], new: dict[str, Any], threshold: float, metric: str = "median_s") -> list[str]:
+    """
+    Prints a side-by-side table and returns the names of cases slower (or heavier) than ``threshold``.
+    """
+    regressions = []
+    print(f"{'case':<28} {'base':>10} {'new':>10} {'delta':>8}   {'peak base':>10} {'peak new':>10}")
+    for name, new_r in new["results"].items():
+        base_r = base["results"].get(name)
+        if base_r is None:
+            print(f"{name:<28} {'-':>10} {new_r[metric] * 1000:>8.1f}ms  (nouveau)")
+            continue
+        delta = new_r[metric] / base_r[metric] - 1 if base_r[metric] else 0.0
+        mem_delta = new_r["peak_mb"] / base_r["peak_mb"] - 1 if base_r["peak_mb"] else 0.0
+        flag = ""
+        if delta > threshold or mem_delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<28} {base_r[metric] * 1000:>8.1f}ms {new_r[metric] * 1000:>8.1f}ms {delta:>+7.1%}   {base_r['peak_mb']:>8.1f}MB {new_r['peak_mb']:>8.1f}MB{flag}")
+    return regressions
+
+
+def measure_startup(argv: list[str], runs: int) -> dict[str, Any]:
+    """
+    Wall time of a fresh interpreter running the CLI, plus the slowest imports reported by -X importtime.
+    """
+    cmd = [sys.executable, str(SRC_DIR / "tiebreaker_cli.py"), *argv]
+    subprocess.run(cmd, capture_output=True)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, capture_output=True)
+        times.append(time.perf_counter() - start)
+    trace = subprocess.run([sys.executable, "-X", "importtime", *cmd[1:]], capture_output=True, text=True).stderr
+    imports: list[tuple[int, str]] = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not name.startswith("   "):
+            imports.append((int(cumulative), name.strip()))
+    modules = {name for _, name in imports}
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "imports": sorted(imports, reverse=True)[:10],
+        "heavy_imported": sorted(modules & {"pandas", "numpy", "models", "difflib"}),
+    }
+
+
+def measure_scaling(data_root: Path, years: list[int] | None, max_workers: int, repeat: int) -> dict[str, Any]:
+    """
+    Wall time of ``build_dataset --workers n`` for n = 1..max_workers, plus the in-process build as reference.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="tiebreaker_scaling_") as tmp:
+        for workers in [None, *range(1, max_workers + 1)]:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_dataset.run(data_root=data_root, years=years, include_all_years=years is None, limit=None,
+                                      out_path=Path(tmp) / "dataset.parquet", workers=workers)
+                times.append(time.perf_counter() - start)
+            rows.append({"workers": workers, "median_s": statistics.median(times), "min_s": min(times)})
+    base = next(r for r in rows if r["workers"] == 1)["median_s"]
+    for r in rows:
+        r["speedup"] = base / r["median_s"]
+    return {
+        "meta": {
+            "years": years or "all",
+            "cpu_count": os.cpu_count(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": rows,
+    }
+
+
+def scaling_chart(report: dict[str, Any], width: int = 40) -> list[str]:
+    """
+    Markdown table with a text bar per worker count (speedup relative to --workers 1).
+    """
+    rows = report["results"]
+    top = max(r["speedup"] for r in rows)
+    lines = [
+        f"Scaling build_dataset (années: {report['meta']['years']}, {report['meta']['cpu_count']} CPU)",
+        "",
+        "| workers | médiane | speedup | |",
+        "|---:|---:|---:|:---|",
+    ]
+    for r in rows:
+        label = "in-process" if r["workers"] is None else str(r["workers"])
+        bar = "█" * max(1, round(width * r["speedup"] / top))
+        lines.append(f"| {label} | {r['median_s']:.2f} s | {r['speedup']:.2f}× | `{bar}` |")
+    return lines
+
+
+def write_scaling_png(report: dict[str, Any], path: Path) -> bool:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    rows = [r for r in report["results"] if r["workers"] is not None]
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.plot([r["workers"] for r in rows], [r["speedup"] for r in rows], marker="o", label="mesuré")
+    ax.plot([r["workers"] for r in rows], [r["workers"] for r in rows], linestyle="--", color="grey", label="linéaire")
+    ax.set_xlabel("workers")
+    ax.set_ylabel("speedup vs --workers 1")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return True
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="TieBreaker benchmarks (temps et mémoire par étape)")
+    sp = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sp.add_parser("run", help="Exécuter une suite de benchmarks")
+    p_run.add_argument("--data-root", type=Path, default=REPO_ROOT / "data", help="Racine des données (défaut: data)")
+    p_run.add_argument("--suite", choices=SUITES, default="quick", help="quick: tranches d'années fixes, full: tout l'historique")
+    p_run.add_argument("--only", nargs="*", help="Limiter aux cas nommés")
+    p_run.add_argument("--repeat", type=int, help="Forcer le nombre de répétitions")
+    p_run.add_argument("--out", type=Path, help="Fichier JSON de résultats (défaut: benchmarks/results/<suite>-<horodatage>.json)")
+
+    p_cmp = sp.add_parser("compare", help="Comparer deux résultats JSON")
+    p_cmp.add_argument("base", type=Path)
+    p_cmp.add_argument("new", type=Path)
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Régression signalée au-delà de ce ratio (défaut: 0.10)")
+    p_cmp.add_argument("--metric", choices=["min_s", "median_s", "mean_s"], default="median_s")
+
+    p_list = sp.add_parser("list", help="Lister les cas disponibles")
+    p_list.add_argument("--suite", choices=SUITES)
+
+    p_start = sp.add_parser("startup", help="Vérifier le budget de démarrage de la CLI (-X importtime)")
+    p_start.add_argument("--budget-ms", type=float, default=50.0, help="Budget de temps pour `--help` (défaut: 50 ms)")
+    p_start.add_argument("--runs", type=int, default=10)
+    p_start.add_argument("cli_args", nargs="*", default=["--help"], help="Arguments passés à la CLI (défaut: --help)")
+
+    p_scale = sp.add_parser("scaling", help="Courbe de scaling de build_dataset --workers 1..N")
+    p_scale.add_argument("--data-root", type=Path, default=REPO_ROOT / "data", help="Racine des données (défaut: data)")
+    p_scale.add_argument("--years", type=int, nargs="*", help=f"Années construites (défaut: {' '.join(map(str, QUICK_YEARS))})")
+    p_scale.add_argument("--all-years", action="store_true", help="Tout l'historique")
+    p_scale.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="N maximal (défaut: nombre de CPU)")
+    p_scale.add_argument("--repeat", type=int, default=1)
+    p_scale.add_argument("--out", type=Path, help="Fichier JSON (défaut: benchmarks/results/scaling-<horodatage>.json); le tableau .md et le .png (si matplotlib) sont écrits à côté")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.cmd == "list":
+        for c in CASES:
+            if args.suite is None or args.suite in c.suites:
+                print(f"{c.name:<28} {','.join(c.suites)}")
+        return 0
+    if args.cmd == "startup":
+        r = measure_startup(args.cli_args, args.runs)
+        print(f"tiebreaker_cli {' '.join(args.cli_args)}: median {r['median_s'] * 1000:.1f} ms, min {r['min_s'] * 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        for cumulative, name in r["imports"]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+        if r["heavy_imported"]:
+            print(f"Modules lourds importés au démarrage: {', '.join(r['heavy_imported'])}", file=sys.stderr)
+        if r["median_s"] * 1000 > args.budget_ms:
+            print("Budget de démarrage dépassé", file=sys.stderr)
+            return 1
+        return 0
+    if args.cmd == "scaling":
+        years = None if args.all_years else (args.years or QUICK_YEARS)
+        report = measure_scaling(args.data_root, years, args.max_workers, args.repeat)
+        out = args.out or RESULTS_DIR / f"scaling-{datetime.now():%Y%m%d-%H%M%S}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        chart = scaling_chart(report)
+        out.with_suffix(".md").write_text("\n".join(chart) + "\n", encoding="utf-8")
+        print("\n".join(chart))
+        png = out.with_suffix(".png")
+        print(f"Résultats: {out}" + (f", {png}" if write_scaling_png(report, png) else ""))
+        return 0
+    if args.cmd == "compare":
+        base = json.loads(args.base.read_text(encoding="utf-8"))
+        new = json.loads(args.new.read_text(encoding="utf-8"))
+        regressions = compare(base, new, args.threshold, args.metric)
+        if regressions:
+            print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+        return 0
+
+    report = run_suite(args.data_root, args.suite, only=args.only, repeat=args.repeat)
+    out = args.out or RESULTS_DIR / f"{args.suite}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Résultats: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -7,12 +7,16 @@ import argparse
 from dataclasses import dataclass
 from datetime import date, datetime
 from pathlib import Path
-from typing import Any, Mapping
+from typing import TYPE_CHECKING, Any, Mapping
 
 import numpy as np
 import pandas as pd
 
-from .tiebreaker_cli import DataHub
+from models import DataHub
+from profiling import add_profile_arguments, run_profiled, span
+
+if TYPE_CHECKING:
+    from parallel_build import RankingArrays
 
 
 @dataclass(slots=True)
@@ -69,6 +73,14 @@ def parse_dob_value(value: Any) -> pd.Timestamp:
     return pd.to_datetime(text, errors="coerce")
 
 
+def parse_numeric_dobs(values: pd.Series) -> pd.Series:
+    """
+    Vectorized ``parse_dob_value`` for a numeric YYYYMMDD column (the players CSV).
+    """
+    text = pd.Series(np.trunc(values.to_numpy("float64")), index=values.index).astype("Int64").astype(str).str.zfill(8)
+    return pd.to_datetime(text.where(values.notna()), format="%Y%m%d", errors="coerce")
+
+
 def prepare_rankings(rankings: pd.DataFrame) -> pd.DataFrame:
     df = rankings.copy()
     if "ranking_date" in df.columns:
@@ -143,7 +155,7 @@ def _name_variants(player_name: str) -> list[str]:
     return list(dict.fromkeys(v for v in variants if v))
 
 
-def get_rank_on_or_before(rankings: pd.DataFrame, player_id: int | None, player_name: str, match_date: date | datetime | pd.Timestamp | None) -> dict[str, Any]:
+def get_rank_on_or_before(rankings: pd.DataFrame | RankingArrays, player_id: int | None, player_name: str, match_date: date | datetime | pd.Timestamp | None) -> dict[str, Any]:
     """
     Retourne {'rank': int|NaN, 'points': int|NaN, 'ranking_date': date|NaT}
     """
@@ -156,6 +168,9 @@ def get_rank_on_or_before(rankings: pd.DataFrame, player_id: int | None, player_
             "rank_missing": True,
             "points_missing": True,
         }
+    if not isinstance(rankings, pd.DataFrame):
+        # Memory-mapped arrays shared with the --workers processes (see parallel_build).
+        return rankings.rank_on_or_before(player_id, player_name, target)
     cache = _get_ranking_cache(rankings)
     group: pd.DataFrame | None = None
 
@@ -194,20 +209,25 @@ def get_rank_on_or_before(rankings: pd.DataFrame, player_id: int | None, player_
 
 def prepare_players(players: pd.DataFrame) -> tuple[pd.DataFrame, PlayerLookup]:
     df = players.copy()
-    if "dob" in df.columns:
+    if "dob" in df.columns and pd.api.types.is_numeric_dtype(df["dob"]):
+        df["dob_parsed"] = parse_numeric_dobs(df["dob"])
+    elif "dob" in df.columns:
         df["dob_parsed"] = df["dob"].apply(parse_dob_value)
     else:
         df["dob_parsed"] = pd.NaT
     df["name_key"] = df["full_name"].astype(str).map(normalize_name)
+    return df, lookup_from_players(df)
+
+
+def lookup_from_players(df: pd.DataFrame) -> PlayerLookup:
+    """
+    Builds the id/name dictionaries from a frame already carrying ``name_key`` and ``dob_parsed``.
+    """
     dob_by_id: dict[int, pd.Timestamp] = {}
     dob_by_name: dict[str, pd.Timestamp] = {}
     name_by_id: dict[int, str] = {}
     name_by_key: dict[str, str] = {}
-    for _, row in df.iterrows():
-        pid = row.get("player_id")
-        full_name = row.get("full_name")
-        name_key = row.get("name_key")
-        dob_value = row.get("dob_parsed")
+    for pid, full_name, name_key, dob_value in zip(df["player_id"], df["full_name"], df["name_key"], df["dob_parsed"]):
         if pd.notna(pid):
             pid_int = int(pid)
             name_by_id[pid_int] = str(full_name) if full_name else ""
@@ -217,8 +237,7 @@ def prepare_players(players: pd.DataFrame) -> tuple[pd.DataFrame, PlayerLookup]:
             name_by_key[name_key] = str(full_name) if full_name else ""
             if pd.notna(dob_value):
                 dob_by_name[name_key] = pd.Timestamp(dob_value)
-    lookup = PlayerLookup(dob_by_id=dob_by_id, dob_by_name=dob_by_name, name_by_id=name_by_id, name_by_key=name_by_key)
-    return df, lookup
+    return PlayerLookup(dob_by_id=dob_by_id, dob_by_name=dob_by_name, name_by_id=name_by_id, name_by_key=name_by_key)
 
 
 def _resolve_player_name(player_name: str, player_id: int | None, lookup: PlayerLookup) -> str:
@@ -256,7 +275,7 @@ def _safe_int(value: Any) -> int | None:
         return None
 
 
-def canonicalize_ab(row: Mapping[str, Any], rankings: pd.DataFrame, players_lookup: PlayerLookup) -> dict[str, Any]:
+def canonicalize_ab(row: Mapping[str, Any], rankings: pd.DataFrame | RankingArrays, players_lookup: PlayerLookup) -> dict[str, Any]:
     match_date = parse_date_like(row.get("tourney_date"))
     winner_id = _safe_int(row.get("winner_id"))
     loser_id = _safe_int(row.get("loser_id"))
@@ -352,6 +371,8 @@ def canonicalize_ab(row: Mapping[str, Any], rankings: pd.DataFrame, players_look
         "y": y_value,
         "tourney_date": match_date_for_output,
         "tourney_name": row.get("tourney_name"),
+        "tourney_id": row.get("tourney_id"),
+        "match_num": _safe_int(row.get("match_num")),
         "surface": surface_raw,
         "round": round_raw,
         "best_of": best_of_raw,
@@ -376,15 +397,18 @@ def canonicalize_ab(row: Mapping[str, Any], rankings: pd.DataFrame, players_look
     }
 
 
-def build_dataset(matches: pd.DataFrame, rankings: pd.DataFrame, players_lookup: PlayerLookup, limit: int | None = None) -> pd.DataFrame:
+def build_dataset(matches: pd.DataFrame, rankings: pd.DataFrame | RankingArrays, players_lookup: PlayerLookup, limit: int | None = None) -> pd.DataFrame:
     records: list[dict[str, Any]] = []
-    for row in matches.itertuples(index=False, name="MatchRow"):
-        if limit is not None and len(records) >= limit:
-            break
-        record = canonicalize_ab(row._asdict(), rankings, players_lookup)
-        records.append(record)
+    with span("canonicalize_ab") as sp:
+        for row in matches.itertuples(index=False, name="MatchRow"):
+            if limit is not None and len(records) >= limit:
+                break
+            record = canonicalize_ab(row._asdict(), rankings, players_lookup)
+            records.append(record)
+        sp.rows = len(records)
     df = pd.DataFrame(records)
-    return add_one_hot_features(df)
+    with span("add_one_hot_features"):
+        return add_one_hot_features(df)
 
 
 def add_one_hot_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -430,6 +454,10 @@ def describe_dataframe(df: pd.DataFrame) -> str:
     return "\n".join(lines)
 
 
+def validation_report_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.stem + ".validation.json")
+
+
 def save_dataset(df: pd.DataFrame, out_path: Path) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_parquet(out_path, index=False)
@@ -443,12 +471,19 @@ def run(
     out_path: Path,
     min_year: int | None = None,
     max_year: int | None = None,
+    validate: bool = True,
+    workers: int | None = None,
+    features: list[str] | None = None,
 ) -> pd.DataFrame:
     if years and include_all_years:
         raise ValueError("Choisir --years ou --all-years, pas les deux.")
-    hub = DataHub(data_root)
-    _, players_lookup = prepare_players(hub.load_players())
-    rankings_df = prepare_rankings(hub.load_rankings())
+    hub = DataHub(data_root, validate=validate)
+    players_df = hub.load_players()
+    with span("prepare_players", rows=len(players_df)):
+        players_prepared, players_lookup = prepare_players(players_df)
+    rankings_raw = hub.load_rankings()
+    with span("prepare_rankings", rows=len(rankings_raw)):
+        rankings_df = prepare_rankings(rankings_raw)
     if include_all_years:
         matches_df = hub.load_matches()
     else:
@@ -462,9 +497,25 @@ def run(
             mask &= dates.dt.year <= max_year
         matches_df = matches_df[mask]
     matches_df = matches_df.sort_values("tourney_date", na_position="last").reset_index(drop=True)
-    dataset = build_dataset(matches_df, rankings_df, players_lookup, limit=limit)
-    save_dataset(dataset, out_path)
+    with span("build_dataset", rows=len(matches_df)):
+        if workers:
+            import parallel_build
+            if limit is not None:
+                matches_df = matches_df.head(limit)
+            dataset = parallel_build.build_parallel(matches_df, rankings_df, players_prepared, out_path, workers)
+        else:
+            dataset = build_dataset(matches_df, rankings_df, players_lookup, limit=limit)
+    if features:
+        from features import FeatureStore
+        with span("join_features"):
+            dataset = FeatureStore(hub).join_ab(dataset, features)
+    with span("save_dataset", rows=len(dataset)):
+        save_dataset(dataset, out_path)
+        if validate:
+            hub.report.write_json(validation_report_path(out_path))
     print(describe_dataframe(dataset))
+    if validate:
+        print(hub.report.summary())
     return dataset
 
 
@@ -477,6 +528,10 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--max-year", type=int, help="Filtrer les matches jusqu'à cette année incluse")
     parser.add_argument("--limit", type=int, help="Limiter le nombre de matches traités (dev rapide)")
     parser.add_argument("--out", type=Path, default=Path("data/processed/dataset_outcome.parquet"), help="Fichier de sortie Parquet")
+    parser.add_argument("--no-validate", action="store_true", help="Ne pas valider/dédupliquer les matches et rankings (rapport <out>.validation.json sinon)")
+    parser.add_argument("--workers", type=int, help="Construire par shards annuels avec N processus (partitions dans <out>.parts/)")
+    parser.add_argument("--features", nargs="+", metavar="GROUPE", help="Ajouter des groupes du feature store (<groupe>_A/_B), ex: elo form h2h")
+    add_profile_arguments(parser)
     return parser
 
 
@@ -484,14 +539,23 @@ def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
     try:
-        run(
-            data_root=args.data_root,
-            years=args.years,
-            include_all_years=args.all_years,
-            limit=args.limit,
-            out_path=args.out,
-            min_year=args.min_year,
-            max_year=args.max_year,
+        run_profiled(
+            lambda: run(
+                data_root=args.data_root,
+                years=args.years,
+                include_all_years=args.all_years,
+                limit=args.limit,
+                out_path=args.out,
+                min_year=args.min_year,
+                max_year=args.max_year,
+                validate=not args.no_validate,
+                workers=args.workers,
+                features=args.features,
+            ),
+            "build_dataset.run",
+            args.profile,
+            args.profile_cprofile,
+            args.profile_trace,
         )
     except Exception as exc:
         parser.error(str(exc))
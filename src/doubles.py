@@ -0,0 +1,178 @@
+"""
+TieBreaker doubles index — team and partner lookups over ATP doubles matches.
+
+``DoublesIndex`` flattens each match into four player appearances (player,
+partner, won) and groups row positions by team key and by player id once, so
+"all matches of team X/Y" and "record of X with any partner" are sorted-key
+lookups instead of scans over the four name/id columns. ``load_index`` keeps
+the index next to the columnar cache (processed/cache/doubles_index/) and
+rebuilds it only when the doubles CSVs change.
+"""
+from __future__ import annotations
+
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from models import DataHub, team_key
+from profiling import span
+
+
+INDEX_DIR = Path("processed") / "cache" / "doubles_index"
+INDEX_VERSION = 1
+
+
+_SLOTS = [
+    ("winner1_id", "winner2_id", "winner1_name", 1),
+    ("winner2_id", "winner1_id", "winner2_name", 1),
+    ("loser1_id", "loser2_id", "loser1_name", 0),
+    ("loser2_id", "loser1_id", "loser2_name", 0),
+]
+
+
+@dataclass(slots=True)
+class Postings:
+    """
+    Row positions grouped by key: ``rows[starts[i]:starts[i + 1]]`` (ascending) belong to ``keys[i]``.
+    """
+    keys: np.ndarray
+    starts: np.ndarray
+    rows: np.ndarray
+
+    @classmethod
+    def from_pairs(cls, keys: np.ndarray, rows: np.ndarray) -> "Postings":
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        return cls(keys=keys[starts], starts=np.r_[starts, len(keys)].astype(np.int64), rows=rows.astype(np.int64))
+
+    def get(self, key: Any) -> np.ndarray | None:
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return self.rows[self.starts[i]:self.starts[i + 1]]
+
+
+@dataclass(slots=True)
+class DoublesIndex:
+    matches: pd.DataFrame
+    appearances: pd.DataFrame
+    by_team: Postings
+    by_player: Postings
+
+    @classmethod
+    def build(cls, doubles: pd.DataFrame) -> "DoublesIndex":
+        matches = doubles.reset_index(drop=True)
+        parts = []
+        for pid_col, partner_col, name_col, won in _SLOTS:
+            parts.append(pd.DataFrame({
+                "row": np.arange(len(matches)),
+                "player_id": matches[pid_col],
+                "partner_id": matches[partner_col],
+                "player_name": matches[name_col],
+                "won": np.full(len(matches), won, dtype=np.int8),
+            }))
+        appearances = pd.concat(parts, ignore_index=True)
+        appearances = appearances[appearances["player_id"].notna()].reset_index(drop=True)
+        by_player = Postings.from_pairs(appearances["player_id"].to_numpy("int64"), np.arange(len(appearances)))
+
+        teams = pd.concat([
+            pd.DataFrame({"team": matches["winner_team"], "row": np.arange(len(matches))}),
+            pd.DataFrame({"team": matches["loser_team"], "row": np.arange(len(matches))}),
+        ], ignore_index=True).dropna(subset=["team"])
+        by_team = Postings.from_pairs(teams["team"].to_numpy(str), teams["row"].to_numpy())
+        return cls(matches=matches, appearances=appearances, by_team=by_team, by_player=by_player)
+
+    def save(self, directory: Path, fingerprint: str) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ("matches", "appearances"):
+            tmp = directory / f"{name}.parquet.tmp"
+            getattr(self, name).to_parquet(tmp, index=False)
+            tmp.replace(directory / f"{name}.parquet")
+        for name in ("by_team", "by_player"):
+            postings = getattr(self, name)
+            with open(directory / f"{name}.npz.tmp", "wb") as fh:
+                np.savez(fh, keys=postings.keys, starts=postings.starts, rows=postings.rows)
+            (directory / f"{name}.npz.tmp").replace(directory / f"{name}.npz")
+        # Written last: a partial save leaves an index that is never considered fresh.
+        (directory / "meta.json").write_text(json.dumps({"fingerprint": fingerprint, "version": INDEX_VERSION}), encoding="utf-8")
+
+    @classmethod
+    def open(cls, directory: Path, fingerprint: str) -> "DoublesIndex | None":
+        """
+        The saved index when it was built from the current sources, else None.
+        """
+        try:
+            if json.loads((directory / "meta.json").read_text(encoding="utf-8")).get("fingerprint") != fingerprint:
+                return None
+            postings = {}
+            for name in ("by_team", "by_player"):
+                with np.load(directory / f"{name}.npz") as data:
+                    postings[name] = Postings(keys=data["keys"], starts=data["starts"], rows=data["rows"])
+            return cls(matches=pd.read_parquet(directory / "matches.parquet"), appearances=pd.read_parquet(directory / "appearances.parquet"), **postings)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def team_matches(self, pid1: int, pid2: int) -> pd.DataFrame:
+        rows = self.by_team.get(team_key(pid1, pid2))
+        if rows is None:
+            return self.matches.iloc[0:0]
+        return self.matches.iloc[rows]
+
+    def player_matches(self, pid: int) -> pd.DataFrame:
+        pos = self.by_player.get(int(pid))
+        if pos is None:
+            return self.matches.iloc[0:0]
+        return self.matches.iloc[np.sort(self.appearances["row"].to_numpy()[pos])]
+
+    def partner_record(self, pid: int, matches_filter: Callable[[pd.DataFrame], pd.DataFrame] | None = None) -> pd.DataFrame:
+        """
+        Wins/losses of ``pid`` with each partner, most frequent partnership first.
+        ``matches_filter`` narrows the player's matches (year, tournament, ...) before counting.
+        """
+        pos = self.by_player.get(int(pid))
+        if pos is None:
+            return pd.DataFrame(columns=["partner_id", "partner_name", "wins", "losses", "matches"])
+        app = self.appearances.iloc[pos]
+        if matches_filter is not None:
+            # matches keeps a RangeIndex, so the filtered index holds row positions.
+            kept = matches_filter(self.matches.iloc[app["row"].to_numpy()]).index
+            app = app[app["row"].isin(kept)]
+        record = app.groupby("partner_id").agg(wins=("won", "sum"), matches=("won", "size")).reset_index()
+        record["losses"] = record["matches"] - record["wins"]
+        names = self.appearances.drop_duplicates("player_id").set_index("player_id")["player_name"]
+        record["partner_name"] = record["partner_id"].map(names)
+        record = record.sort_values(["matches", "wins"], ascending=False)
+        return record[["partner_id", "partner_name", "wins", "losses", "matches"]].reset_index(drop=True)
+
+
+def index_fingerprint(hub: DataHub) -> str:
+    return hub.fingerprint(f"doubles-index-v{INDEX_VERSION}", kinds=("doubles",))
+
+
+def load_index(hub: DataHub) -> DoublesIndex:
+    """
+    Saved index when the doubles files did not change since it was built, else rebuilt (and saved unless ``hub.cache`` is off).
+    """
+    directory = hub.root / INDEX_DIR
+    fingerprint = index_fingerprint(hub)
+    if hub.cache:
+        with span("open_doubles_index"):
+            index = DoublesIndex.open(directory, fingerprint)
+        if index is not None:
+            return index
+    doubles = hub.load_doubles()
+    with span("build_doubles_index", rows=len(doubles)):
+        index = DoublesIndex.build(doubles)
+    if hub.cache:
+        try:
+            with span("save_doubles_index"):
+                index.save(directory, fingerprint)
+        except OSError as exc:
+            print(f"Index des doubles non enregistré ({directory}): {exc}", file=sys.stderr)
+    return index
@@ -0,0 +1,49 @@
+"""
+TieBreaker Elo — the match order and rating update shared by every Elo consumer.
+
+``chronological`` is the one order in which results are rated (date, tourney_id,
+match_num, missing values first) and ``elo_step`` the one update rule, so the
+ingest indexes, the ``elo`` feature group and the matchup grid agree rating for
+rating.
+"""
+from __future__ import annotations
+
+import pandas as pd
+
+
+SURFACES = ("Hard", "Clay", "Grass", "Carpet")
+ELO_START = 1500.0
+
+
+def elo_k(n: int | float) -> float:
+    """
+    K-factor shrinking with the number of rated matches (FiveThirtyEight tennis Elo).
+    """
+    return 250.0 / (n + 5) ** 0.4
+
+
+def chronological(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``matches`` sorted by (tourney_date, tourney_id, match_num), stable, missing values first.
+    """
+    order = pd.DataFrame({
+        "date": pd.to_datetime(matches["tourney_date"], errors="coerce").to_numpy(),
+        "tid": matches["tourney_id"].astype(str).to_numpy(),
+        "num": pd.to_numeric(matches["match_num"], errors="coerce").to_numpy(),
+    })
+    return matches.iloc[order.sort_values(["date", "tid", "num"], kind="stable", na_position="first").index.to_numpy()]
+
+
+def elo_step(ratings: dict[int, float], counts: dict[int, int], winner: int, loser: int) -> tuple[float, float, int, int]:
+    """
+    Rates one result in ``ratings``/``counts`` (one pool: overall or a surface) and
+    returns the pre-match (winner rating, loser rating, winner count, loser count).
+    """
+    rw, rl = ratings.get(winner, ELO_START), ratings.get(loser, ELO_START)
+    nw, nl = counts.get(winner, 0), counts.get(loser, 0)
+    surprise = 1.0 - 1.0 / (1.0 + 10 ** ((rl - rw) / 400.0))
+    ratings[winner] = rw + elo_k(nw) * surprise
+    ratings[loser] = rl - elo_k(nl) * surprise
+    counts[winner] = nw + 1
+    counts[loser] = nl + 1
+    return rw, rl, nw, nl
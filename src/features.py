@@ -0,0 +1,427 @@
+"""
+TieBreaker feature store — registered, versioned feature groups cached as Parquet.
+
+Every singles match contributes two rows to the *spine*, one per side
+(``winner``/``loser``), keyed by (tourney_id, match_num, side) and ordered
+chronologically. A feature group is a transform registered with
+``@feature_group(name, version, inputs)`` that returns one row of features per
+spine row, computed only from what was known before the match. Each group is
+materialized to processed/features/<name>.parquet (key, tourney_date and the
+group's columns) with a meta file holding its fingerprint: the declared
+inputs' source files, the loaders' validation setting, the group version and a
+hash of the code it runs (the transform, the spine builder and the helpers
+listed in ``depends``). ``FeatureStore.materialize`` recomputes stale
+groups only, so adding or changing a group leaves the others cached, and
+``FeatureStore.assemble`` joins the requested groups onto the spine.
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib
+import inspect
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from elo import SURFACES, chronological, elo_step
+from models import DataHub
+from profiling import span
+
+
+FEATURE_DIR = Path("processed") / "features"
+STORE_VERSION = 1
+KEY = ["tourney_id", "match_num", "side"]
+SIDES = ("winner", "loser")
+FORM_WINDOW = 10
+SERVE_WINDOW = 20
+ACTIVITY_DAYS = 365
+
+Transform = Callable[[pd.DataFrame, dict[str, pd.DataFrame]], pd.DataFrame]
+
+
+@dataclass(slots=True)
+class FeatureGroup:
+    name: str
+    version: int
+    inputs: tuple[str, ...]
+    columns: tuple[str, ...]
+    transform: Transform
+    depends: tuple[str, ...] = ()
+
+    @property
+    def code_hash(self) -> str:
+        return _code_hash((self.transform, *SPINE_CODE, *self.depends))
+
+
+# Code every group runs through the spine.
+SPINE_CODE = ("features.build_spine", "elo.chronological")
+
+
+def _resolve(ref: str) -> object:
+    """
+    ``"module"`` or ``"module.attribute"``, imported on demand (transforms import some helpers lazily).
+    """
+    try:
+        return importlib.import_module(ref)
+    except ImportError:
+        module, _, attr = ref.rpartition(".")
+        return getattr(importlib.import_module(module), attr)
+
+
+def _code_hash(refs: tuple[Callable | str, ...]) -> str:
+    h = hashlib.sha1()
+    for ref in refs:
+        h.update(_code(_resolve(ref) if isinstance(ref, str) else ref))
+    return h.hexdigest()[:12]
+
+
+def _code(obj: object) -> bytes:
+    try:
+        return inspect.getsource(obj).encode()
+    except (OSError, TypeError):
+        # Defined interactively: fall back to the bytecode and constants.
+        fn = obj.__code__
+        return fn.co_code + repr(fn.co_consts).encode()
+
+
+FEATURE_GROUPS: dict[str, FeatureGroup] = {}
+
+
+def feature_group(name: str, version: int, inputs: tuple[str, ...], columns: tuple[str, ...],
+                  depends: tuple[str, ...] = ()) -> Callable[[Transform], Transform]:
+    """
+    Registers a transform ``(sides, sources) -> frame`` returning ``columns`` aligned on ``sides``.
+    ``sources`` holds the loaded ``inputs`` ("matches", "rankings", "players"); ``depends`` names
+    the helpers it calls (``"module.function"`` or a whole ``"module"``) so editing them invalidates the cache.
+    """
+    def register(fn: Transform) -> Transform:
+        FEATURE_GROUPS[name] = FeatureGroup(name, version, tuple(inputs), tuple(columns), fn, tuple(depends))
+        return fn
+    return register
+
+
+def build_spine(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Two rows per match (winner then loser) in chronological order. ``row`` is the
+    match's position in ``matches`` and ``seq`` its chronological rank.
+    """
+    cols = [c for c in ("tourney_id", "match_num", "tourney_date", "winner_id", "loser_id", "surface") if c in matches.columns]
+    m = matches[cols].assign(_row=np.arange(len(matches)))
+    usable = pd.Series(True, index=m.index)
+    for c in ("winner_id", "loser_id", "match_num"):
+        usable &= pd.to_numeric(m[c], errors="coerce").notna()
+    m = m[usable]
+    m = chronological(m)
+    m = m[~m[["tourney_id", "match_num"]].duplicated()]
+    n = len(m)
+    w = pd.to_numeric(m["winner_id"]).astype("int64").to_numpy()
+    l = pd.to_numeric(m["loser_id"]).astype("int64").to_numpy()
+    surface = m["surface"].astype(str).to_numpy() if "surface" in m.columns else np.full(n, "")
+    spine = pd.DataFrame({
+        "tourney_id": np.repeat(m["tourney_id"].astype(str).to_numpy(), 2),
+        "match_num": np.repeat(pd.to_numeric(m["match_num"], errors="coerce").astype("int64").to_numpy(), 2),
+        "side": np.tile(np.array(SIDES, dtype=object), n),
+        "player_id": np.column_stack([w, l]).ravel(),
+        "opponent_id": np.column_stack([l, w]).ravel(),
+        "tourney_date": np.repeat(pd.to_datetime(m["tourney_date"], errors="coerce").to_numpy("datetime64[ns]"), 2),
+        "surface": np.repeat(surface, 2),
+        "won": np.tile(np.array([1, 0], dtype=np.int8), n),
+        "seq": np.repeat(np.arange(n), 2),
+        "row": np.repeat(m["_row"].to_numpy(), 2),
+    })
+    return spine
+
+
+def _prior_window(player: np.ndarray, seq: np.ndarray, values: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sum and count of the non-NaN ``values`` over each player's previous ``window`` rows.
+    """
+    order = np.lexsort((seq, player))
+    p = player[order]
+    v = values[order].astype(float)
+    valid = ~np.isnan(v)
+    csum = np.r_[0.0, np.cumsum(np.where(valid, v, 0.0))]
+    ccnt = np.r_[0, np.cumsum(valid)]
+    idx = np.arange(len(p))
+    starts = np.r_[0, np.flatnonzero(p[1:] != p[:-1]) + 1]
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(p)]))
+    lo = np.maximum(group_start, idx - window)
+    out_sum = np.empty(len(p))
+    out_cnt = np.empty(len(p))
+    out_sum[order] = csum[idx] - csum[lo]
+    out_cnt[order] = ccnt[idx] - ccnt[lo]
+    return out_sum, out_cnt
+
+
+@feature_group("rankings", version=1, inputs=("rankings",), columns=("rank_latest", "points_latest", "rank_age_days"))
+def rankings_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Latest ranking published on or before the match date (365-day window, as build_dataset).
+    """
+    r = sources["rankings"]
+    r = pd.DataFrame({
+        "player_id": pd.to_numeric(r["player_id"], errors="coerce"),
+        "ranking_date": pd.to_datetime(r["ranking_date"], errors="coerce").astype("datetime64[ns]"),
+        "rank_latest": pd.to_numeric(r["rank"], errors="coerce").astype(float),
+        "points_latest": pd.to_numeric(r["points"], errors="coerce").astype(float) if "points" in r.columns else np.nan,
+    }).dropna(subset=["player_id", "ranking_date"])
+    r["player_id"] = r["player_id"].astype("int64")
+    left = pd.DataFrame({"player_id": sides["player_id"].to_numpy(), "tourney_date": sides["tourney_date"].to_numpy(), "_pos": np.arange(len(sides))})
+    left = left[left["tourney_date"].notna()].sort_values("tourney_date", kind="stable")
+    merged = pd.merge_asof(left, r.sort_values("ranking_date", kind="stable"), left_on="tourney_date", right_on="ranking_date",
+                           by="player_id", tolerance=pd.Timedelta(days=365), direction="backward")
+    out = pd.DataFrame(np.nan, index=np.arange(len(sides)), columns=["rank_latest", "points_latest", "rank_age_days"])
+    pos = merged["_pos"].to_numpy()
+    out.loc[pos, "rank_latest"] = merged["rank_latest"].to_numpy()
+    out.loc[pos, "points_latest"] = merged["points_latest"].to_numpy()
+    out.loc[pos, "rank_age_days"] = (merged["tourney_date"] - merged["ranking_date"]).dt.days.to_numpy()
+    return out
+
+
+@feature_group("age", version=1, inputs=("players",), columns=("age_years", "height_cm", "left_handed"),
+               depends=("build_dataset.parse_dob_value", "build_dataset.parse_numeric_dobs"))
+def age_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Age at the match, height and handedness from the players file.
+    """
+    from build_dataset import parse_dob_value, parse_numeric_dobs
+    players = sources["players"].dropna(subset=["player_id"]).drop_duplicates("player_id").set_index("player_id")
+    dob = parse_numeric_dobs(players["dob"]) if pd.api.types.is_numeric_dtype(players["dob"]) else players["dob"].apply(parse_dob_value)
+    pid = sides["player_id"]
+    days = (sides["tourney_date"] - pd.to_datetime(pid.map(dob)).astype("datetime64[ns]").to_numpy()).dt.days
+    hand = pid.map(players["hand"]) if "hand" in players.columns else pd.Series(None, index=sides.index, dtype=object)
+    return pd.DataFrame({
+        "age_years": (days / 365.25).where(days >= 0).round(2).to_numpy(),
+        "height_cm": pd.to_numeric(pid.map(players["height"]), errors="coerce").to_numpy() if "height" in players.columns else np.nan,
+        "left_handed": np.where(hand == "L", 1.0, np.where(hand == "R", 0.0, np.nan)),
+    })
+
+
+@feature_group("elo", version=2, inputs=("matches",), columns=("elo", "elo_surface", "elo_matches", "elo_surface_matches"),
+               depends=("elo",))
+def elo_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Pre-match Elo, overall and on the match surface (same update as the ingest indexes).
+    """
+    players = sides["player_id"].to_numpy()
+    surfaces = sides["surface"].to_numpy()
+    n = len(sides)
+    elo = np.empty(n)
+    elo_surface = np.full(n, np.nan)
+    counts = np.empty(n)
+    surface_counts = np.full(n, np.nan)
+    ratings: dict[str, dict[int, float]] = {k: {} for k in ("all", *SURFACES)}
+    played: dict[str, dict[int, int]] = {k: {} for k in ("all", *SURFACES)}
+    # Spine rows come in (winner, loser) pairs in chronological order.
+    for i in range(0, n, 2):
+        w, l, s = int(players[i]), int(players[i + 1]), surfaces[i]
+        elo[i], elo[i + 1], counts[i], counts[i + 1] = elo_step(ratings["all"], played["all"], w, l)
+        if s in ratings:
+            elo_surface[i], elo_surface[i + 1], surface_counts[i], surface_counts[i + 1] = elo_step(ratings[s], played[s], w, l)
+    return pd.DataFrame({"elo": elo, "elo_surface": elo_surface, "elo_matches": counts, "elo_surface_matches": surface_counts})
+
+
+@feature_group("form", version=1, inputs=("matches",), columns=("form_win_rate_10", "matches_last_365d"),
+               depends=("features._prior_window",))
+def form_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Win rate over the previous 10 matches and number of matches in the 365 days before the tournament.
+    """
+    player = sides["player_id"].to_numpy()
+    wins, played = _prior_window(player, sides["seq"].to_numpy(), sides["won"].to_numpy(), FORM_WINDOW)
+    # Activity: binary search of the window bounds in rows sorted by (player, day).
+    day = sides["tourney_date"].to_numpy("datetime64[D]").astype("int64")
+    dated = ~np.isnat(sides["tourney_date"].to_numpy("datetime64[D]"))
+    code = pd.factorize(player)[0].astype("int64")
+    span_days = int(day[dated].max() - day[dated].min()) + 2 * ACTIVITY_DAYS if dated.any() else 0
+    base = day[dated].min() - ACTIVITY_DAYS if dated.any() else 0
+    keys = code * span_days + (day - base)
+    sorted_keys = np.sort(keys[dated])
+    activity = np.full(len(sides), np.nan)
+    activity[dated] = (np.searchsorted(sorted_keys, keys[dated], side="left")
+                       - np.searchsorted(sorted_keys, keys[dated] - ACTIVITY_DAYS, side="left"))
+    return pd.DataFrame({
+        "form_win_rate_10": np.where(played > 0, wins / np.maximum(played, 1), np.nan),
+        "matches_last_365d": activity,
+    })
+
+
+@feature_group("serve", version=1, inputs=("matches",), columns=("serve_p_20", "return_p_20"),
+               depends=("features._prior_window", "match_probability.serve_point_probabilities"))
+def serve_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Mean serve-point and return-point win rates over the previous 20 matches with stats.
+    """
+    from match_probability import serve_point_probabilities
+    probs = serve_point_probabilities(sources["matches"]).to_numpy()
+    rows = sides["row"].to_numpy()
+    is_winner = (sides["side"] == "winner").to_numpy()
+    serve = np.where(is_winner, probs[rows, 0], probs[rows, 1])
+    ret = 1.0 - np.where(is_winner, probs[rows, 1], probs[rows, 0])
+    player, seq = sides["player_id"].to_numpy(), sides["seq"].to_numpy()
+    s_sum, s_cnt = _prior_window(player, seq, serve, SERVE_WINDOW)
+    r_sum, r_cnt = _prior_window(player, seq, ret, SERVE_WINDOW)
+    return pd.DataFrame({
+        "serve_p_20": np.where(s_cnt > 0, s_sum / np.maximum(s_cnt, 1), np.nan),
+        "return_p_20": np.where(r_cnt > 0, r_sum / np.maximum(r_cnt, 1), np.nan),
+    })
+
+
+@feature_group("h2h", version=1, inputs=("matches",), columns=("h2h_wins", "h2h_matches"))
+def h2h_features(sides: pd.DataFrame, sources: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Previous meetings with the same opponent and how many this side won.
+    """
+    by = [sides["player_id"], sides["opponent_id"]]
+    won = sides["won"].astype("int64")
+    return pd.DataFrame({
+        "h2h_wins": (won.groupby(by).cumsum() - won).to_numpy(),
+        "h2h_matches": sides.groupby(by).cumcount().to_numpy(),
+    })
+
+
+@dataclass(slots=True)
+class GroupStatus:
+    name: str
+    state: str
+    rows: int = 0
+    seconds: float = 0.0
+
+
+class FeatureStore:
+    """
+    Materialized feature groups under ``<data-root>/processed/features``.
+    """
+
+    def __init__(self, hub: DataHub, root: Path | None = None):
+        self.hub = hub
+        self.root = root or hub.root / FEATURE_DIR
+
+    def _fingerprint(self, kinds: tuple[str, ...], salt: str) -> str:
+        # The spine comes from the matches, so every group depends on them; validation
+        # drops and deduplicates rows, so a --no-validate build is cached separately.
+        return self.hub.fingerprint(f"{salt}-validate{int(self.hub.validate)}", kinds=tuple(dict.fromkeys(("matches", *kinds))))
+
+    def group_fingerprint(self, group: FeatureGroup) -> str:
+        return self._fingerprint(group.inputs, f"features-{group.name}-v{group.version}-{group.code_hash}-store{STORE_VERSION}")
+
+    def spine_fingerprint(self) -> str:
+        return self._fingerprint((), f"features-spine-v{STORE_VERSION}-{_code_hash(SPINE_CODE)}")
+
+    def _meta(self, name: str) -> dict:
+        try:
+            return json.loads((self.root / f"{name}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _fresh(self, name: str, fingerprint: str) -> bool:
+        return self._meta(name).get("fingerprint") == fingerprint and (self.root / f"{name}.parquet").exists()
+
+    def is_fresh(self, name: str) -> bool:
+        return self._fresh(name, self.group_fingerprint(FEATURE_GROUPS[name]))
+
+    def _write(self, name: str, df: pd.DataFrame, fingerprint: str, **meta) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{name}.parquet.tmp"
+        df.to_parquet(tmp, index=False)
+        tmp.replace(self.root / f"{name}.parquet")
+        meta = {"fingerprint": fingerprint, "rows": len(df), "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **meta}
+        (self.root / f"{name}.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    def materialize(self, names: list[str] | None = None, rebuild: bool = False) -> list[GroupStatus]:
+        """
+        Recomputes the stale groups among ``names`` (all registered groups by default).
+        """
+        names = names or list(FEATURE_GROUPS)
+        unknown = [n for n in names if n not in FEATURE_GROUPS]
+        if unknown:
+            raise ValueError(f"Groupe(s) de features inconnu(s): {', '.join(unknown)} (disponibles: {', '.join(FEATURE_GROUPS)})")
+        stale = [n for n in names if rebuild or not self.is_fresh(n)]
+        statuses = {n: GroupStatus(n, "en cache", int(self._meta(n).get("rows", 0))) for n in names if n not in stale}
+        if stale:
+            sources: dict[str, pd.DataFrame] = {}
+            loaders = {"matches": self.hub.load_matches, "rankings": self.hub.load_rankings, "players": self.hub.load_players}
+
+            def load(kind: str) -> pd.DataFrame:
+                if kind not in sources:
+                    sources[kind] = loaders[kind]()
+                return sources[kind]
+
+            spine = self._spine(load("matches"), rebuild)
+            # The date rides along so assemble() can push year filters down into every group file.
+            keys = spine[[*KEY, "tourney_date"]]
+            for name in stale:
+                group = FEATURE_GROUPS[name]
+                start = time.perf_counter()
+                with span(f"feature_{name}", rows=len(spine)):
+                    inputs = {kind: load(kind) for kind in ("matches", *group.inputs)}
+                    values = group.transform(spine, inputs)
+                    missing = [c for c in group.columns if c not in values.columns]
+                    if missing or len(values) != len(spine):
+                        raise ValueError(f"Le groupe {name} doit renvoyer {len(spine)} lignes et les colonnes {', '.join(group.columns)}")
+                    frame = pd.concat([keys, values[list(group.columns)].reset_index(drop=True)], axis=1)
+                    self._write(name, frame, self.group_fingerprint(group), version=group.version, code=group.code_hash, columns=list(group.columns))
+                statuses[name] = GroupStatus(name, "calculé", len(frame), time.perf_counter() - start)
+        return [statuses[n] for n in names]
+
+    def _spine(self, matches: pd.DataFrame, rebuild: bool = False) -> pd.DataFrame:
+        fingerprint = self.spine_fingerprint()
+        with span("feature_spine", rows=len(matches)):
+            spine = build_spine(matches)
+            if rebuild or not self._fresh("spine", fingerprint):
+                self._write("spine", spine.drop(columns=["row"]), fingerprint, version=STORE_VERSION)
+        return spine
+
+    def assemble(self, names: list[str], years: list[int] | None = None) -> pd.DataFrame:
+        """
+        Spine rows (optionally restricted to ``years``) joined with the columns of each requested group.
+        Stale groups are materialized first.
+        """
+        self.materialize(names)
+        filters = None
+        if years:
+            filters = [("tourney_date", ">=", pd.Timestamp(min(years), 1, 1)), ("tourney_date", "<", pd.Timestamp(max(years) + 1, 1, 1))]
+        with span("assemble_features"):
+            out = pd.read_parquet(self.root / "spine.parquet", filters=filters)
+            if years:
+                out = out[out["tourney_date"].dt.year.isin(years)]
+            out = out.set_index(KEY)
+            for name in names:
+                group = pd.read_parquet(self.root / f"{name}.parquet", filters=filters).drop(columns="tourney_date")
+                out = out.join(group.set_index(KEY), how="left")
+        return out.reset_index()
+
+    def join_ab(self, dataset: pd.DataFrame, names: list[str], years: list[int] | None = None) -> pd.DataFrame:
+        """
+        Adds ``<feature>_A`` / ``<feature>_B`` columns to a build_dataset frame (A is the winner when y == 1).
+        Only the spine rows of ``years`` are read, by default the years the dataset covers.
+        """
+        if years is None:
+            years = _covered_years(dataset)
+        features = self.assemble(names, years).drop(columns=["player_id", "opponent_id", "tourney_date", "surface", "won", "seq"])
+        columns = [c for n in names for c in FEATURE_GROUPS[n].columns]
+        wide = features[features["side"] == "winner"].drop(columns="side").merge(
+            features[features["side"] == "loser"].drop(columns="side"), on=["tourney_id", "match_num"], suffixes=("_w", "_l"))
+        merged = dataset[["tourney_id", "match_num"]].merge(wide, on=["tourney_id", "match_num"], how="left")
+        a_is_winner = (dataset["y"] == 1).to_numpy()
+        out = dataset.copy()
+        for c in columns:
+            w, l = merged[f"{c}_w"].to_numpy(), merged[f"{c}_l"].to_numpy()
+            out[f"{c}_A"] = np.where(a_is_winner, w, l)
+            out[f"{c}_B"] = np.where(a_is_winner, l, w)
+        return out
+
+
+def _covered_years(dataset: pd.DataFrame) -> list[int] | None:
+    """
+    Years of the dataset's matches, or None (whole history) when some are undated.
+    """
+    dates = pd.to_datetime(dataset["tourney_date"], errors="coerce") if "tourney_date" in dataset.columns else None
+    if dates is None or dates.isna().any():
+        return None
+    return sorted(int(y) for y in dates.dt.year.unique())
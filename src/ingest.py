@@ -0,0 +1,590 @@
+"""
+TieBreaker ingestion — append new results and rankings without rebuilding history.
+
+``ingest`` reads CSV/JSONL files from a drop directory, validates the rows
+with the loaders' own preparation and checks, drops keys that are already
+known, and appends the rest as Parquet parts under processed/ingested/ that
+``DataHub`` reads after the CSVs. The derived structures kept in
+processed/indexes/ are updated from the new rows only:
+
+- names: player id -> full name (new ids seen in match rows are added);
+- h2h: per pair of player ids, wins of each side and last meeting;
+- rankings: latest and peak ranking per player;
+- elo: overall and per-surface Elo ratings, replayed match by match;
+- match/ranking key hashes, sorted, to reject rows already ingested.
+
+They are bootstrapped once from the full history, and again whenever the base
+CSVs change. Results dated before the last rated match replay the Elo ratings
+from the full history, so the incremental state always equals a bootstrap.
+
+New parts are first written as ``*.parquet.tmp`` and listed as pending in the
+index state; the indexes are saved (by swapping in a complete directory), then
+the parts are renamed into place. On the next load, pending parts left as tmp
+files are committed and unlisted ones are deleted, so parts and indexes never
+disagree after a crash.
+"""
+from __future__ import annotations
+
+import json
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from elo import ELO_START, SURFACES, chronological, elo_step
+from models import INGESTED_DIR, DataHub
+from profiling import span
+from validation import Issue, ValidationReport, validate_matches, validate_rankings
+
+
+DROP_DIR = Path("incoming")
+INDEX_DIR = Path("processed") / "indexes"
+INDEX_VERSION = 2
+DROP_PATTERNS = ("*.csv", "*.jsonl")
+
+
+def index_dir(hub: DataHub) -> Path:
+    return hub.root / INDEX_DIR
+
+
+def base_fingerprint(hub: DataHub) -> str:
+    return hub.fingerprint(f"indexes-v{INDEX_VERSION}", include_ingested=False)
+
+
+def _yyyymmdd(s: pd.Series) -> pd.Series:
+    """
+    Dates given as 20250113, "20250113" or "2025-01-13" to the CSVs' integer form.
+    """
+    text = s.astype(str).str.replace(r"\.0$", "", regex=True)
+    parsed = pd.to_datetime(text, format="%Y%m%d", errors="coerce").fillna(pd.to_datetime(text, errors="coerce", format="mixed"))
+    return pd.to_numeric(parsed.dt.strftime("%Y%m%d"), errors="coerce").astype("Int64")
+
+
+def _key_hashes(parts: list[pd.Series]) -> np.ndarray:
+    text = parts[0].astype(str)
+    for p in parts[1:]:
+        text = text + "|" + p.astype(str)
+    return pd.util.hash_array(text.to_numpy(dtype=object))
+
+
+def match_key_hashes(matches: pd.DataFrame) -> np.ndarray:
+    return _key_hashes([matches["tourney_id"], pd.to_numeric(matches["match_num"], errors="coerce").astype("Int64")])
+
+
+def ranking_key_hashes(rankings: pd.DataFrame) -> np.ndarray:
+    dates = pd.to_datetime(rankings["ranking_date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    return _key_hashes([dates, rankings["player_id"].astype("Int64")])
+
+
+def _contains(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.searchsorted(sorted_keys, keys).clip(max=len(sorted_keys) - 1)
+    return sorted_keys[pos] == keys
+
+
+def _merge_sorted(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Inserts the new keys at their sorted positions: a binary search per new key and one copy.
+    """
+    keys = np.unique(keys)
+    keys = keys[~_contains(sorted_keys, keys)]
+    return np.insert(sorted_keys, np.searchsorted(sorted_keys, keys), keys)
+
+
+def read_drop_file(path: Path) -> pd.DataFrame:
+    if path.suffix == ".jsonl":
+        return pd.read_json(path, lines=True, dtype=False)
+    return pd.read_csv(path, low_memory=False)
+
+
+def detect_kind(df: pd.DataFrame) -> str | None:
+    cols = set(df.columns)
+    if {"winner_id", "loser_id", "tourney_id"} <= cols:
+        return "matches"
+    if {"ranking_date", "rank"} <= cols and cols & {"player", "player_id"}:
+        return "rankings"
+    return None
+
+
+def _h2h_frame(matches: pd.DataFrame) -> pd.DataFrame:
+    w = pd.to_numeric(matches["winner_id"], errors="coerce")
+    l = pd.to_numeric(matches["loser_id"], errors="coerce")
+    ok = (w.notna() & l.notna()).to_numpy()
+    matches = matches[ok]
+    w = w[ok].astype("int64").to_numpy()
+    l = l[ok].astype("int64").to_numpy()
+    df = pd.DataFrame({
+        "lo_id": np.minimum(w, l),
+        "hi_id": np.maximum(w, l),
+        "lo_wins": (w < l).astype("int64"),
+        "hi_wins": (w > l).astype("int64"),
+        "last_date": pd.to_datetime(matches["tourney_date"], errors="coerce").to_numpy(),
+    })
+    return df.groupby(["lo_id", "hi_id"]).agg(lo_wins=("lo_wins", "sum"), hi_wins=("hi_wins", "sum"), last_date=("last_date", "max"))
+
+
+def _ranking_frame(rankings: pd.DataFrame) -> pd.DataFrame:
+    r = rankings.dropna(subset=["player_id", "ranking_date", "rank"])[["player_id", "ranking_date", "rank", "points"]].copy()
+    r["ranking_date"] = pd.to_datetime(r["ranking_date"], errors="coerce")
+    r = r.dropna(subset=["ranking_date"]).sort_values(["player_id", "ranking_date"], kind="stable")
+    latest = r.groupby("player_id").last()
+    peak = r.sort_values(["rank", "ranking_date"], kind="stable").groupby("player_id").head(1).set_index("player_id")
+    latest["peak_rank"] = peak["rank"]
+    latest["peak_date"] = peak["ranking_date"]
+    return latest
+
+
+def _order_key(matches: pd.DataFrame, pos: int) -> tuple[int, str, float]:
+    """
+    Sort key of row ``pos`` as ``chronological`` orders it (missing values first).
+    """
+    date = pd.to_datetime(matches["tourney_date"].iloc[pos], errors="coerce")
+    num = pd.to_numeric(pd.Series([matches["match_num"].iloc[pos]]), errors="coerce").iloc[0]
+    return (
+        int(np.iinfo(np.int64).min) if pd.isna(date) else date.value,
+        str(matches["tourney_id"].iloc[pos]),
+        float("-inf") if pd.isna(num) else float(num),
+    )
+
+
+@dataclass(slots=True)
+class EloState:
+    """
+    Ratings and rated-match counts per player, overall ("all") and per surface.
+    """
+    ratings: dict[str, dict[int, float]]
+    counts: dict[str, dict[int, int]]
+    last_date: pd.Timestamp | None = None
+    # Order key of the last rated match: anything sorting before it arrived late.
+    last_key: tuple[int, str, float] | None = None
+
+    @classmethod
+    def empty(cls) -> "EloState":
+        keys = ("all", *SURFACES)
+        return cls(ratings={k: {} for k in keys}, counts={k: {} for k in keys})
+
+    def is_late(self, matches: pd.DataFrame) -> bool:
+        """
+        True when some of ``matches`` sort before the last rated match.
+        """
+        if self.last_key is None or matches.empty:
+            return False
+        return _order_key(chronological(matches), 0) < self.last_key
+
+    def update(self, matches: pd.DataFrame) -> int:
+        """
+        Replays ``matches`` in chronological order; returns the number of rated matches.
+        """
+        m = chronological(matches)
+        if len(m):
+            last = _order_key(m, len(m) - 1)
+            self.last_key = last if self.last_key is None else max(self.last_key, last)
+        winners = pd.to_numeric(m["winner_id"], errors="coerce").to_numpy()
+        losers = pd.to_numeric(m["loser_id"], errors="coerce").to_numpy()
+        surfaces = m["surface"].astype(str).to_numpy() if "surface" in m.columns else np.full(len(m), "")
+        rated = 0
+        for w, l, s in zip(winners, losers, surfaces):
+            if w != w or l != l:
+                continue
+            w, l = int(w), int(l)
+            for key in ("all", s) if s in self.ratings else ("all",):
+                elo_step(self.ratings[key], self.counts[key], w, l)
+            rated += 1
+        dates = pd.to_datetime(m["tourney_date"], errors="coerce")
+        if dates.notna().any():
+            newest = dates.max()
+            self.last_date = newest if self.last_date is None else max(self.last_date, newest)
+        return rated
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({"elo": pd.Series(self.ratings["all"]), "matches": pd.Series(self.counts["all"])})
+        for s in SURFACES:
+            df[f"elo_{s.lower()}"] = pd.Series(self.ratings[s], dtype="float64")
+            df[f"matches_{s.lower()}"] = pd.Series(self.counts[s], dtype="float64").fillna(0).astype("int64")
+        df.index.name = "player_id"
+        return df.reset_index()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, last_date: pd.Timestamp | None, last_key: tuple[int, str, float] | None = None) -> "EloState":
+        state = cls.empty()
+        ids = df["player_id"].to_numpy()
+        state.ratings["all"] = dict(zip(ids.tolist(), df["elo"].tolist()))
+        state.counts["all"] = dict(zip(ids.tolist(), df["matches"].tolist()))
+        for s in SURFACES:
+            sub = df[df[f"elo_{s.lower()}"].notna()]
+            state.ratings[s] = dict(zip(sub["player_id"].tolist(), sub[f"elo_{s.lower()}"].tolist()))
+            state.counts[s] = dict(zip(sub["player_id"].tolist(), sub[f"matches_{s.lower()}"].tolist()))
+        state.last_date = last_date
+        state.last_key = last_key
+        return state
+
+
+@dataclass(slots=True)
+class Indexes:
+    names: pd.DataFrame
+    h2h: pd.DataFrame
+    rankings: pd.DataFrame
+    elo: EloState
+    match_keys: np.ndarray
+    ranking_keys: np.ndarray
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, hub: DataHub) -> "Indexes":
+        """
+        Full bootstrap from the loaders (CSVs plus any ingested parts).
+        """
+        with span("bootstrap_indexes"):
+            matches = hub.load_matches()
+            rankings = hub.load_rankings()
+            players = hub.load_players()
+            with span("names"):
+                names = players.dropna(subset=["player_id"]).drop_duplicates("player_id")[["player_id", "full_name"]].set_index("player_id")
+            with span("h2h", rows=len(matches)):
+                h2h = _h2h_frame(matches)
+            with span("rankings", rows=len(rankings)):
+                ranking_index = _ranking_frame(rankings)
+            with span("elo", rows=len(matches)):
+                elo = EloState.empty()
+                elo.update(matches)
+            with span("keys"):
+                match_keys = np.unique(match_key_hashes(matches))
+                ranking_keys = np.unique(ranking_key_hashes(rankings))
+        return cls(names=names, h2h=h2h, rankings=ranking_index, elo=elo, match_keys=match_keys, ranking_keys=ranking_keys,
+                   meta={"base_fingerprint": base_fingerprint(hub), "bootstrapped_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    @classmethod
+    def load(cls, path: Path) -> "Indexes":
+        with span("load_indexes"):
+            meta = read_state(path)
+            last = meta.get("elo_last_date")
+            last_key = meta.get("elo_last_key")
+            return cls(
+                names=pd.read_parquet(path / "names.parquet").set_index("player_id"),
+                h2h=pd.read_parquet(path / "h2h.parquet").set_index(["lo_id", "hi_id"]),
+                rankings=pd.read_parquet(path / "rankings.parquet").set_index("player_id"),
+                elo=EloState.from_frame(pd.read_parquet(path / "elo.parquet"), pd.Timestamp(last) if last else None,
+                                        (int(last_key[0]), str(last_key[1]), float(last_key[2])) if last_key else None),
+                match_keys=np.load(path / "match_keys.npy"),
+                ranking_keys=np.load(path / "ranking_keys.npy"),
+                meta=meta,
+            )
+
+    def save(self, path: Path) -> None:
+        """
+        Writes every file into a sibling directory and swaps it in, so ``path`` always
+        holds one complete state (or none, which triggers a bootstrap).
+        """
+        with span("save_indexes"):
+            tmp = path.with_name(path.name + ".tmp")
+            if tmp.exists():
+                shutil.rmtree(tmp)
+            tmp.mkdir(parents=True)
+            self.names.reset_index().to_parquet(tmp / "names.parquet", index=False)
+            self.h2h.reset_index().to_parquet(tmp / "h2h.parquet", index=False)
+            self.rankings.reset_index().to_parquet(tmp / "rankings.parquet", index=False)
+            self.elo.to_frame().to_parquet(tmp / "elo.parquet", index=False)
+            np.save(tmp / "match_keys.npy", self.match_keys)
+            np.save(tmp / "ranking_keys.npy", self.ranking_keys)
+            self.meta["elo_last_date"] = self.elo.last_date.isoformat() if self.elo.last_date is not None else None
+            self.meta["elo_last_key"] = list(self.elo.last_key) if self.elo.last_key is not None else None
+            self.meta["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self.meta["rows"] = {"names": len(self.names), "h2h": len(self.h2h), "rankings": len(self.rankings),
+                                 "elo": len(self.elo.ratings["all"]), "match_keys": len(self.match_keys), "ranking_keys": len(self.ranking_keys)}
+            (tmp / "state.json").write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+            old = path.with_name(path.name + ".old")
+            if old.exists():
+                shutil.rmtree(old)
+            if path.exists():
+                path.rename(old)
+            tmp.rename(path)
+            if old.exists():
+                shutil.rmtree(old)
+
+    def known_matches(self, matches: pd.DataFrame) -> np.ndarray:
+        return _contains(self.match_keys, match_key_hashes(matches))
+
+    def known_rankings(self, rankings: pd.DataFrame) -> np.ndarray:
+        return _contains(self.ranking_keys, ranking_key_hashes(rankings))
+
+    def apply_matches(self, matches: pd.DataFrame, history: Callable[[], pd.DataFrame] | None = None) -> pd.DataFrame:
+        """
+        Folds validated new matches into every index; returns the players not yet named.
+        ``history`` returns every match applied so far: when some new match is older than
+        the last rated one, the Elo ratings are replayed from it plus ``matches``.
+        """
+        delta = _h2h_frame(matches)
+        present = delta.index.isin(self.h2h.index)
+        if present.any():
+            old = self.h2h.loc[delta.index[present]]
+            upd = delta[present]
+            self.h2h.loc[upd.index, "lo_wins"] = old["lo_wins"] + upd["lo_wins"]
+            self.h2h.loc[upd.index, "hi_wins"] = old["hi_wins"] + upd["hi_wins"]
+            self.h2h.loc[upd.index, "last_date"] = old["last_date"].where(old["last_date"] >= upd["last_date"], upd["last_date"])
+        if (~present).any():
+            self.h2h = pd.concat([self.h2h, delta[~present]])
+        if history is not None and self.elo.is_late(matches):
+            with span("replay_elo"):
+                self.elo = EloState.empty()
+                self.elo.update(pd.concat([history(), matches], ignore_index=True))
+        else:
+            self.elo.update(matches)
+        self.match_keys = _merge_sorted(self.match_keys, match_key_hashes(matches))
+
+        new_players = []
+        for side in ("winner", "loser"):
+            cols = {c: c.removeprefix(f"{side}_") for c in matches.columns if c in (f"{side}_id", f"{side}_name", f"{side}_hand", f"{side}_ioc", f"{side}_ht")}
+            new_players.append(matches[list(cols)].rename(columns=cols))
+        players = pd.concat(new_players, ignore_index=True).rename(columns={"id": "player_id", "ht": "height"})
+        players["player_id"] = pd.to_numeric(players["player_id"], errors="coerce").astype("Int64")
+        players = players.dropna(subset=["player_id"]).drop_duplicates("player_id")
+        players = players[~players["player_id"].isin(self.names.index)]
+        if not players.empty:
+            self.names = pd.concat([self.names, players.set_index("player_id")[["name"]].rename(columns={"name": "full_name"})])
+        return players
+
+    def apply_rankings(self, rankings: pd.DataFrame) -> None:
+        delta = _ranking_frame(rankings)
+        present = delta.index.isin(self.rankings.index)
+        if present.any():
+            old = self.rankings.loc[delta.index[present]]
+            upd = delta[present]
+            newer = upd["ranking_date"] >= old["ranking_date"]
+            for c in ["ranking_date", "rank", "points"]:
+                self.rankings.loc[upd.index[newer], c] = upd.loc[newer, c]
+            better = upd["peak_rank"] < old["peak_rank"]
+            self.rankings.loc[upd.index[better], "peak_rank"] = upd.loc[better, "peak_rank"]
+            self.rankings.loc[upd.index[better], "peak_date"] = upd.loc[better, "peak_date"]
+        if (~present).any():
+            self.rankings = pd.concat([self.rankings, delta[~present]])
+        self.ranking_keys = _merge_sorted(self.ranking_keys, ranking_key_hashes(rankings))
+
+    def head_to_head(self, pid1: int, pid2: int) -> tuple[int, int]:
+        """
+        Wins of ``pid1`` and of ``pid2`` against each other.
+        """
+        lo, hi = sorted((int(pid1), int(pid2)))
+        if (lo, hi) not in self.h2h.index:
+            return 0, 0
+        row = self.h2h.loc[(lo, hi)]
+        lo_w, hi_w = int(row["lo_wins"]), int(row["hi_wins"])
+        return (lo_w, hi_w) if int(pid1) == lo else (hi_w, lo_w)
+
+    def elo_rating(self, pid: int, surface: str | None = None) -> float:
+        key = surface if surface in self.elo.ratings else "all"
+        return self.elo.ratings[key].get(int(pid), ELO_START)
+
+
+def read_state(path: Path) -> dict[str, Any]:
+    return json.loads((path / "state.json").read_text(encoding="utf-8"))
+
+
+def reconcile_parts(hub: DataHub, meta: dict[str, Any]) -> bool:
+    """
+    Commits the pending parts of ``meta`` still left as tmp files and deletes the
+    other tmp parts (written by a run that stopped before saving its indexes).
+    False when a pending part is lost, i.e. the indexes know rows that are not on disk.
+    """
+    pending = set(meta.get("pending_parts", []))
+    for tmp in sorted((hub.root / INGESTED_DIR).glob("*/*.parquet.tmp")):
+        final = tmp.with_name(tmp.name.removesuffix(".tmp"))
+        if final.relative_to(hub.root).as_posix() in pending:
+            tmp.replace(final)
+        else:
+            tmp.unlink()
+    return all((hub.root / p).exists() for p in pending)
+
+
+def load_or_build_indexes(hub: DataHub, rebuild: bool = False) -> tuple[Indexes, bool]:
+    """
+    The persisted indexes when they were built from the current base CSVs, else a fresh bootstrap.
+    """
+    path = index_dir(hub)
+    try:
+        meta = read_state(path)
+    except (OSError, ValueError):
+        meta = {}
+    complete = reconcile_parts(hub, meta)
+    if not rebuild and complete and meta.get("base_fingerprint") == base_fingerprint(hub):
+        try:
+            return Indexes.load(path), False
+        except (OSError, ValueError, KeyError):
+            pass
+    idx = Indexes.build(hub)
+    idx.save(path)
+    return idx, True
+
+
+@dataclass(slots=True)
+class IngestResult:
+    files: list[str] = field(default_factory=list)
+    rejected: list[str] = field(default_factory=list)
+    parts: list[Path] = field(default_factory=list)
+    matches: int = 0
+    rankings: int = 0
+    players: int = 0
+    bootstrapped: bool = False
+    seconds: float = 0.0
+    report: ValidationReport = field(default_factory=ValidationReport)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "files": self.files, "rejected": self.rejected, "parts": [p.name for p in self.parts], "matches": self.matches, "rankings": self.rankings,
+            "players": self.players, "bootstrapped": self.bootstrapped, "seconds": round(self.seconds, 3),
+            "validation": self.report.to_dict(),
+        }
+
+    def summary(self) -> str:
+        lines = [f"Ingestion: {len(self.files)} fichier(s), {self.matches} matchs, {self.rankings} classements, {self.players} nouveaux joueurs ({self.seconds:.2f} s)"]
+        if self.bootstrapped:
+            lines.append("  index dérivés reconstruits depuis l'historique complet")
+        if self.rejected:
+            lines.append(f"  rejetés: {', '.join(self.rejected)}")
+        if self.report.issues:
+            lines.append(self.report.summary())
+        return "\n".join(lines)
+
+
+def _keep_known(prepared: pd.DataFrame, known: np.ndarray, table: str, key: list[str], report: ValidationReport) -> pd.DataFrame:
+    if known.any():
+        sample = prepared.loc[known, [c for c in key if c in prepared.columns]].head(5).astype(str).to_dict("records")
+        report.add(Issue(table, "already_ingested", "warning", int(known.sum()), "clés déjà présentes dans l'historique, lignes ignorées", int(known.sum()), sample))
+    return prepared[~known]
+
+
+def _write_part(hub: DataHub, kind: str, df: pd.DataFrame, stamp: str, result: IngestResult, suffix: str = "") -> Path:
+    """
+    Writes the part as ``<name>.parquet.tmp``; ``ingest`` renames it once the indexes that include it are saved.
+    """
+    out_dir = hub.root / INGESTED_DIR / kind
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f"{kind}_{suffix + '_' if suffix else ''}{stamp}.parquet"
+    df.to_parquet(out.with_name(out.name + ".tmp"), index=False)
+    result.parts.append(out)
+    return out
+
+
+def _ingest_matches(hub: DataHub, raw: pd.DataFrame, idx: Indexes, result: IngestResult, stamp: str,
+                    history: Callable[[], pd.DataFrame]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    raw = raw.copy()
+    raw["tourney_date"] = _yyyymmdd(raw["tourney_date"])
+    raw["tourney_id"] = raw["tourney_id"].astype(str)
+    prepared = hub.prepare_matches(raw.copy())
+    prepared["_row"] = np.arange(len(prepared))
+    prepared = validate_matches(prepared, result.report, table="ingest_matches")
+    prepared = _keep_known(prepared, idx.known_matches(prepared), "ingest_matches", ["tourney_id", "match_num"], result.report)
+    kept = raw.iloc[prepared["_row"].to_numpy()]
+    undated = kept["tourney_date"].isna().to_numpy()
+    if undated.any():
+        # Parts are filed by year: a match without a usable date has nowhere to go.
+        sample = kept.loc[undated, ["tourney_id", "match_num"]].head(5).astype(str).to_dict("records")
+        result.report.add(Issue("ingest_matches", "missing_date", "error", int(undated.sum()),
+                                "tourney_date absente ou illisible, lignes ignorées", int(undated.sum()), sample))
+        kept, prepared = kept[~undated], prepared[~undated]
+    prepared = prepared.drop(columns="_row")
+    if kept.empty:
+        return prepared, kept
+    with span("append_parts", rows=len(kept)):
+        years = (kept["tourney_date"] // 10_000).astype(int)
+        for year, part in kept.groupby(years):
+            _write_part(hub, "matches", part, stamp, result, str(year))
+    with span("update_indexes", rows=len(prepared)):
+        new_players = idx.apply_matches(prepared, history)
+    if not new_players.empty:
+        first_last = new_players["name"].astype(str).str.split(" ", n=1, expand=True).reindex(columns=[0, 1])
+        players_part = pd.DataFrame({"player_id": new_players["player_id"], "name_first": first_last[0], "name_last": first_last[1].fillna("")})
+        for c in ["hand", "ioc", "height"]:
+            if c in new_players.columns:
+                players_part[c] = new_players[c].to_numpy()
+        _write_part(hub, "players", players_part, stamp, result)
+        result.players += len(players_part)
+    result.matches += len(kept)
+    return prepared, new_players
+
+
+def _ingest_rankings(hub: DataHub, raw: pd.DataFrame, idx: Indexes, result: IngestResult, stamp: str) -> pd.DataFrame:
+    raw = raw.rename(columns={"player_id": "player"}).copy()
+    raw["ranking_date"] = _yyyymmdd(raw["ranking_date"])
+    raw = raw[[c for c in ["ranking_date", "rank", "player", "points"] if c in raw.columns]]
+    prepared = hub.prepare_rankings(raw.copy())
+    prepared["_row"] = np.arange(len(prepared))
+    prepared = validate_rankings(prepared, result.report, table="ingest_rankings")
+    prepared = _keep_known(prepared, idx.known_rankings(prepared), "ingest_rankings", ["ranking_date", "player_id"], result.report)
+    kept = raw.iloc[prepared["_row"].to_numpy()]
+    prepared = prepared.drop(columns="_row")
+    if kept.empty:
+        return prepared
+    with span("append_parts", rows=len(kept)):
+        _write_part(hub, "rankings", kept, stamp, result)
+    with span("update_indexes", rows=len(prepared)):
+        idx.apply_rankings(prepared)
+    result.rankings += len(kept)
+    return prepared
+
+
+def ingest(hub: DataHub, drop_dir: Path | None = None, keep: bool = False, rebuild: bool = False, store: Path | None = None) -> IngestResult:
+    """
+    Ingests every CSV/JSONL file of ``drop_dir`` (default <data-root>/incoming). Processed
+    files move to ``drop_dir/done`` unless ``keep``; the store at ``store`` gets the rows too when it exists.
+    """
+    start = time.perf_counter()
+    drop_dir = drop_dir or hub.root / DROP_DIR
+    result = IngestResult()
+    files = sorted(f for pattern in DROP_PATTERNS for f in drop_dir.glob(pattern)) if drop_dir.exists() else []
+    if not files and not rebuild:
+        result.seconds = time.perf_counter() - start
+        return result
+
+    idx, result.bootstrapped = load_or_build_indexes(hub, rebuild)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    new_matches, new_rankings, new_players = [], [], []
+
+    def history() -> pd.DataFrame:
+        # Committed history plus the matches of this run (their parts are still tmp files).
+        return pd.concat([hub.load_matches(), *new_matches], ignore_index=True)
+
+    for i, f in enumerate(files):
+        with span("read_drop_file"):
+            try:
+                raw = read_drop_file(f)
+            except (OSError, ValueError) as exc:
+                result.report.add(Issue(f.name, "unreadable", "error", 1, str(exc)))
+                result.rejected.append(f.name)
+                continue
+        kind = detect_kind(raw)
+        if kind is None:
+            result.report.add(Issue(f.name, "unknown_kind", "error", 1, "ni matchs (winner_id, loser_id, tourney_id) ni classements (ranking_date, rank, player)"))
+            result.rejected.append(f.name)
+            continue
+        file_stamp = f"{stamp}-{i:03d}"
+        if kind == "matches":
+            prepared, players = _ingest_matches(hub, raw, idx, result, file_stamp, history)
+            new_matches.append(prepared)
+            new_players.append(players)
+        else:
+            new_rankings.append(_ingest_rankings(hub, raw, idx, result, file_stamp))
+        result.files.append(f.name)
+
+    idx.meta["pending_parts"] = [p.relative_to(hub.root).as_posix() for p in result.parts]
+    idx.save(index_dir(hub))
+    for part in result.parts:
+        part.with_name(part.name + ".tmp").replace(part)
+    # Moved last: after a crash the files are ingested again, and rows already indexed are skipped.
+    if not keep:
+        for name in result.files:
+            (drop_dir / "done").mkdir(exist_ok=True)
+            shutil.move(str(drop_dir / name), drop_dir / "done" / name)
+    if store is not None and store.exists() and (result.matches or result.rankings):
+        from store import append_rows
+        with span("append_store"):
+            append_rows(store, pd.concat(new_matches, ignore_index=True) if new_matches else None,
+                        pd.concat(new_rankings, ignore_index=True) if new_rankings else None,
+                        pd.concat(new_players, ignore_index=True) if new_players else None)
+    hub.players = None
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,319 @@
+"""
+TieBreaker match probability engine — point-by-point win probabilities.
+
+Converts per-player serve-point win probabilities into game, tiebreak, set and
+match win probabilities with a memoized dynamic program over score states.
+Every function accepts scalars or NumPy arrays (broadcast together), so a whole
+batch of matchups is evaluated in one pass; ``MatchProbabilityTable`` stores a
+precomputed grid for constant-time lookups when serving predictions.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+_EPS = 1e-9
+_TABLE_CACHE: dict[tuple[int, float, float, float], "MatchProbabilityTable"] = {}
+
+SetOutcomes = dict[tuple[bool, bool], Any]
+
+
+def _clip(p: Any) -> np.ndarray:
+    return np.clip(np.asarray(p, dtype=float), _EPS, 1.0 - _EPS)
+
+
+def _as_result(value: Any, shape: tuple[int, ...]) -> float | np.ndarray:
+    out = np.array(np.broadcast_to(value, shape), dtype=float)
+    return float(out) if out.ndim == 0 else out
+
+
+def _sets_to_win(best_of: int) -> int:
+    if best_of not in (3, 5):
+        raise ValueError(f"best_of doit valoir 3 ou 5 (reçu: {best_of})")
+    return best_of // 2 + 1
+
+
+def _game_from(p: np.ndarray, a: int, b: int, memo: dict[tuple[int, int], Any]) -> Any:
+    if a >= 3 and b >= 3:
+        diff = a - b
+        a, b = 3 + max(diff, 0), 3 + max(-diff, 0)
+    key = (a, b)
+    if key in memo:
+        return memo[key]
+    if a >= 4 and a - b >= 2:
+        value: Any = 1.0
+    elif b >= 4 and b - a >= 2:
+        value = 0.0
+    elif a == 3 and b == 3:
+        value = p * p / (p * p + (1.0 - p) * (1.0 - p))
+    else:
+        value = p * _game_from(p, a + 1, b, memo) + (1.0 - p) * _game_from(p, a, b + 1, memo)
+    memo[key] = value
+    return value
+
+
+def _tiebreak_from(p_first: np.ndarray, p_second: np.ndarray, a: int, b: int, memo: dict[tuple[int, int], Any]) -> Any:
+    # The serve order repeats every 4 points, so long tiebreaks fold back onto known states.
+    while a >= 8 and b >= 8:
+        a, b = a - 2, b - 2
+    key = (a, b)
+    if key in memo:
+        return memo[key]
+    if a >= 7 and a - b >= 2:
+        value: Any = 1.0
+    elif b >= 7 and b - a >= 2:
+        value = 0.0
+    elif a == b and a >= 6:
+        win_pair = p_first * (1.0 - p_second)
+        lose_pair = (1.0 - p_first) * p_second
+        value = win_pair / (win_pair + lose_pair)
+    else:
+        first_serves = ((a + b + 1) // 2) % 2 == 0
+        p_point = p_first if first_serves else 1.0 - p_second
+        value = p_point * _tiebreak_from(p_first, p_second, a + 1, b, memo) + (1.0 - p_point) * _tiebreak_from(p_first, p_second, a, b + 1, memo)
+    memo[key] = value
+    return value
+
+
+def _set_over(a: int, b: int) -> bool:
+    return (max(a, b) >= 6 and abs(a - b) >= 2) or max(a, b) == 7
+
+
+def _set_outcomes(p_a: np.ndarray, p_b: np.ndarray, a_serves: bool, games_a: int = 0, games_b: int = 0, first_win: Any = None) -> SetOutcomes:
+    """
+    Distribution of set endings keyed by (A wins the set, A serves first in the next set).
+
+    ``a_serves`` is the server of the game at (games_a, games_b) — at 6-6 the first
+    server of the tiebreak. ``first_win`` overrides A's probability of winning that
+    first game (used for live states where the game is already in progress).
+    """
+    hold_a = _game_from(p_a, 0, 0, {})
+    hold_b = _game_from(p_b, 0, 0, {})
+    tb_a_first = _tiebreak_from(p_a, p_b, 0, 0, {})
+    tb_b_first = 1.0 - _tiebreak_from(p_b, p_a, 0, 0, {})
+
+    outcomes: SetOutcomes = {(True, True): 0.0, (True, False): 0.0, (False, True): 0.0, (False, False): 0.0}
+    start = games_a + games_b
+    frontier: dict[tuple[int, int], Any] = {(games_a, games_b): 1.0}
+    while frontier:
+        following: dict[tuple[int, int], Any] = {}
+        for (ga, gb), mass in frontier.items():
+            a_srv = a_serves if (ga + gb - start) % 2 == 0 else not a_serves
+            if first_win is not None and (ga, gb) == (games_a, games_b):
+                win = first_win
+            elif ga == 6 and gb == 6:
+                win = tb_a_first if a_srv else tb_b_first
+            else:
+                win = hold_a if a_srv else 1.0 - hold_b
+            if ga == 6 and gb == 6:
+                outcomes[(True, not a_srv)] = outcomes[(True, not a_srv)] + mass * win
+                outcomes[(False, not a_srv)] = outcomes[(False, not a_srv)] + mass * (1.0 - win)
+                continue
+            for state, m in (((ga + 1, gb), mass * win), ((ga, gb + 1), mass * (1.0 - win))):
+                if _set_over(*state):
+                    key = (state[0] > state[1], not a_srv)
+                    outcomes[key] = outcomes[key] + m
+                else:
+                    following[state] = following.get(state, 0.0) + m
+        frontier = following
+    return outcomes
+
+
+def _match_from(p_a: np.ndarray, p_b: np.ndarray, sets_a: int, sets_b: int, a_serves: bool, need: int, memo: dict[tuple[int, int, bool], Any], set_memo: dict[bool, SetOutcomes]) -> Any:
+    if sets_a >= need:
+        return 1.0
+    if sets_b >= need:
+        return 0.0
+    key = (sets_a, sets_b, a_serves)
+    if key in memo:
+        return memo[key]
+    outcomes = set_memo.get(a_serves)
+    if outcomes is None:
+        outcomes = _set_outcomes(p_a, p_b, a_serves)
+        set_memo[a_serves] = outcomes
+    value: Any = 0.0
+    for (a_won, next_a_serves), prob in outcomes.items():
+        nxt = _match_from(p_a, p_b, sets_a + int(a_won), sets_b + int(not a_won), next_a_serves, need, memo, set_memo)
+        value = value + prob * nxt
+    memo[key] = value
+    return value
+
+
+def game_win_probability(p_serve: Any, points: tuple[int, int] = (0, 0)) -> float | np.ndarray:
+    """
+    Probability that the server wins the game from ``points`` (server, returner).
+    """
+    p = _clip(p_serve)
+    return _as_result(_game_from(p, points[0], points[1], {}), p.shape)
+
+
+def tiebreak_win_probability(p_a: Any, p_b: Any, points: tuple[int, int] = (0, 0), a_serves_first: bool = True) -> float | np.ndarray:
+    """
+    Probability that A wins a 7-point tiebreak from ``points`` (A, B).
+    """
+    pa, pb = np.broadcast_arrays(_clip(p_a), _clip(p_b))
+    if a_serves_first:
+        value = _tiebreak_from(pa, pb, points[0], points[1], {})
+    else:
+        value = 1.0 - _tiebreak_from(pb, pa, points[1], points[0], {})
+    return _as_result(value, pa.shape)
+
+
+def set_win_probability(p_a: Any, p_b: Any, a_serves_first: bool = True, games: tuple[int, int] = (0, 0)) -> float | np.ndarray:
+    """
+    Probability that A wins a tiebreak set from ``games`` (A, B), ``a_serves_first``
+    meaning A serves the game at that score.
+    """
+    pa, pb = np.broadcast_arrays(_clip(p_a), _clip(p_b))
+    outcomes = _set_outcomes(pa, pb, a_serves_first, games[0], games[1])
+    return _as_result(outcomes[(True, True)] + outcomes[(True, False)], pa.shape)
+
+
+def match_win_probability(p_a: Any, p_b: Any, best_of: int = 3, a_serves_first: bool | None = None) -> float | np.ndarray:
+    """
+    Probability that A wins the match given each player's serve-point win probability.
+
+    With ``a_serves_first=None`` the toss is unknown and both orders are averaged.
+    """
+    need = _sets_to_win(best_of)
+    pa, pb = np.broadcast_arrays(_clip(p_a), _clip(p_b))
+    memo: dict[tuple[int, int, bool], Any] = {}
+    set_memo: dict[bool, SetOutcomes] = {}
+    if a_serves_first is None:
+        value = 0.5 * (_match_from(pa, pb, 0, 0, True, need, memo, set_memo) + _match_from(pa, pb, 0, 0, False, need, memo, set_memo))
+    else:
+        value = _match_from(pa, pb, 0, 0, a_serves_first, need, memo, set_memo)
+    return _as_result(value, pa.shape)
+
+
+def live_match_win_probability(
+    p_a: Any,
+    p_b: Any,
+    best_of: int = 3,
+    sets: tuple[int, int] = (0, 0),
+    games: tuple[int, int] = (0, 0),
+    points: tuple[int, int] = (0, 0),
+    a_serving: bool = True,
+) -> float | np.ndarray:
+    """
+    Probability that A wins the match from an in-progress score.
+
+    ``sets``, ``games`` and ``points`` are (A, B) counts; points are raw point counts
+    (0, 1, 2, 3, ... rather than 0/15/30/40), tiebreak points when games are 6-6.
+    ``a_serving`` tells whether A serves the next point.
+    """
+    need = _sets_to_win(best_of)
+    pa, pb = np.broadcast_arrays(_clip(p_a), _clip(p_b))
+    if sets[0] >= need or sets[1] >= need:
+        return _as_result(1.0 if sets[0] >= need else 0.0, pa.shape)
+
+    if games == (6, 6):
+        # a_serves passed to the set DP is the first server of the tiebreak.
+        n = points[0] + points[1]
+        a_first = a_serving if ((n + 1) // 2) % 2 == 0 else not a_serving
+        if a_first:
+            first_win = _tiebreak_from(pa, pb, points[0], points[1], {})
+        else:
+            first_win = 1.0 - _tiebreak_from(pb, pa, points[1], points[0], {})
+        a_serves = a_first
+    else:
+        if a_serving:
+            first_win = _game_from(pa, points[0], points[1], {})
+        else:
+            first_win = 1.0 - _game_from(pb, points[1], points[0], {})
+        a_serves = a_serving
+
+    outcomes = _set_outcomes(pa, pb, a_serves, games[0], games[1], first_win=first_win)
+    memo: dict[tuple[int, int, bool], Any] = {}
+    set_memo: dict[bool, SetOutcomes] = {}
+    value: Any = 0.0
+    for (a_won, next_a_serves), prob in outcomes.items():
+        nxt = _match_from(pa, pb, sets[0] + int(a_won), sets[1] + int(not a_won), next_a_serves, need, memo, set_memo)
+        value = value + prob * nxt
+    return _as_result(value, pa.shape)
+
+
+@dataclass(slots=True)
+class MatchProbabilityTable:
+    best_of: int
+    lo: float
+    step: float
+    values: np.ndarray
+
+    @classmethod
+    def build(cls, best_of: int = 3, lo: float = 0.30, hi: float = 0.95, step: float = 0.005) -> "MatchProbabilityTable":
+        grid = lo + step * np.arange(int(round((hi - lo) / step)) + 1)
+        pa, pb = np.meshgrid(grid, grid, indexing="ij")
+        values = np.asarray(match_win_probability(pa, pb, best_of=best_of))
+        return cls(best_of=best_of, lo=lo, step=step, values=values)
+
+    def lookup(self, p_a: Any, p_b: Any) -> float | np.ndarray:
+        """
+        Bilinear interpolation on the grid; inputs outside it are clamped to its edges.
+        """
+        n = self.values.shape[0]
+        pa, pb = np.broadcast_arrays(np.asarray(p_a, dtype=float), np.asarray(p_b, dtype=float))
+        x = np.clip((pa - self.lo) / self.step, 0, n - 1)
+        y = np.clip((pb - self.lo) / self.step, 0, n - 1)
+        i = np.minimum(np.floor(x).astype(int), n - 2)
+        j = np.minimum(np.floor(y).astype(int), n - 2)
+        tx = x - i
+        ty = y - j
+        v = self.values
+        value = (
+            v[i, j] * (1 - tx) * (1 - ty)
+            + v[i + 1, j] * tx * (1 - ty)
+            + v[i, j + 1] * (1 - tx) * ty
+            + v[i + 1, j + 1] * tx * ty
+        )
+        return _as_result(value, pa.shape)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, best_of=self.best_of, lo=self.lo, step=self.step, values=self.values)
+
+    @classmethod
+    def load(cls, path: Path) -> "MatchProbabilityTable":
+        with np.load(path) as data:
+            return cls(best_of=int(data["best_of"]), lo=float(data["lo"]), step=float(data["step"]), values=data["values"])
+
+
+def get_probability_table(best_of: int = 3, lo: float = 0.30, hi: float = 0.95, step: float = 0.005) -> MatchProbabilityTable:
+    key = (best_of, lo, hi, step)
+    table = _TABLE_CACHE.get(key)
+    if table is None:
+        table = MatchProbabilityTable.build(best_of=best_of, lo=lo, hi=hi, step=step)
+        _TABLE_CACHE[key] = table
+    return table
+
+
+def convert_best_of(prob: Any, from_best_of: int = 3, to_best_of: int = 5, base_serve: float = 0.64) -> float | np.ndarray:
+    """
+    Maps a match win probability between formats by inverting it to a symmetric
+    serve-point edge around ``base_serve`` and replaying that edge in the other format.
+    """
+    delta = np.linspace(-0.3, 0.3, 601)
+    src = np.asarray(match_win_probability(base_serve + delta, base_serve - delta, best_of=from_best_of))
+    dst = np.asarray(match_win_probability(base_serve + delta, base_serve - delta, best_of=to_best_of))
+    prob_arr = np.asarray(prob, dtype=float)
+    return _as_result(np.interp(prob_arr, src, dst), prob_arr.shape)
+
+
+def serve_point_probabilities(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    Serve-point win rates per match from the ATP stat columns (w_/l_ svpt, 1stWon, 2ndWon).
+    """
+    out = pd.DataFrame(index=matches.index)
+    for side, prefix in (("winner", "w_"), ("loser", "l_")):
+        cols = [f"{prefix}svpt", f"{prefix}1stWon", f"{prefix}2ndWon"]
+        if not all(c in matches.columns for c in cols):
+            out[f"{side}_serve_p"] = np.nan
+            continue
+        svpt, first_won, second_won = (pd.to_numeric(matches[c], errors="coerce") for c in cols)
+        out[f"{side}_serve_p"] = (first_won + second_won) / svpt.where(svpt > 0)
+    return out
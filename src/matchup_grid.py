@@ -0,0 +1,430 @@
+"""
+TieBreaker matchup grids — N×N win probabilities for a field of players at a date.
+
+``GridService.warm`` loads the cached Elo and serve feature groups once and
+indexes every player's match history by (player, chronological position).
+A grid then costs one binary search per player to read each player's state
+before the date (Elo advanced by their last result, surface Elo, form over
+the last 10 matches, serve/return rates), a broadcast of those vectors to
+all pairs and a batched scoring of the upper triangle; the lower triangle is
+its complement. Grids are kept in an LRU cache keyed by date, surface, model
+version, format and field. ``grid_async`` runs grids on a thread pool and
+coalesces identical in-flight requests, and ``serve`` exposes it over HTTP
+with asyncio (``GET /grid?date=2024-06-01&surface=Clay&top=100``).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from elo import ELO_START, SURFACES, elo_k
+from features import FeatureStore
+from match_probability import get_probability_table
+from models import DataHub
+from profiling import span
+
+
+GRID_CACHE_SIZE = 32
+# Largest field per grid (top or explicit players): the grid holds n×n probabilities.
+MAX_GRID_PLAYERS = 500
+BATCH_PAIRS = 65_536
+FORM_WINDOW = 10
+ACTIVE_DAYS = 365
+RANK_WINDOW_DAYS = 365
+HISTORY_GROUPS = ["elo", "serve"]
+
+
+@dataclass(slots=True, frozen=True)
+class GridModel:
+    """
+    Blend of a surface-weighted Elo logistic and the serve/return point model
+    (``match_probability``) fed with each side's recent serve and return rates.
+    """
+    version: str = "elo-serve-1"
+    elo_weight: float = 0.5
+    surface_weight: float = 0.5
+    serve_avg: float = 0.64
+
+    def score(self, a: dict[str, np.ndarray], b: dict[str, np.ndarray], best_of: int) -> np.ndarray:
+        """
+        P(a beats b) for aligned arrays of player states.
+        """
+        ra, rb = self._rating(a), self._rating(b)
+        p_elo = 1.0 / (1.0 + 10 ** ((rb - ra) / 400.0))
+        return_avg = 1.0 - self.serve_avg
+        serve_a = self.serve_avg + (a["serve_p"] - self.serve_avg) - (b["return_p"] - return_avg)
+        serve_b = self.serve_avg + (b["serve_p"] - self.serve_avg) - (a["return_p"] - return_avg)
+        missing = np.isnan(serve_a) | np.isnan(serve_b)
+        table = get_probability_table(best_of)
+        p_serve = np.asarray(table.lookup(np.where(missing, self.serve_avg, serve_a), np.where(missing, self.serve_avg, serve_b)))
+        p_serve = np.where(missing, np.nan, p_serve)
+        return np.where(np.isnan(p_serve), p_elo, self.elo_weight * p_elo + (1 - self.elo_weight) * p_serve)
+
+    def _rating(self, s: dict[str, np.ndarray]) -> np.ndarray:
+        surface = s["elo_surface"]
+        return np.where(np.isnan(surface), s["elo"], (1 - self.surface_weight) * s["elo"] + self.surface_weight * surface)
+
+
+@dataclass(slots=True)
+class _SortedHistory:
+    """
+    Rows of one history grouped by player, chronological inside each player:
+    ``keys = player_code * n + position`` is strictly increasing.
+    """
+    n: int
+    keys: np.ndarray
+    rows: np.ndarray
+
+    @classmethod
+    def build(cls, codes: np.ndarray, mask: np.ndarray | None = None) -> _SortedHistory:
+        n = len(codes)
+        rows = np.arange(n) if mask is None else np.flatnonzero(mask)
+        keys = codes[rows].astype(np.int64) * n + rows
+        order = np.argsort(keys, kind="stable")
+        return cls(n=n, keys=keys[order], rows=rows[order])
+
+    def last_before(self, codes: np.ndarray, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        For each player code, the sorted position of its last row before ``end`` (and whether it exists).
+        """
+        pos = np.searchsorted(self.keys, codes.astype(np.int64) * self.n + end) - 1
+        ok = pos >= 0
+        ok[ok] = self.keys[pos[ok]] // self.n == codes[ok]
+        return pos, ok
+
+    def first_of(self, codes: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.keys, codes.astype(np.int64) * self.n)
+
+
+@dataclass(slots=True)
+class MatchupGrid:
+    date: pd.Timestamp
+    surface: str | None
+    best_of: int
+    model_version: str
+    players: pd.DataFrame
+    probabilities: np.ndarray
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per ordered pair: probability that player1 beats player2.
+        """
+        n = len(self.players)
+        i, j = np.nonzero(~np.eye(n, dtype=bool))
+        ids = self.players["player_id"].to_numpy()
+        names = self.players["name"].to_numpy()
+        return pd.DataFrame({
+            "player1_id": ids[i], "player1": names[i],
+            "player2_id": ids[j], "player2": names[j],
+            "probability": self.probabilities[i, j],
+        })
+
+    def to_dict(self, decimals: int = 4) -> dict[str, Any]:
+        probs = np.round(self.probabilities, decimals).astype(object)
+        probs[np.isnan(self.probabilities)] = None
+        players = self.players.astype(object).where(self.players.notna(), None)
+        return {
+            "date": self.date.date().isoformat(),
+            "surface": self.surface,
+            "best_of": self.best_of,
+            "model_version": self.model_version,
+            "players": players.to_dict("records"),
+            "probabilities": probs.tolist(),
+        }
+
+
+class GridService:
+    """
+    Grid computations over one data root. Call ``warm`` from the main thread before serving.
+    """
+
+    def __init__(self, hub: DataHub, model: GridModel | None = None, cache_size: int = GRID_CACHE_SIZE, threads: int = 4):
+        self.hub = hub
+        self.model = model or GridModel()
+        self.cache_size = cache_size
+        self.threads = threads
+        self._cache: OrderedDict[tuple, MatchupGrid] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._warm = False
+        self.hits = 0
+        self.misses = 0
+
+    def warm(self) -> None:
+        """
+        Materializes/loads the feature history, rankings and names. Not thread-safe: the
+        DataHub loaders cache their frames unlocked, so this must run before any grid is computed off-thread.
+        """
+        if self._warm:
+            return
+        store = FeatureStore(self.hub)
+        with span("grid_warm"):
+            history = store.assemble(HISTORY_GROUPS)
+            self._index_history(history)
+            with span("grid_rankings"):
+                r = self.hub.load_rankings()
+                ranks = pd.DataFrame({
+                    "player_id": pd.to_numeric(r["player_id"], errors="coerce"),
+                    "ranking_date": pd.to_datetime(r["ranking_date"], errors="coerce").astype("datetime64[ns]"),
+                    "rank": pd.to_numeric(r["rank"], errors="coerce"),
+                }).dropna()
+                self._rankings = ranks.sort_values("ranking_date", kind="stable")
+            players = self.hub.load_players().dropna(subset=["player_id"]).drop_duplicates("player_id")
+            self._names = pd.Series(players["full_name"].astype(str).to_numpy(), index=players["player_id"].astype("int64").to_numpy())
+            for best_of in (3, 5):
+                get_probability_table(best_of)
+        self._warm = True
+
+    def _index_history(self, h: pd.DataFrame) -> None:
+        with span("grid_index", rows=len(h)):
+            self._ids, codes = np.unique(h["player_id"].to_numpy("int64"), return_inverse=True)
+            self._dates = h["tourney_date"].to_numpy("datetime64[ns]")
+            # Chronological order puts undated matches first; as int64, NaT is the smallest value too.
+            self._date_ns = self._dates.view(np.int64)
+            won = h["won"].to_numpy("float64")
+            _check_pairs(h)
+            # Post-match Elo: the spine keeps each match's winner and loser rows adjacent.
+            elo = h["elo"].to_numpy("float64")
+            opp = elo.reshape(-1, 2)[:, ::-1].ravel()
+            expected = 1.0 / (1.0 + 10 ** ((opp - elo) / 400.0))
+            self._elo_post = elo + elo_k(h["elo_matches"].to_numpy("float64")) * (won - expected)
+            elo_s = h["elo_surface"].to_numpy("float64")
+            opp_s = elo_s.reshape(-1, 2)[:, ::-1].ravel()
+            expected_s = 1.0 / (1.0 + 10 ** ((opp_s - elo_s) / 400.0))
+            self._elo_surface_post = elo_s + elo_k(h["elo_surface_matches"].to_numpy("float64")) * (won - expected_s)
+            self._serve = h["serve_p_20"].to_numpy("float64")
+            self._return = h["return_p_20"].to_numpy("float64")
+            self._history = _SortedHistory.build(codes)
+            self._cum_won = np.r_[0.0, np.cumsum(won[self._history.rows])]
+            surfaces = h["surface"].to_numpy()
+            self._by_surface = {s: _SortedHistory.build(codes, surfaces == s) for s in SURFACES}
+
+    def player_states(self, when: pd.Timestamp, player_ids: np.ndarray, surface: str | None = None) -> pd.DataFrame:
+        """
+        Each player's state going into a match on ``when``: rank, Elo, surface Elo, form, serve/return rates.
+        """
+        ids = np.asarray(player_ids, dtype=np.int64)
+        end = int(np.searchsorted(self._date_ns, np.datetime64(when, "ns").astype(np.int64), side="left"))
+        codes = np.searchsorted(self._ids, ids).clip(max=len(self._ids) - 1)
+        known = self._ids[codes] == ids
+        hist = self._history
+        pos, ok = hist.last_before(codes, end)
+        ok &= known
+        row = hist.rows[np.where(ok, pos, 0)]
+        start = hist.first_of(codes)
+        window_start = np.maximum(start, pos + 1 - FORM_WINDOW)
+        played = np.where(ok, pos + 1 - window_start, 0)
+        wins = self._cum_won[np.where(ok, pos + 1, 0)] - self._cum_won[np.where(ok, window_start, 0)]
+        states = pd.DataFrame({
+            "player_id": ids,
+            "name": pd.Series(ids).map(self._names).to_numpy(),
+            "rank": self._rank_at(when, ids),
+            "elo": np.where(ok, self._elo_post[row], ELO_START),
+            "elo_surface": np.nan,
+            "form": np.where(played > 0, wins / np.maximum(played, 1), np.nan),
+            "serve_p": np.where(ok, self._serve[row], np.nan),
+            "return_p": np.where(ok, self._return[row], np.nan),
+            "matches": np.where(ok, pos + 1 - start, 0),
+            "last_match": np.where(ok, self._dates[row], np.datetime64("NaT")),
+        })
+        if surface in self._by_surface:
+            by_s = self._by_surface[surface]
+            pos_s, ok_s = by_s.last_before(codes, end)
+            ok_s &= known
+            states["elo_surface"] = np.where(ok_s, self._elo_surface_post[by_s.rows[np.where(ok_s, pos_s, 0)]], np.nan)
+        return states
+
+    def _rank_at(self, when: pd.Timestamp, ids: np.ndarray) -> np.ndarray:
+        r = self._rankings
+        dates = r["ranking_date"].to_numpy()
+        lo = np.searchsorted(dates, np.datetime64(when - pd.Timedelta(days=RANK_WINDOW_DAYS), "ns"), side="left")
+        hi = np.searchsorted(dates, np.datetime64(when, "ns"), side="right")
+        latest = r.iloc[lo:hi].drop_duplicates("player_id", keep="last").set_index("player_id")["rank"]
+        return pd.Series(ids).map(latest).to_numpy("float64")
+
+    def field_ids(self, when: pd.Timestamp, top: int) -> np.ndarray:
+        """
+        The ``top`` best-ranked players at ``when``, completed by Elo among players active in the
+        previous year when the rankings do not cover the date.
+        """
+        r = self._rankings
+        dates = r["ranking_date"].to_numpy()
+        lo = np.searchsorted(dates, np.datetime64(when - pd.Timedelta(days=RANK_WINDOW_DAYS), "ns"), side="left")
+        hi = np.searchsorted(dates, np.datetime64(when, "ns"), side="right")
+        latest = r.iloc[lo:hi].drop_duplicates("player_id", keep="last").sort_values("rank", kind="stable")
+        ranked = latest["player_id"].astype("int64").to_numpy()[:top]
+        if len(ranked) >= top:
+            return ranked
+        states = self.player_states(when, self._ids)
+        active = states[(states["last_match"] >= when - pd.Timedelta(days=ACTIVE_DAYS)) & ~states["player_id"].isin(ranked)]
+        extra = active.sort_values("elo", ascending=False, kind="stable")["player_id"].to_numpy()[:top - len(ranked)]
+        return np.r_[ranked, extra].astype(np.int64)
+
+    def cache_key(self, when: pd.Timestamp, surface: str | None, best_of: int, top: int, players: list[int] | None) -> tuple:
+        universe = ("players", tuple(players)) if players else ("top", top)
+        return (when.date().isoformat(), surface or "all", self.model.version, best_of, universe)
+
+    def grid(self, when: Any = None, surface: str | None = None, top: int = 100, players: list[int] | None = None, best_of: int = 3) -> MatchupGrid:
+        """
+        Win probability of every row player against every column player (diagonal NaN).
+        Safe to call from several threads once ``warm`` has run.
+        """
+        when, surface = _normalize_request(when, surface, best_of, top, players)
+        self.warm()
+        key = self.cache_key(when, surface, best_of, top, players)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        ids = np.asarray(players, dtype=np.int64) if players else self.field_ids(when, top)
+        states = self.player_states(when, ids, surface)
+        result = MatchupGrid(when, surface, best_of, self.model.version, states.drop(columns=["last_match"]), self._score(states, best_of))
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _score(self, states: pd.DataFrame, best_of: int) -> np.ndarray:
+        n = len(states)
+        cols = {c: states[c].to_numpy("float64") for c in ("elo", "elo_surface", "serve_p", "return_p")}
+        probs = np.full((n, n), np.nan)
+        iu, ju = np.triu_indices(n, 1)
+        for start in range(0, len(iu), BATCH_PAIRS):
+            i, j = iu[start:start + BATCH_PAIRS], ju[start:start + BATCH_PAIRS]
+            p = self.model.score({c: v[i] for c, v in cols.items()}, {c: v[j] for c, v in cols.items()}, best_of)
+            probs[i, j] = p
+            probs[j, i] = 1.0 - p
+        return probs
+
+    async def grid_async(self, when: Any = None, surface: str | None = None, top: int = 100, players: list[int] | None = None, best_of: int = 3) -> MatchupGrid:
+        """
+        ``grid`` on the service's thread pool; concurrent requests for the same grid share one computation.
+        """
+        when, surface = _normalize_request(when, surface, best_of, top, players)
+        if not self._warm:
+            raise RuntimeError("GridService.warm() doit être appelé avant grid_async")
+        key = self.cache_key(when, surface, best_of, top, players)
+        fut = self._inflight.get(key)
+        if fut is None:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="grid")
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self._executor, lambda: self.grid(when, surface, top, players, best_of))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def _check_pairs(h: pd.DataFrame) -> None:
+    """
+    The history must hold (winner, loser) row pairs of the same match, as the spine writes them.
+    """
+    if len(h) % 2:
+        raise ValueError(f"Historique de features incohérent: {len(h)} lignes, nombre pair attendu (gagnant, perdant)")
+    same = np.ones(len(h) // 2, dtype=bool)
+    for c in ("tourney_id", "match_num"):
+        v = h[c].to_numpy()
+        same &= v[0::2] == v[1::2]
+    side = h["side"].to_numpy()
+    same &= (side[0::2] == "winner") & (side[1::2] == "loser")
+    if not same.all():
+        i = 2 * int(np.flatnonzero(~same)[0])
+        raise ValueError(f"Historique de features incohérent: lignes {i} et {i + 1} ne forment pas un match (gagnant, perdant)")
+
+
+def _normalize_request(when: Any, surface: str | None, best_of: int, top: int = 100,
+                       players: list[int] | None = None) -> tuple[pd.Timestamp, str | None]:
+    ts = pd.Timestamp(date.today() if when is None else when).normalize()
+    if pd.isna(ts):
+        raise ValueError(f"Date invalide: {when}")
+    if surface:
+        surface = surface.strip().title()
+        if surface not in SURFACES:
+            raise ValueError(f"Surface inconnue: {surface} (attendu: {', '.join(SURFACES)})")
+    if best_of not in (3, 5):
+        raise ValueError(f"best_of doit valoir 3 ou 5 (reçu: {best_of})")
+    if players:
+        if len(players) > MAX_GRID_PLAYERS:
+            raise ValueError(f"Au plus {MAX_GRID_PLAYERS} joueurs par grille (reçu: {len(players)})")
+    elif not 1 <= top <= MAX_GRID_PLAYERS:
+        raise ValueError(f"top doit être compris entre 1 et {MAX_GRID_PLAYERS} (reçu: {top})")
+    return ts, surface or None
+
+
+def matchup_grid(hub: DataHub, when: Any = None, surface: str | None = None, top: int = 100, players: list[int] | None = None, best_of: int = 3) -> MatchupGrid:
+    """
+    One-shot grid; keep a ``GridService`` around to benefit from its cache.
+    """
+    return GridService(hub).grid(when, surface, top, players, best_of)
+
+
+def _http_response(status: str, payload: dict[str, Any]) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode()
+    head = f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    return head.encode() + body
+
+
+async def _handle(service: GridService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = (await reader.readline()).decode("latin-1").split()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        url = urlsplit(request[1] if len(request) > 1 else "/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if len(request) < 2 or request[0] != "GET":
+            response = _http_response("405 Method Not Allowed", {"error": "GET uniquement"})
+        elif url.path == "/health":
+            response = _http_response("200 OK", {"status": "ok", "cache": len(service._cache), "hits": service.hits, "misses": service.misses})
+        elif url.path != "/grid":
+            response = _http_response("404 Not Found", {"error": f"chemin inconnu: {url.path}"})
+        else:
+            try:
+                players = [int(p) for p in params["players"].split(",")] if params.get("players") else None
+                grid = await service.grid_async(params.get("date"), params.get("surface"), int(params.get("top", 100)), players, int(params.get("best_of", 3)))
+                response = _http_response("200 OK", grid.to_dict())
+            except ValueError as exc:
+                response = _http_response("400 Bad Request", {"error": str(exc)})
+            except Exception:
+                # Keep serving: the client gets a JSON 500, the details go to stderr.
+                traceback.print_exc(file=sys.stderr)
+                response = _http_response("500 Internal Server Error", {"error": "erreur interne"})
+        writer.write(response)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(service: GridService, host: str = "127.0.0.1", port: int = 8765) -> None:
+    """
+    Serves ``GET /grid?date=&surface=&top=&players=&best_of=`` and ``GET /health`` until cancelled.
+    """
+    service.warm()
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
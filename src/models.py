@@ -5,18 +5,129 @@
 ## models
 ##
 
+import hashlib
+import os
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
 from parser import parse_rank_date_col
+from profiling import span
+from validation import ValidationReport, validate_matches, validate_rankings
 
 # class DecisionTreeModel:
 
+def team_key(id1, id2) -> str | None:
+    """
+    Order-independent key of a doubles pairing ("smaller_id-larger_id").
+    """
+    if pd.isna(id1) or pd.isna(id2):
+        return None
+    a, b = sorted((int(id1), int(id2)))
+    return f"{a}-{b}"
+
+INGESTED_DIR = Path("processed") / "ingested"
+SOURCE_KINDS = ("players", "rankings", "matches")
+
 class DataHub:
-    def __init__(self, data_root: Path):
+    def __init__(self, data_root: Path, cache: bool = True, workers: int | None = None, validate: bool = True):
         self.root = data_root
         self.players = None
+        self.cache = cache
+        self.workers = workers
+        self.validate = validate
+        self.report = ValidationReport()
+
+    def cache_path(self, f: Path) -> Path:
+        return self.root / "processed" / "cache" / f.relative_to(self.root).with_suffix(".parquet")
+
+    def _read_csv(self, f: Path, header_width: bool = False) -> pd.DataFrame:
+        """
+        Reads one source CSV through the columnar cache: a Parquet copy under
+        processed/cache/, reused while it is newer than the CSV. ``header_width``
+        drops the trailing empty fields some rows carry beyond the header.
+        """
+        def read() -> pd.DataFrame:
+            if header_width:
+                n = len(pd.read_csv(f, nrows=0).columns)
+                return pd.read_csv(f, low_memory=False, usecols=range(n))
+            return pd.read_csv(f, low_memory=False)
+
+        if not self.cache:
+            return read()
+        c = self.cache_path(f)
+        try:
+            if c.exists() and c.stat().st_mtime_ns >= f.stat().st_mtime_ns:
+                return pd.read_parquet(c)
+        except (OSError, ValueError) as exc:
+            # Unreadable copy (truncated write, other pyarrow version): parse the CSV and rewrite it.
+            print(f"Cache illisible, relu depuis le CSV ({c}): {exc}", file=sys.stderr)
+        df = read()
+        try:
+            c.parent.mkdir(parents=True, exist_ok=True)
+            tmp = c.with_name(c.name + ".tmp")
+            df.to_parquet(tmp, index=False)
+            tmp.replace(c)
+        except OSError as exc:
+            print(f"Cache non écrit, le CSV sera relu au prochain lancement ({c}): {exc}", file=sys.stderr)
+        return df
+
+    def source_files(self, include_ingested: bool = True, kinds: tuple[str, ...] = SOURCE_KINDS) -> list[Path]:
+        """
+        Every singles, rankings and players file the loaders read (only ``kinds``;
+        "doubles" adds the doubles files, which the default fingerprints leave out).
+        """
+        root = self.root
+        files = []
+        if "players" in kinds:
+            files.append(root / "atp_player" / "atp_players.csv")
+        if "rankings" in kinds:
+            files.append(root / "atp_current_ranking" / "atp_rankings_current.csv")
+            files += sorted((root / "atp_old_ranking").glob("atp_rankings_*s.csv"))
+        if "matches" in kinds:
+            files += sorted(p for p in (root / "atp_matches").glob("atp_matches_*.csv") if "_doubles_" not in p.name)
+        if "doubles" in kinds:
+            files += sorted((root / "atp_matches").glob("atp_matches_doubles_*.csv"))
+        if include_ingested:
+            for kind in kinds:
+                files += self.ingested_files(kind)
+        return [f for f in files if f.exists()]
+
+    def fingerprint(self, salt: str = "", include_ingested: bool = True, kinds: tuple[str, ...] = SOURCE_KINDS) -> str:
+        """
+        Hash of ``salt`` and of each source file's path, size and mtime: changes whenever the data does.
+        """
+        h = hashlib.sha1(salt.encode())
+        for f in self.source_files(include_ingested, kinds):
+            st = f.stat()
+            h.update(f"{f.relative_to(self.root)}:{st.st_size}:{st.st_mtime_ns}".encode())
+        return h.hexdigest()
+
+    def ingested_files(self, kind: str, years: list[int] | None = None) -> list[Path]:
+        """
+        Parquet parts appended by ``./TieBreaker ingest`` (processed/ingested/<kind>/),
+        read after the CSVs. Match parts carry their year in the name: matches_<year>_<stamp>.parquet.
+        """
+        d = self.root / INGESTED_DIR / kind
+        if not d.exists():
+            return []
+        files = sorted(d.glob(f"{kind}_*.parquet"))
+        if years and kind == "matches":
+            wanted = {str(y) for y in years}
+            files = [f for f in files if f.stem.split("_")[1] in wanted]
+        return files
+
+    def _read_ingested(self, kind: str, years: list[int] | None = None) -> list[pd.DataFrame]:
+        return [pd.read_parquet(f) for f in self.ingested_files(kind, years)]
+
+    def _read_csvs(self, files: list[Path], header_width: bool = False) -> list[pd.DataFrame]:
+        if len(files) <= 1:
+            return [self._read_csv(f, header_width) for f in files]
+        workers = self.workers or min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return list(ex.map(lambda f: self._read_csv(f, header_width), files))
 
     def load_players(self) -> pd.DataFrame:
         if self.players is not None:
@@ -24,7 +135,19 @@ class DataHub:
         p = self.root / "atp_player" / "atp_players.csv"
         if not p.exists():
             raise FileNotFoundError(f"Fichier introuvable: {p}")
-        df = pd.read_csv(p, low_memory=False)
+        with span("load_players") as sp:
+            df = self._load_players_csv(p)
+            sp.rows = len(df)
+        self.players = df
+        return df
+
+    def _load_players_csv(self, p: Path) -> pd.DataFrame:
+        with span("read_csv") as sp:
+            df = self._read_csv(p)
+            extra = self._read_ingested("players")
+            if extra:
+                df = pd.concat([df, *extra], ignore_index=True)
+            sp.rows = len(df)
         cols = {c.lower(): c for c in df.columns}
         first = cols.get("name_first") or cols.get("firstname") or cols.get("first_name")
         last = cols.get("name_last") or cols.get("lastname") or cols.get("last_name")
@@ -40,26 +163,39 @@ class DataHub:
             raise ValueError("Colonne player_id introuvable dans atp_players.csv")
         df = df.rename(columns={pid_col: "player_id"})
         df["player_id"] = pd.to_numeric(df["player_id"], errors="coerce").astype("Int64")
-        self.players = df
         return df
 
     def load_rankings(self) -> pd.DataFrame:
+        with span("load_rankings") as sp:
+            df = self._load_rankings()
+            if self.validate:
+                df = validate_rankings(df, self.report)
+            sp.rows = len(df)
+        return df
+
+    def _load_rankings(self) -> pd.DataFrame:
         parts = []
         cur = self.root / "atp_current_ranking" / "atp_rankings_current.csv"
         old = self.root / "atp_old_ranking"
-        if cur.exists():
-            parts.append(pd.read_csv(cur, low_memory=False))
-        if old.exists():
-            for f in sorted(old.glob("atp_rankings_*s.csv")):
-                parts.append(pd.read_csv(f, low_memory=False))
+        with span("read_csv") as sp:
+            files = [cur] if cur.exists() else []
+            if old.exists():
+                files += sorted(old.glob("atp_rankings_*s.csv"))
+            parts = self._read_csvs(files) + self._read_ingested("rankings")
+            sp.rows = sum(len(x) for x in parts)
         if not parts:
             raise FileNotFoundError("Aucun fichier de ranking trouvé sous data/atp_current_ranking ou data/atp_old_ranking")
+        return self.prepare_rankings(pd.concat(parts, ignore_index=True))
 
-        df = pd.concat(parts, ignore_index=True)
+    def prepare_rankings(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Raw ranking rows (CSV columns) to the loader's schema: parsed dates, player_id, Int64 rank/points.
+        """
         cols = {c.lower(): c for c in df.columns}
         rd = cols.get("ranking_date") or "ranking_date"
         if rd in df.columns:
-            df["ranking_date"] = parse_rank_date_col(df[rd])
+            with span("parse_dates"):
+                df["ranking_date"] = parse_rank_date_col(df[rd])
 
         rename = {}
         if "player" in cols:
@@ -87,6 +223,14 @@ class DataHub:
         return df
 
     def load_matches(self, years: list[int] | None = None) -> pd.DataFrame:
+        with span("load_matches") as sp:
+            df = self._load_matches(years)
+            if self.validate:
+                df = validate_matches(df, self.report)
+            sp.rows = len(df)
+        return df
+
+    def _load_matches(self, years: list[int] | None = None) -> pd.DataFrame:
         matches_dir = self.root / "atp_matches"
         files = []
         if years:
@@ -95,12 +239,33 @@ class DataHub:
                 if f.exists():
                     files.append(f)
         else:
-            files = [p for p in matches_dir.glob("atp_matches_*.csv") if re.search(r"\d{4}\.csv$", p.name)]
-        if not files:
+            files = [p for p in matches_dir.glob("atp_matches_*.csv") if re.search(r"\d{4}\.csv$", p.name) and "_doubles_" not in p.name]
+        ingested = self.ingested_files("matches", years)
+        if not files and not ingested:
             raise FileNotFoundError("Aucun fichier de matches singles trouvé (atp_matches_YYYY.csv).")
 
-        dfs = [pd.read_csv(f, low_memory=False) for f in sorted(files)]
-        df = pd.concat(dfs, ignore_index=True)
+        with span("read_csv") as sp:
+            dfs = self._read_csvs(sorted(files)) + [pd.read_parquet(f) for f in ingested]
+            sp.rows = sum(len(x) for x in dfs)
+        with span("concat"):
+            df = pd.concat(dfs, ignore_index=True)
+        return self.prepare_matches(df)
+
+    def prepare_matches(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Raw singles rows (CSV columns) to the loader's schema: parsed tourney_date, text columns as str.
+        """
+        df = self._parse_tourney_dates(df)
+        cols = {c.lower(): c for c in df.columns}
+        for k in ["winner_name", "loser_name", "tourney_name", "round", "score", "surface", "minutes", "best_of"]:
+            if k not in df.columns and k in cols:
+                df = df.rename(columns={cols[k]: k})
+        for k in ["winner_name", "loser_name", "tourney_name", "round", "score", "surface"]:
+            if k in df.columns:
+                df[k] = df[k].astype(str)
+        return df
+
+    def _parse_tourney_dates(self, df: pd.DataFrame) -> pd.DataFrame:
         cols = {c.lower(): c for c in df.columns}
         tdate = cols.get("tourney_date") or "tourney_date"
         if tdate in df.columns:
@@ -113,11 +278,42 @@ class DataHub:
                         return pd.to_datetime(v, errors="coerce").date()
                     except Exception:
                         return pd.NaT
-            df["tourney_date"] = df[tdate].apply(parse_date)
-        for k in ["winner_name", "loser_name", "tourney_name", "round", "score", "surface", "minutes", "best_of"]:
-            if k not in df.columns and k in cols:
-                df = df.rename(columns={cols[k]: k})
-        for k in ["winner_name", "loser_name", "tourney_name", "round", "score", "surface"]:
+            with span("parse_dates"):
+                df["tourney_date"] = df[tdate].apply(parse_date)
+        return df
+
+    def load_doubles(self, years: list[int] | None = None) -> pd.DataFrame:
+        with span("load_doubles") as sp:
+            df = self._load_doubles(years)
+            sp.rows = len(df)
+        return df
+
+    def _load_doubles(self, years: list[int] | None = None) -> pd.DataFrame:
+        matches_dir = self.root / "atp_matches"
+        if years:
+            files = [f for f in (matches_dir / f"atp_matches_doubles_{y}.csv" for y in years) if f.exists()]
+        else:
+            files = list(matches_dir.glob("atp_matches_doubles_*.csv"))
+        if not files:
+            raise FileNotFoundError("Aucun fichier de matches doubles trouvé (atp_matches_doubles_YYYY.csv).")
+
+        with span("read_csv") as sp:
+            dfs = self._read_csvs(sorted(files), header_width=True)
+            sp.rows = sum(len(x) for x in dfs)
+        with span("concat"):
+            df = pd.concat(dfs, ignore_index=True)
+        df = self._parse_tourney_dates(df)
+        for k in ["winner1_id", "winner2_id", "loser1_id", "loser2_id"]:
+            if k in df.columns:
+                df[k] = pd.to_numeric(df[k], errors="coerce").astype("Int64")
+        for k in ["winner1_name", "winner2_name", "loser1_name", "loser2_name", "tourney_name", "round", "score", "surface"]:
             if k in df.columns:
                 df[k] = df[k].astype(str)
+        with span("team_keys"):
+            for side in ("winner", "loser"):
+                a = df[f"{side}1_id"]
+                b = df[f"{side}2_id"]
+                lo = a.where(a <= b, b).astype(str)
+                hi = b.where(a <= b, a).astype(str)
+                df[f"{side}_team"] = (lo + "-" + hi).where(a.notna() & b.notna())
         return df
@@ -0,0 +1,171 @@
+"""
+TieBreaker output — text and machine-readable renderings of CLI results.
+
+Text lines are assembled column-wise on the whole frame instead of row by row,
+and the machine formats (json, jsonl, csv, parquet) are written in chunks so
+large ``--all-years`` results never build one big string in memory.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+import pandas as pd
+
+from profiling import span
+
+
+FORMATS = ("text", "json", "jsonl", "csv", "parquet")
+CHUNK_ROWS = 10_000
+DATE_COLUMNS = ("tourney_date", "ranking_date", "dob")
+
+
+def _opt(text: pd.Series, mask: pd.Series) -> pd.Series:
+    return text.where(mask, "")
+
+
+def _iso(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s, errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+def _int_text(s: pd.Series) -> pd.Series:
+    # Truncated like int(): 90.5 minutes prints as 90.
+    return np.trunc(pd.to_numeric(s, errors="coerce").astype("float64")).astype("Int64").astype(str)
+
+
+def match_lines(df: pd.DataFrame) -> pd.Series:
+    """
+    One text line per match, built with vectorized string operations.
+    """
+    n = len(df)
+
+    def col(name: str) -> pd.Series:
+        return df[name] if name in df.columns else pd.Series([None] * n, index=df.index, dtype=object)
+
+    dates = _iso(col("tourney_date")).fillna("????-??-??")
+    line = dates + " — " + col("tourney_name").fillna("?").astype(str)
+    surface = col("surface")
+    line += _opt(" (" + surface.astype(str) + ")", surface.notna())
+    round_ = col("round")
+    line += _opt(" | R: " + round_.astype(str), round_.notna())
+    best_of = pd.to_numeric(col("best_of"), errors="coerce")
+    line += _opt(" | Best-of-" + _int_text(best_of), best_of.notna())
+    line += " | " + col("winner_name").fillna("?").astype(str) + " def. " + col("loser_name").fillna("?").astype(str)
+    score = col("score")
+    line += _opt("  " + score.astype(str), score.notna())
+    minutes = pd.to_numeric(col("minutes"), errors="coerce")
+    line += _opt("  (" + _int_text(minutes) + " min)", minutes.notna())
+    return line
+
+
+def h2h_summary(df: pd.DataFrame, pid1: int, p1: str, pid2: int, p2: str) -> pd.DataFrame:
+    """
+    Head-to-head wins per surface plus a ``Total`` row, computed with one groupby.
+    """
+    winner = pd.to_numeric(df["winner_id"], errors="coerce")
+    side = pd.Series(np.where(winner == pid1, "player1_wins", np.where(winner == pid2, "player2_wins", "other")), index=df.index)
+    surface = df["surface"].fillna("?").astype(str) if "surface" in df.columns else pd.Series("?", index=df.index)
+    counts = side.groupby(surface).value_counts().unstack(fill_value=0)
+    counts = counts.reindex(columns=["player1_wins", "player2_wins"], fill_value=0)
+    counts.loc["Total"] = counts.sum()
+    out = counts.reset_index(names="surface")
+    out.insert(1, "player1", p1)
+    out.insert(3, "player2", p2)
+    out["matches"] = out["player1_wins"] + out["player2_wins"]
+    return out[["surface", "player1", "player1_wins", "player2", "player2_wins", "matches"]]
+
+
+def summary_lines(summary: pd.DataFrame) -> list[str]:
+    total = summary[summary["surface"] == "Total"].iloc[0]
+    lines = [f"Bilan: {total['player1']} {int(total['player1_wins'])} - {int(total['player2_wins'])} {total['player2']} ({int(total['matches'])} matchs)"]
+    for r in summary[summary["surface"] != "Total"].to_dict("records"):
+        lines.append(f"  {r['surface']}: {int(r['player1_wins'])} - {int(r['player2_wins'])}")
+    return lines
+
+
+def _serializable(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dates as ISO strings and the loaders' ``"nan"`` placeholders as real nulls.
+    """
+    out = df.copy()
+    for c in out.columns:
+        s = out[c]
+        if c in DATE_COLUMNS or pd.api.types.is_datetime64_any_dtype(s):
+            out[c] = _iso(s).astype(object).where(lambda v: v.notna(), None)
+        elif s.dtype == object:
+            out[c] = s.mask(s.isin(["nan", "None"]))
+    return out
+
+
+def _chunks(df: pd.DataFrame):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield _serializable(df.iloc[start:start + CHUNK_ROWS])
+
+
+def write_text(lines, stream: IO[str] | None = None, out: Path | None = None) -> None:
+    """
+    Writes the text lines to ``out`` when given, else to ``stream`` (stdout by default).
+    """
+    if out is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("w", encoding="utf-8") as fh:
+            write_text(lines, fh)
+        return
+    stream = stream or sys.stdout
+    for start in range(0, len(lines), CHUNK_ROWS):
+        stream.write("\n".join(lines[start:start + CHUNK_ROWS]) + "\n")
+
+
+def write_records(df: pd.DataFrame, fmt: str, stream: IO[str] | None = None, out: Path | None = None) -> None:
+    """
+    Streams ``df`` as json, jsonl, csv or parquet to ``out`` (or ``stream``, stdout by default).
+    Parquet is binary and needs ``out``.
+    """
+    with span(f"write_{fmt}", rows=len(df)):
+        if fmt == "parquet":
+            if out is None:
+                raise ValueError("--format parquet nécessite --out FICHIER")
+            _write_parquet(df, out)
+            return
+        if out is not None:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            with out.open("w", encoding="utf-8", newline="") as fh:
+                _write_text_records(df, fmt, fh)
+            return
+        _write_text_records(df, fmt, stream or sys.stdout)
+
+
+def _write_text_records(df: pd.DataFrame, fmt: str, fh: IO[str]) -> None:
+    if fmt == "json":
+        fh.write("[")
+        first = True
+        for chunk in _chunks(df):
+            body = chunk.to_json(orient="records", force_ascii=False)[1:-1]
+            if body:
+                fh.write(body if first else "," + body)
+                first = False
+        fh.write("]\n")
+    elif fmt == "jsonl":
+        for chunk in _chunks(df):
+            fh.write(chunk.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n") + "\n")
+    elif fmt == "csv":
+        if df.empty:
+            df.iloc[0:0].to_csv(fh, index=False)
+        for i, chunk in enumerate(_chunks(df)):
+            chunk.to_csv(fh, index=False, header=i == 0)
+    else:
+        raise ValueError(f"Format inconnu: {fmt}")
+
+
+def _write_parquet(df: pd.DataFrame, out: Path) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    out.parent.mkdir(parents=True, exist_ok=True)
+    # Text and date columns are strings in every chunk, even the all-null ones.
+    schema = pa.Schema.from_pandas(_serializable(df.iloc[0:0]), preserve_index=False)
+    schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
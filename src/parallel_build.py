@@ -0,0 +1,240 @@
+"""
+TieBreaker parallel dataset build — ``build_dataset --workers N``.
+
+Matches are sharded by year and each shard runs ``build_dataset`` in its own
+process. The read-only lookups are written once to a scratch directory and
+shared instead of being pickled into every task: rankings become flat sorted
+numpy arrays opened with ``mmap_mode="r"`` (one segment per player or name
+key, searched with ``searchsorted``), players an uncompressed Arrow IPC file
+read through a memory map. Every shard is written as a Parquet partition
+``<out>.parts/year=YYYY/part-0.parquet`` and the parent concatenates them in
+year order, which reproduces the single-process row order exactly.
+"""
+from __future__ import annotations
+
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from build_dataset import PlayerLookup, _name_variants, build_dataset, lookup_from_players, normalize_name
+from profiling import span
+
+
+WINDOW_NS = pd.Timedelta(days=365).value
+UNKNOWN_YEAR = "unknown"
+# Columns read by canonicalize_ab; the shards carry nothing else.
+SHARD_COLUMNS = ["tourney_date", "tourney_name", "tourney_id", "match_num", "tourney_level",
+                 "winner_id", "loser_id", "winner_name", "loser_name", "round", "surface", "best_of"]
+# Read only through str() there, so mixed-type object columns (tourney_level mixes
+# str and int) can be stringified for Parquet without changing any output.
+TEXT_COLUMNS = ("tourney_level", "round", "surface", "winner_name", "loser_name")
+GROUP_ARRAYS = ("keys", "starts", "dates", "ranks", "points")
+PLAYER_COLUMNS = ["player_id", "full_name", "name_key", "dob_parsed"]
+
+
+@dataclass(slots=True)
+class RankingGroups:
+    """
+    Rankings sorted by (key, ranking_date); rows ``starts[i]:starts[i + 1]`` belong to ``keys[i]``.
+    """
+    keys: np.ndarray
+    starts: np.ndarray
+    dates: np.ndarray
+    ranks: np.ndarray
+    points: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keys: np.ndarray) -> RankingGroups:
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+        return cls(
+            keys=keys[starts],
+            starts=np.r_[starts, len(keys)].astype(np.int64),
+            dates=df["ranking_date"].to_numpy("datetime64[ns]").view(np.int64),
+            ranks=pd.to_numeric(df["rank"], errors="coerce").to_numpy("float64", na_value=np.nan),
+            points=pd.to_numeric(df["points"], errors="coerce").to_numpy("float64", na_value=np.nan) if "points" in df.columns else np.full(len(df), np.nan),
+        )
+
+    def save(self, directory: Path, prefix: str) -> None:
+        for name in GROUP_ARRAYS:
+            np.save(directory / f"{prefix}_{name}.npy", getattr(self, name))
+
+    @classmethod
+    def open(cls, directory: Path, prefix: str) -> RankingGroups | None:
+        if not (directory / f"{prefix}_keys.npy").exists():
+            return None
+        return cls(**{name: np.load(directory / f"{prefix}_{name}.npy", mmap_mode="r") for name in GROUP_ARRAYS})
+
+    def segment(self, key: Any) -> tuple[int, int] | None:
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return int(self.starts[i]), int(self.starts[i + 1])
+
+    def latest_before(self, bounds: tuple[int, int], target_ns: int) -> dict[str, Any] | None:
+        """
+        Same rule as ``_select_latest_before(..., window_days=365)`` on one segment.
+        """
+        lo, hi = bounds
+        idx = lo + int(np.searchsorted(self.dates[lo:hi], target_ns, side="right")) - 1
+        if idx < lo or self.dates[idx] < target_ns - WINDOW_NS:
+            return None
+        rank, points = self.ranks[idx], self.points[idx]
+        return {
+            "rank": int(rank) if not np.isnan(rank) else np.nan,
+            "points": int(points) if not np.isnan(points) else np.nan,
+            "ranking_date": pd.Timestamp(int(self.dates[idx])),
+            "rank_missing": bool(np.isnan(rank)),
+            "points_missing": bool(np.isnan(points)),
+        }
+
+
+@dataclass(slots=True)
+class RankingArrays:
+    """
+    Array-backed stand-in for the prepared rankings frame in ``get_rank_on_or_before``.
+    """
+    by_pid: RankingGroups | None
+    by_name: RankingGroups | None
+
+    @classmethod
+    def from_frame(cls, rankings: pd.DataFrame) -> RankingArrays:
+        """
+        Sorts like ``_build_ranking_cache`` so ties on ranking_date resolve to the same row.
+        """
+        by_pid = by_name = None
+        if "player_id" in rankings.columns:
+            df = rankings.sort_values(["player_id", "ranking_date"])
+            df = df[df["player_id"].notna()]
+            by_pid = RankingGroups.from_frame(df, df["player_id"].to_numpy("int64"))
+        if "__name_key" in rankings.columns:
+            df = rankings.sort_values(["__name_key", "ranking_date"])
+            df = df[df["__name_key"].astype(bool)]
+            # Fixed-width unicode so the keys can be memory-mapped like the numeric arrays.
+            by_name = RankingGroups.from_frame(df, df["__name_key"].to_numpy(str))
+        return cls(by_pid=by_pid, by_name=by_name)
+
+    def save(self, directory: Path) -> None:
+        if self.by_pid is not None:
+            self.by_pid.save(directory, "pid")
+        if self.by_name is not None:
+            self.by_name.save(directory, "name")
+
+    @classmethod
+    def open(cls, directory: Path) -> RankingArrays:
+        return cls(by_pid=RankingGroups.open(directory, "pid"), by_name=RankingGroups.open(directory, "name"))
+
+    def _find(self, player_id: int | None, player_name: str) -> tuple[RankingGroups, tuple[int, int]] | None:
+        if player_id is not None and self.by_pid is not None:
+            bounds = self.by_pid.segment(player_id)
+            if bounds is not None:
+                return self.by_pid, bounds
+        if player_name and self.by_name is not None:
+            for variant in _name_variants(player_name):
+                bounds = self.by_name.segment(normalize_name(variant))
+                if bounds is not None:
+                    return self.by_name, bounds
+        return None
+
+    def rank_on_or_before(self, player_id: int | None, player_name: str, target: pd.Timestamp) -> dict[str, Any]:
+        found = self._find(player_id, player_name)
+        row = found[0].latest_before(found[1], target.value) if found is not None else None
+        if row is None:
+            return {"rank": np.nan, "points": np.nan, "ranking_date": pd.NaT, "rank_missing": True, "points_missing": True}
+        return row
+
+
+def share_players(players: pd.DataFrame, path: Path) -> None:
+    import pyarrow as pa
+    df = players[PLAYER_COLUMNS].copy()
+    df["dob_parsed"] = pd.to_datetime(df["dob_parsed"], errors="coerce")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def open_players(path: Path) -> PlayerLookup:
+    import pyarrow as pa
+    with pa.memory_map(str(path), "r") as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    return lookup_from_players(df)
+
+
+def shard_name(year: int | None) -> str:
+    return f"year={UNKNOWN_YEAR if year is None else year}"
+
+
+def partitions_dir(out_path: Path) -> Path:
+    return out_path.with_name(out_path.stem + ".parts")
+
+
+def shard_matches(matches: pd.DataFrame) -> list[tuple[int | None, pd.DataFrame]]:
+    """
+    Consecutive year slices of the date-sorted matches, undated matches last.
+    """
+    years = pd.to_datetime(matches["tourney_date"], errors="coerce").dt.year
+    keys = years.fillna(-1).astype("int64").to_numpy()
+    cuts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    bounds = zip(np.r_[0, cuts], np.r_[cuts, len(matches)])
+    slim = matches[[c for c in SHARD_COLUMNS if c in matches.columns]].copy()
+    for c in TEXT_COLUMNS:
+        if c in slim.columns and slim[c].dtype == object:
+            slim[c] = slim[c].map(str)
+    return [(None if keys[a] < 0 else int(keys[a]), slim.iloc[a:b]) for a, b in bounds if b > a]
+
+
+_SHARED: dict[str, Any] = {}
+
+
+def _init_worker(shared_dir: str) -> None:
+    directory = Path(shared_dir)
+    _SHARED["rankings"] = RankingArrays.open(directory)
+    _SHARED["players"] = open_players(directory / "players.arrow")
+
+
+def _build_shard(src: str, dest: str) -> tuple[str, int, float]:
+    start = time.perf_counter()
+    matches = pd.read_parquet(src)
+    dataset = build_dataset(matches, _SHARED["rankings"], _SHARED["players"])
+    Path(dest).parent.mkdir(parents=True, exist_ok=True)
+    dataset.to_parquet(dest, index=False)
+    return dest, len(dataset), time.perf_counter() - start
+
+
+def build_parallel(matches: pd.DataFrame, rankings: pd.DataFrame, players: pd.DataFrame, out_path: Path, workers: int) -> pd.DataFrame:
+    """
+    Builds one Parquet partition per year with ``workers`` processes and returns their concatenation.
+    ``matches`` must already be sorted by tourney_date (as ``run`` does) and ``players`` prepared.
+    """
+    parts = partitions_dir(out_path)
+    shards = shard_matches(matches)
+    with tempfile.TemporaryDirectory(prefix="tiebreaker_shared_") as tmp:
+        shared = Path(tmp)
+        with span("share_lookups"):
+            RankingArrays.from_frame(rankings).save(shared)
+            share_players(players, shared / "players.arrow")
+        with span("write_shards", rows=len(matches)):
+            tasks = []
+            for year, shard in shards:
+                src = shared / f"{shard_name(year)}.parquet"
+                shard.to_parquet(src, index=False)
+                tasks.append((len(shard), str(src), str(parts / shard_name(year) / "part-0.parquet")))
+        if parts.exists():
+            shutil.rmtree(parts)
+        with span("build_shards", rows=len(matches)):
+            # Largest years first so the pool drains evenly; the merge order does not depend on it.
+            tasks.sort(key=lambda t: -t[0])
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                     initializer=_init_worker, initargs=(str(shared),)) as pool:
+                for fut in [pool.submit(_build_shard, src, dest) for _, src, dest in tasks]:
+                    fut.result()
+    with span("merge_shards"):
+        frames = [pd.read_parquet(parts / shard_name(year) / "part-0.parquet") for year, _ in shards]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
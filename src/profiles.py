@@ -0,0 +1,171 @@
+"""
+TieBreaker player profiles — per-player career aggregates precomputed once.
+
+``build_profiles`` groups all singles matches and rankings by player and writes
+four Parquet tables next to the columnar cache (processed/cache/profiles/), all
+sorted by player_id: ``summary`` (one row per player), ``surfaces``, ``years``
+and ``rankings`` (the trajectory). ``load_profile`` then reads one player with a
+pushed-down player_id filter, so a profile costs a few row groups instead of a
+scan of every match year. The tables are rebuilt when the source CSVs (or ingested parts) change.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from models import DataHub
+from profiling import span
+
+
+PROFILE_DIR = Path("processed") / "cache" / "profiles"
+PROFILE_TABLES = ("summary", "surfaces", "years", "rankings")
+PROFILE_VERSION = 3
+# Main-tour events: W/L counts them (Davis Cup included), titles exclude Davis Cup.
+TOUR_LEVELS = ("G", "M", "A", "F", "D", "O")
+TITLE_LEVELS = ("G", "M", "A", "F", "O")
+ROW_GROUP_SIZE = 16_384
+
+
+def profile_dir(hub: DataHub) -> Path:
+    return hub.root / PROFILE_DIR
+
+
+def source_fingerprint(hub: DataHub) -> str:
+    return hub.fingerprint(f"profiles-v{PROFILE_VERSION}")
+
+
+def profiles_fresh(hub: DataHub) -> bool:
+    meta = profile_dir(hub) / "meta.json"
+    try:
+        return json.loads(meta.read_text(encoding="utf-8")).get("fingerprint") == source_fingerprint(hub)
+    except (OSError, ValueError):
+        return False
+
+
+def _appearances(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (match, player) of the main-tour matches, with the outcome.
+    Qualifying rounds (Q1, Q2, ...) of the qual/challenger files carry the level of
+    the main event (G, M, A), so they are excluded by round as well.
+    """
+    m = matches[matches["tourney_level"].isin(TOUR_LEVELS)] if "tourney_level" in matches.columns else matches
+    if "round" in m.columns:
+        m = m[~m["round"].astype(str).str.startswith("Q")]
+    date = pd.to_datetime(m["tourney_date"], errors="coerce")
+    title = (m["round"] == "F") & m["tourney_level"].isin(TITLE_LEVELS) if "tourney_level" in m.columns else m["round"] == "F"
+    common = {
+        "surface": m["surface"].mask(m["surface"].isin(["nan", "None", ""])).fillna("?"),
+        "year": date.dt.year.astype("Int64"),
+        "date": date,
+    }
+    won = pd.DataFrame({"player_id": m["winner_id"], "won": np.int8(1), "title": title.astype(np.int8), **common})
+    lost = pd.DataFrame({"player_id": m["loser_id"], "won": np.int8(0), "title": np.int8(0), **common})
+    app = pd.concat([won, lost], ignore_index=True)
+    app["player_id"] = pd.to_numeric(app["player_id"], errors="coerce").astype("Int64")
+    return app[app["player_id"].notna()]
+
+
+def profile_tables(matches: pd.DataFrame, rankings: pd.DataFrame, players: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    app = _appearances(matches)
+
+    with span("surfaces", rows=len(app)):
+        surfaces = app.groupby(["player_id", "surface"]).agg(wins=("won", "sum"), matches=("won", "size")).reset_index()
+        surfaces["losses"] = surfaces["matches"] - surfaces["wins"]
+        surfaces = surfaces[["player_id", "surface", "wins", "losses"]]
+
+    r = rankings.dropna(subset=["player_id", "ranking_date", "rank"])[["player_id", "ranking_date", "rank", "points"]].copy()
+    r["ranking_date"] = pd.to_datetime(r["ranking_date"], errors="coerce")
+    r = r.dropna(subset=["ranking_date"]).sort_values(["player_id", "ranking_date"], kind="stable").reset_index(drop=True)
+
+    with span("years", rows=len(app)):
+        years = app.groupby(["player_id", "year"]).agg(wins=("won", "sum"), matches=("won", "size"), titles=("title", "sum")).reset_index()
+        years["losses"] = years["matches"] - years["wins"]
+        r["year"] = r["ranking_date"].dt.year.astype("Int64")
+        by_year = r.groupby(["player_id", "year"]).agg(best_rank=("rank", "min"), year_end_rank=("rank", "last")).reset_index()
+        years = years.merge(by_year, on=["player_id", "year"], how="outer")
+        for c in ["wins", "losses", "titles"]:
+            years[c] = years[c].fillna(0).astype("int64")
+        years = years[["player_id", "year", "wins", "losses", "titles", "best_rank", "year_end_rank"]]
+
+    with span("summary"):
+        totals = app.groupby("player_id").agg(
+            wins=("won", "sum"), matches=("won", "size"), titles=("title", "sum"),
+            first_match=("date", "min"), last_match=("date", "max"),
+        )
+        totals["losses"] = totals["matches"] - totals["wins"]
+        peak_idx = r.sort_values(["rank", "ranking_date"], kind="stable").groupby("player_id").head(1).set_index("player_id")
+        ranks = pd.DataFrame({
+            "peak_rank": peak_idx["rank"],
+            "peak_rank_date": peak_idx["ranking_date"],
+            # One published ranking per week: weeks at #1 is the number of #1 publications.
+            "weeks_at_1": r[r["rank"] == 1].groupby("player_id").size(),
+            "last_rank": r.groupby("player_id")["rank"].last(),
+            "last_rank_date": r.groupby("player_id")["ranking_date"].last(),
+        })
+        summary = totals.join(ranks, how="outer")
+        summary.index.name = "player_id"
+        summary = summary.reset_index()
+        names = players.dropna(subset=["player_id"]).drop_duplicates("player_id").set_index("player_id")["full_name"]
+        summary.insert(1, "name", summary["player_id"].map(names))
+        for c in ["wins", "losses", "titles", "weeks_at_1"]:
+            summary[c] = summary[c].fillna(0).astype("int64")
+        summary = summary[["player_id", "name", "wins", "losses", "titles", "first_match", "last_match",
+                           "peak_rank", "peak_rank_date", "weeks_at_1", "last_rank", "last_rank_date"]]
+
+    trajectory = r[["player_id", "ranking_date", "rank", "points"]]
+    return {
+        "summary": summary.sort_values("player_id"),
+        "surfaces": surfaces.sort_values(["player_id", "wins"], ascending=[True, False]),
+        "years": years.sort_values(["player_id", "year"]),
+        "rankings": trajectory,
+    }
+
+
+def build_profiles(hub: DataHub, out_dir: Path | None = None) -> dict[str, int]:
+    """
+    Computes the profile tables from the loaders and writes them atomically with the source fingerprint.
+    """
+    out_dir = out_dir or profile_dir(hub)
+    fingerprint = source_fingerprint(hub)
+    with span("build_profiles"):
+        tables = profile_tables(hub.load_matches(), hub.load_rankings(), hub.load_players())
+        out_dir.mkdir(parents=True, exist_ok=True)
+        counts = {}
+        with span("write_profiles"):
+            for name, df in tables.items():
+                tmp = out_dir / f"{name}.parquet.tmp"
+                df.to_parquet(tmp, index=False, row_group_size=ROW_GROUP_SIZE)
+                tmp.replace(out_dir / f"{name}.parquet")
+                counts[name] = len(df)
+        (out_dir / "meta.json").write_text(json.dumps({"fingerprint": fingerprint, "version": PROFILE_VERSION, "rows": counts}), encoding="utf-8")
+    return counts
+
+
+@dataclass(slots=True)
+class PlayerProfile:
+    player_id: int
+    summary: pd.DataFrame
+    surfaces: pd.DataFrame
+    years: pd.DataFrame
+    rankings: pd.DataFrame
+
+    def table(self, name: str) -> pd.DataFrame:
+        return getattr(self, name)
+
+
+def load_profile(hub: DataHub, player_id: int, out_dir: Path | None = None) -> PlayerProfile | None:
+    """
+    Keyed read of one player's tables; None when the player has neither matches nor rankings.
+    """
+    out_dir = out_dir or profile_dir(hub)
+    parts = {}
+    with span("read_profile"):
+        for name in PROFILE_TABLES:
+            parts[name] = pd.read_parquet(out_dir / f"{name}.parquet", filters=[("player_id", "==", int(player_id))])
+    if parts["summary"].empty:
+        return None
+    return PlayerProfile(player_id=int(player_id), **parts)
@@ -0,0 +1,247 @@
+"""
+TieBreaker profiling — nested stage timings, row counts and memory deltas.
+
+Code paths wrap their stages in ``span("name")``; spans cost nothing unless a
+``Profiler`` is active, which the CLIs enable with ``--profile``. The result is
+printed as a tree and can be dumped as cProfile stats or a Chrome trace JSON
+(chrome://tracing, Perfetto). Each thread keeps its own span stack: spans opened
+in worker threads hang under the span that was open on the profiling thread
+when the worker started and keep their thread id in the trace.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TextIO
+
+
+class Span:
+    # Plain slotted class rather than a dataclass: this module is imported by the
+    # CLI at startup and dataclasses pulls in inspect.
+    __slots__ = ("name", "start", "end", "rows", "mem_start", "mem_delta", "children", "tid")
+
+    def __init__(self, name: str, start: float, end: float = 0.0, rows: int | None = None, mem_start: int = 0, mem_delta: int = 0, children: list["Span"] | None = None, tid: int | None = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.rows = rows
+        self.mem_start = mem_start
+        self.mem_delta = mem_delta
+        self.children = children if children is not None else []
+        self.tid = tid
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+_ACTIVE: "Profiler | None" = None
+_NULL_SPAN = Span("", 0.0)
+
+
+def _rss_bytes() -> int:
+    """
+    Resident set size of the process. Unlike tracemalloc it costs nothing, so timings stay representative.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    def __init__(self, name: str = "total", track_memory: bool = True):
+        # Imported here rather than at module level to keep the CLI startup light.
+        import threading
+        self._thread_ident = threading.get_ident
+        self.root = Span(name, 0.0, tid=threading.get_ident())
+        self.track_memory = track_memory
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._local.stack = [self.root]
+        self._main_stack: list[Span] = self._local.stack
+
+    def __enter__(self) -> "Profiler":
+        global _ACTIVE
+        if _ACTIVE is not None:
+            raise RuntimeError("Un profileur est déjà actif (utilisez span() pour les étapes imbriquées)")
+        self.root.start = time.perf_counter()
+        self.root.mem_start = self._memory()
+        _ACTIVE = self
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        global _ACTIVE
+        _ACTIVE = None
+        self.root.end = time.perf_counter()
+        self.root.mem_delta = self._memory() - self.root.mem_start
+        if self.track_memory:
+            self.peak = _peak_rss_bytes()
+
+    def _memory(self) -> int:
+        return _rss_bytes() if self.track_memory else 0
+
+    def _stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            # First span on a worker thread: anchor it under the profiling thread's current span.
+            stack = self._local.stack = [self._main_stack[-1]]
+        return stack
+
+    def open(self, name: str, rows: int | None = None) -> Span:
+        stack = self._stack()
+        s = Span(name, time.perf_counter(), rows=rows, mem_start=self._memory(), tid=self._thread_ident())
+        with self._lock:
+            stack[-1].children.append(s)
+        stack.append(s)
+        return s
+
+    def close(self, s: Span) -> None:
+        s.end = time.perf_counter()
+        s.mem_delta = self._memory() - s.mem_start
+        stack = self._stack()
+        while len(stack) > 1 and stack[-1] is not s:
+            stack.pop()
+        if len(stack) > 1:
+            stack.pop()
+
+    def summary(self) -> str:
+        total = self.root.duration or 1e-12
+        lines = [f"Profil — {self.root.duration:.3f} s" + (f", pic RSS {self.peak / 2**20:.1f} MB" if self.peak else "")]
+
+        def walk(s: Span, depth: int) -> None:
+            label = "  " * depth + s.name
+            line = f"{label:<40} {s.duration:9.3f} s {s.duration / total:7.1%}"
+            if s.rows is not None:
+                line += f"  rows={s.rows}"
+            if self.track_memory:
+                line += f"  rss {s.mem_delta / 2**20:+.1f} MB"
+            lines.append(line)
+            for child in _merge_children(s.children):
+                walk(child, depth + 1)
+
+        for child in _merge_children(self.root.children):
+            walk(child, 0)
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        import threading
+        events: list[dict[str, Any]] = []
+        pid = os.getpid()
+        origin = self.root.start
+
+        def walk(s: Span) -> None:
+            args: dict[str, Any] = {"rss_delta_bytes": s.mem_delta}
+            if s.rows is not None:
+                args["rows"] = s.rows
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": (s.start - origin) * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": pid,
+                "tid": s.tid if s.tid is not None else threading.get_ident(),
+                "args": args,
+            })
+            for child in s.children:
+                walk(child)
+
+        walk(self.root)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Path) -> None:
+        import json
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+
+
+def _merge_children(children: list[Span]) -> list[Span]:
+    """
+    Folds repeated sibling spans (same name, e.g. one per CSV file) into one line for the summary.
+    """
+    merged: dict[str, Span] = {}
+    for c in children:
+        m = merged.get(c.name)
+        if m is None:
+            merged[c.name] = Span(c.name, c.start, c.end, c.rows, c.mem_start, c.mem_delta, list(c.children), c.tid)
+            continue
+        m.end += c.duration
+        m.mem_delta += c.mem_delta
+        m.children.extend(c.children)
+        if c.rows is not None:
+            m.rows = (m.rows or 0) + c.rows
+    return list(merged.values())
+
+
+@contextmanager
+def span(name: str, rows: int | None = None) -> Iterator[Span]:
+    prof = _ACTIVE
+    if prof is None:
+        yield _NULL_SPAN
+        return
+    s = prof.open(name, rows)
+    try:
+        yield s
+    finally:
+        prof.close(s)
+
+
+def run_profiled(
+    fn: Callable[[], Any],
+    name: str,
+    enabled: bool,
+    cprofile_out: Path | None = None,
+    trace_out: Path | None = None,
+    stream: TextIO | None = None,
+) -> Any:
+    """
+    Runs ``fn`` under a profiler when any profiling option is set, then prints the
+    stage tree to ``stream`` (stderr by default) and writes the optional dumps.
+    Inside an already profiled run, ``fn`` becomes one more span of that run.
+    """
+    if _ACTIVE is not None:
+        with span(name):
+            return fn()
+    if not (enabled or cprofile_out or trace_out):
+        return fn()
+    cp = None
+    if cprofile_out:
+        import cProfile
+        cp = cProfile.Profile()
+    prof = Profiler(name)
+    try:
+        with prof:
+            if cp:
+                cp.enable()
+            try:
+                return fn()
+            finally:
+                if cp:
+                    cp.disable()
+    finally:
+        print(prof.summary(), file=stream or sys.stderr)
+        if cp and cprofile_out:
+            cprofile_out.parent.mkdir(parents=True, exist_ok=True)
+            cp.dump_stats(str(cprofile_out))
+        if trace_out:
+            prof.write_chrome_trace(trace_out)
+
+
+def add_profile_arguments(parser: Any) -> None:
+    parser.add_argument("--profile", action="store_true", help="Print nested stage timings, row counts and memory deltas to stderr")
+    parser.add_argument("--profile-cprofile", type=Path, metavar="FILE", help="Also dump cProfile stats to FILE (implies --profile)")
+    parser.add_argument("--profile-trace", type=Path, metavar="FILE", help="Also write a Chrome trace JSON to FILE (implies --profile)")
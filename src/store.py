@@ -0,0 +1,299 @@
+"""
+TieBreaker analytical store — normalized players, rankings and matches in one SQLite file.
+
+Built once from the CSV tree (``./TieBreaker store-build``), indexed on player ids,
+dates, tournament and surface so that the CLI lookups become index seeks instead of
+full scans, and queryable with plain SQL (``./TieBreaker query``).
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Sequence
+
+import pandas as pd
+
+from models import DataHub, team_key
+from profiling import span
+
+
+STORE_SCHEMA_VERSION = 1
+DEFAULT_STORE_NAME = Path("processed") / "tiebreaker.sqlite"
+
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_players_full_name ON players(full_name)",
+    "CREATE INDEX IF NOT EXISTS idx_rankings_player_date ON rankings(player_id, ranking_date)",
+    "CREATE INDEX IF NOT EXISTS idx_rankings_date ON rankings(ranking_date)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_winner_loser ON matches(winner_id, loser_id)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_loser ON matches(loser_id)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(tourney_date)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_year ON matches(year)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_tourney ON matches(tourney_name)",
+    "CREATE INDEX IF NOT EXISTS idx_matches_surface ON matches(surface)",
+    "CREATE INDEX IF NOT EXISTS idx_doubles_winner_team ON doubles(winner_team)",
+    "CREATE INDEX IF NOT EXISTS idx_doubles_loser_team ON doubles(loser_team)",
+    "CREATE INDEX IF NOT EXISTS idx_doubles_year ON doubles(year)",
+    "CREATE INDEX IF NOT EXISTS idx_doubles_players_player_partner ON doubles_players(player_id, partner_id)",
+]
+
+
+def default_store_path(data_root: Path) -> Path:
+    return data_root / DEFAULT_STORE_NAME
+
+
+def _iso_dates(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+def _normalize_matches(matches: pd.DataFrame) -> pd.DataFrame:
+    df = matches.copy()
+    # The loaders cast the text columns with astype(str); keep real NULLs in the store.
+    for k in ["winner_name", "loser_name", "winner1_name", "winner2_name", "loser1_name", "loser2_name", "tourney_name", "round", "score", "surface"]:
+        if k in df.columns:
+            df[k] = df[k].mask(df[k].isin(["nan", "None", ""]))
+    if "tourney_date" in df.columns:
+        df["tourney_date"] = _iso_dates(df["tourney_date"])
+        df["year"] = pd.to_numeric(df["tourney_date"].str.slice(0, 4), errors="coerce").astype("Int64")
+    for k in ["winner_id", "loser_id", "winner1_id", "winner2_id", "loser1_id", "loser2_id", "match_num", "best_of", "minutes"]:
+        if k in df.columns:
+            df[k] = pd.to_numeric(df[k], errors="coerce").astype("Int64")
+    return df
+
+
+def _normalize_rankings(rankings: pd.DataFrame) -> pd.DataFrame:
+    df = rankings.copy()
+    if "ranking_date" in df.columns:
+        df["ranking_date"] = _iso_dates(df["ranking_date"])
+    return df
+
+
+def _doubles_players(doubles: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (match, player) with the partner and the outcome: the partner-pair index table.
+    """
+    parts = []
+    for pid_col, partner_col, won in [("winner1_id", "winner2_id", 1), ("winner2_id", "winner1_id", 1), ("loser1_id", "loser2_id", 0), ("loser2_id", "loser1_id", 0)]:
+        parts.append(pd.DataFrame({"doubles_id": doubles["doubles_id"], "player_id": doubles[pid_col], "partner_id": doubles[partner_col], "won": won}))
+    out = pd.concat(parts, ignore_index=True)
+    return out[out["player_id"].notna()]
+
+
+def _write(con: sqlite3.Connection, name: str, df: pd.DataFrame) -> int:
+    with span(f"write_{name}", rows=len(df)):
+        df.to_sql(name, con, index=False, if_exists="replace", chunksize=50_000)
+    return len(df)
+
+
+def build_store(hub: DataHub, path: Path) -> dict[str, int]:
+    """
+    (Re)builds the store at ``path`` from the CSV tree; the file is swapped in atomically.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    try:
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        players = hub.load_players()
+        keep = [c for c in ["player_id", "full_name", "name_first", "name_last", "hand", "dob", "ioc", "height"] if c in players.columns]
+        counts = {
+            "players": _write(con, "players", players[keep]),
+            "rankings": _write(con, "rankings", _normalize_rankings(hub.load_rankings())),
+            "matches": _write(con, "matches", _normalize_matches(hub.load_matches())),
+        }
+        try:
+            doubles = _normalize_matches(hub.load_doubles())
+        except FileNotFoundError:
+            doubles = None
+        if doubles is not None:
+            doubles.insert(0, "doubles_id", range(len(doubles)))
+            counts["doubles"] = _write(con, "doubles", doubles)
+            counts["doubles_players"] = _write(con, "doubles_players", _doubles_players(doubles))
+        with span("create_indexes"):
+            for ddl in _INDEXES:
+                if doubles is None and "doubles" in ddl:
+                    continue
+                con.execute(ddl)
+            con.execute("ANALYZE")
+        con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        con.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("schema_version", str(STORE_SCHEMA_VERSION)), ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S")), ("data_root", str(hub.root))],
+        )
+        con.commit()
+    finally:
+        con.close()
+    tmp.replace(path)
+    return counts
+
+
+def append_rows(path: Path, matches: pd.DataFrame | None = None, rankings: pd.DataFrame | None = None, players: pd.DataFrame | None = None) -> dict[str, int]:
+    """
+    Appends already validated rows (loader schema) to an existing store, in one transaction.
+    Columns the store tables do not have are dropped.
+    """
+    con = open_store(path)
+    counts: dict[str, int] = {}
+    try:
+        frames = {
+            "matches": _normalize_matches(matches) if matches is not None else None,
+            "rankings": _normalize_rankings(rankings) if rankings is not None else None,
+            "players": players.rename(columns={"name": "full_name"}) if players is not None else None,
+        }
+        for table, df in frames.items():
+            if df is None or df.empty:
+                continue
+            cols = [r[1] for r in con.execute(f"PRAGMA table_info({table})")]
+            df = df[[c for c in df.columns if c in cols]]
+            with span(f"append_{table}", rows=len(df)):
+                df.to_sql(table, con, index=False, if_exists="append", chunksize=50_000)
+            counts[table] = len(df)
+        con.commit()
+    finally:
+        con.close()
+    return counts
+
+
+def open_store(path: Path, read_only: bool = False) -> sqlite3.Connection:
+    if not path.exists():
+        raise FileNotFoundError(f"Store introuvable: {path} (lancer `./TieBreaker store-build`)")
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return sqlite3.connect(path)
+
+
+def query(con: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+    with span("sql_query") as sp:
+        df = pd.read_sql_query(sql, con, params=params)
+        sp.rows = len(df)
+    return df
+
+
+def describe_schema(con: sqlite3.Connection) -> str:
+    lines = []
+    tables = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    for t in tables:
+        cols = [r[1] for r in con.execute(f"PRAGMA table_info({t})")]
+        n = con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+        lines.append(f"{t} ({n} lignes): {', '.join(cols)}")
+    return "\n".join(lines)
+
+
+def load_player_names(con: sqlite3.Connection) -> pd.DataFrame:
+    df = query(con, "SELECT player_id, full_name FROM players")
+    df["player_id"] = pd.to_numeric(df["player_id"], errors="coerce").astype("Int64")
+    return df
+
+
+def rank_on_or_before(con: sqlite3.Connection, player_id: int, target: date | None = None) -> pd.DataFrame:
+    """
+    Latest ranking row of ``player_id`` on or before ``target`` (the latest overall when None).
+    """
+    sql = "SELECT ranking_date, rank, points FROM rankings WHERE player_id = ? AND ranking_date IS NOT NULL"
+    params: list[Any] = [player_id]
+    if target is not None:
+        sql += " AND ranking_date <= ?"
+        params.append(target.isoformat())
+    df = query(con, sql + " ORDER BY ranking_date DESC LIMIT 1", params)
+    df["ranking_date"] = pd.to_datetime(df["ranking_date"], errors="coerce").dt.date
+    return df
+
+
+def _filters_sql(
+    years: list[int] | None = None,
+    tournament: str | None = None,
+    round_: str | None = None,
+    surface: str | None = None,
+    on_date: date | None = None,
+    alias: str = "",
+) -> tuple[str, list[Any]]:
+    a = f"{alias}." if alias else ""
+    sql = ""
+    params: list[Any] = []
+    if years:
+        sql += f" AND {a}year IN ({', '.join('?' * len(years))})"
+        params.extend(years)
+    if tournament:
+        escaped = tournament.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        sql += f" AND {a}tourney_name LIKE ? ESCAPE '\\'"
+        params.append(f"%{escaped}%")
+    if round_:
+        sql += f" AND {a}round = ? COLLATE NOCASE"
+        params.append(round_)
+    if surface:
+        sql += f" AND {a}surface = ? COLLATE NOCASE"
+        params.append(surface)
+    if on_date:
+        sql += f" AND {a}tourney_date = ?"
+        params.append(on_date.isoformat())
+    return sql, params
+
+
+def find_matches(
+    con: sqlite3.Connection,
+    pid1: int,
+    pid2: int,
+    years: list[int] | None = None,
+    tournament: str | None = None,
+    round_: str | None = None,
+    surface: str | None = None,
+    on_date: date | None = None,
+) -> pd.DataFrame:
+    """
+    Head-to-head matches between two player ids, with the same filters as ``cmd_match``.
+    """
+    filters, filter_params = _filters_sql(years, tournament, round_, surface, on_date)
+    sql = "SELECT * FROM matches WHERE ((winner_id = ? AND loser_id = ?) OR (winner_id = ? AND loser_id = ?))" + filters
+    df = query(con, sql, [pid1, pid2, pid2, pid1, *filter_params])
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], errors="coerce").dt.date
+    return df
+
+
+def find_doubles(
+    con: sqlite3.Connection,
+    pid: int,
+    partner: int | None = None,
+    years: list[int] | None = None,
+    tournament: str | None = None,
+    round_: str | None = None,
+    surface: str | None = None,
+) -> pd.DataFrame:
+    """
+    Doubles matches of the team (pid, partner), or of ``pid`` with any partner.
+    """
+    filters, filter_params = _filters_sql(years, tournament, round_, surface)
+    if partner is not None:
+        key = team_key(pid, partner)
+        sql = "SELECT * FROM doubles WHERE (winner_team = ? OR loser_team = ?)" + filters
+        params = [key, key, *filter_params]
+    else:
+        sql = "SELECT * FROM doubles WHERE doubles_id IN (SELECT doubles_id FROM doubles_players WHERE player_id = ?)" + filters
+        params = [pid, *filter_params]
+    df = query(con, sql, params)
+    df["tourney_date"] = pd.to_datetime(df["tourney_date"], errors="coerce").dt.date
+    return df
+
+
+def doubles_partner_record(
+    con: sqlite3.Connection,
+    pid: int,
+    years: list[int] | None = None,
+    tournament: str | None = None,
+    round_: str | None = None,
+    surface: str | None = None,
+) -> pd.DataFrame:
+    """
+    Wins/losses of ``pid`` with each partner, most frequent partnership first.
+    """
+    filters, filter_params = _filters_sql(years, tournament, round_, surface, alias="d")
+    sql = (
+        "SELECT dp.partner_id, p.full_name AS partner_name, SUM(dp.won) AS wins, COUNT(*) - SUM(dp.won) AS losses, COUNT(*) AS matches"
+        " FROM doubles_players dp JOIN doubles d ON d.doubles_id = dp.doubles_id"
+        " LEFT JOIN players p ON p.player_id = dp.partner_id"
+        " WHERE dp.player_id = ?" + filters +
+        " GROUP BY dp.partner_id ORDER BY matches DESC, wins DESC"
+    )
+    return query(con, sql, [pid, *filter_params])
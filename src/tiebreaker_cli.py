@@ -5,14 +5,24 @@
 ## tiebreaker_cli
 ##
 
-from models import DataHub
+from __future__ import annotations
+
 import argparse
+import contextlib
 import sys
 import re
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
-from difflib import get_close_matches
+from typing import TYPE_CHECKING
+from profiling import add_profile_arguments, run_profiled, span
+
+# pandas, models and difflib are imported inside the commands that need them so
+# that `./TieBreaker --help` and argument errors stay instant.
+if TYPE_CHECKING:
+    from models import DataHub
+
+# Mirrors output.FORMATS; output imports pandas, so it is only loaded by the commands.
+OUTPUT_FORMATS = ("text", "json", "jsonl", "csv", "parquet")
 
 def norm(s: str) -> str:
     return re.sub(r'\s+', ' ', s.strip().casefold())
@@ -22,6 +32,7 @@ def best_name_match(query: str, candidates: list[str]) -> str | None:
     for c in candidates:
         if norm(c) == q:
             return c
+    from difflib import get_close_matches
     m = get_close_matches(query, candidates, n=1, cutoff=0.75)
     return m[0] if m else None
 
@@ -34,34 +45,85 @@ def date_parse_or_none(s: str | None):
         return None
 
 def resolve_player_id(hub: DataHub, name_query: str):
+    import pandas as pd
     players = hub.load_players()
-    candidates = players["full_name"].astype(str).tolist()
-    match = best_name_match(name_query, candidates)
+    with span("resolve_player_id"):
+        candidates = players["full_name"].astype(str).tolist()
+        match = best_name_match(name_query, candidates)
     if not match:
         return None, None
     row = players[players["full_name"] == match].iloc[0]
     return (int(row["player_id"]) if pd.notna(row["player_id"]) else None), str(row["full_name"])
 
-def cmd_rank(args, hub: DataHub):
+def print_notice(args, message: str) -> None:
+    """
+    In text mode the message is the command's output (stdout or --out); machine
+    formats keep their output parseable, so it goes to stderr.
+    """
+    if args.format == "text":
+        from output import write_text
+        write_text([message], sys.stdout, out=args.out)
+    else:
+        print(message, file=sys.stderr)
+
+def store_path(args, hub: DataHub) -> Path:
+    from store import default_store_path
+    return args.store or default_store_path(hub.root)
+
+def open_store_or_none(args, hub: DataHub, read_only: bool = False):
+    from store import load_player_names, open_store
+    try:
+        con = open_store(store_path(args, hub), read_only=read_only)
+    except FileNotFoundError as exc:
+        print(str(exc), file=sys.stderr)
+        return None
+    # Name resolution reads the two columns it needs from the store instead of parsing the CSV.
+    if hub.players is None:
+        hub.players = load_player_names(con)
+    return con
+
+def with_backend(cmd):
+    """
+    Runs ``cmd(args, hub, con)`` with the read-only store connection for ``--backend store``
+    (``None`` on the CSV backend) and closes it when the command returns.
+    """
+    def run(args, hub: DataHub):
+        if args.backend != "store":
+            return cmd(args, hub, None)
+        con = open_store_or_none(args, hub, read_only=True)
+        if con is None:
+            return 1
+        with contextlib.closing(con):
+            return cmd(args, hub, con)
+    run.__name__ = cmd.__name__
+    return run
+
+@with_backend
+def cmd_rank(args, hub: DataHub, con):
+    import pandas as pd
     pid, resolved = resolve_player_id(hub, args.player)
     if pid is None:
         print(f"Joueur introuvable: {args.player}", file=sys.stderr)
         return 1
-    rankings = hub.load_rankings()
 
-    if "player_id" in rankings.columns:
-        df = rankings[rankings["player_id"] == pid]
+    if con is not None:
+        from store import rank_on_or_before
+        df = rank_on_or_before(con, pid, date_parse_or_none(args.date))
     else:
-        if "player_name_raw" in rankings.columns:
-            firstname = resolved.split(" ")[0]
-            lastname = resolved.split(" ")[-1]
-            variants = {f"{lastname}, {firstname}".strip(), f"{firstname} {lastname}".strip(), resolved}
-            df = rankings[rankings["player_name_raw"].astype(str).isin(variants)]
+        rankings = hub.load_rankings()
+        if "player_id" in rankings.columns:
+            df = rankings[rankings["player_id"] == pid]
         else:
-            df = pd.DataFrame()
+            if "player_name_raw" in rankings.columns:
+                firstname = resolved.split(" ")[0]
+                lastname = resolved.split(" ")[-1]
+                variants = {f"{lastname}, {firstname}".strip(), f"{firstname} {lastname}".strip(), resolved}
+                df = rankings[rankings["player_name_raw"].astype(str).isin(variants)]
+            else:
+                df = pd.DataFrame()
 
     if df.empty:
-        print(f"Aucun ranking trouvé pour {resolved} (player_id={pid}).")
+        print_notice(args, f"Aucun ranking trouvé pour {resolved} (player_id={pid}).")
         return 0
 
     target_date = date_parse_or_none(args.date)
@@ -70,7 +132,7 @@ def cmd_rank(args, hub: DataHub):
         if target_date:
             df = df[df["ranking_date"] <= target_date]
             if df.empty:
-                print(f"Aucun ranking pour {resolved} avant {args.date}.")
+                print_notice(args, f"Aucun ranking pour {resolved} avant {args.date}.")
                 return 0
         row = df.iloc[-1]
         date_str = row["ranking_date"].isoformat()
@@ -81,15 +143,50 @@ def cmd_rank(args, hub: DataHub):
     rank = int(row["rank"]) if "rank" in row and pd.notna(row["rank"]) else None
     points = int(row["points"]) if "points" in row and pd.notna(row["points"]) else None
 
+    if args.format != "text":
+        from output import write_records
+        record = pd.DataFrame([{"player_id": pid, "player": resolved, "ranking_date": row.get("ranking_date"), "rank": rank, "points": points}])
+        write_records(record.astype({"rank": "Int64", "points": "Int64"}), args.format, out=args.out)
+        return 0
     if rank is not None and points is not None:
-        print(f"{resolved} — Rang ATP {rank} ({points} pts) au {date_str}")
+        print_notice(args, f"{resolved} — Rang ATP {rank} ({points} pts) au {date_str}")
     elif rank is not None:
-        print(f"{resolved} — Rang ATP {rank} au {date_str}")
+        print_notice(args, f"{resolved} — Rang ATP {rank} au {date_str}")
     else:
-        print(f"Ranking introuvable pour {resolved} (au {date_str}).")
+        print_notice(args, f"Ranking introuvable pour {resolved} (au {date_str}).")
     return 0
 
-def cmd_match(args, hub: DataHub):
+def filter_matches_csv(args, hub: DataHub, pid1: int, p1: str, pid2: int, p2: str, years: list[int] | None):
+    """
+    Matches by player id like the store backend, so homonyms never mix; by name only for
+    files without id columns.
+    """
+    import pandas as pd
+    matches = hub.load_matches(years=years)
+
+    def player_col(side: str, pid: int, target: str) -> pd.Series:
+        if f"{side}_id" in matches.columns:
+            return pd.to_numeric(matches[f"{side}_id"], errors="coerce") == pid
+        return matches[f"{side}_name"].str.casefold().str.strip() == target.casefold().strip()
+
+    with span("filter", rows=len(matches)):
+        mask_pair = (player_col("winner", pid1, p1) & player_col("loser", pid2, p2)) | (player_col("winner", pid2, p2) & player_col("loser", pid1, p1))
+        df = matches[mask_pair].copy()
+        if args.tournament:
+            df = df[df["tourney_name"].str.contains(args.tournament, case=False, na=False)]
+        if args.round:
+            df = df[df["round"].str.fullmatch(args.round, case=False, na=False)]
+        if args.surface:
+            df = df[df["surface"].str.fullmatch(args.surface, case=False, na=False)]
+        if args.date:
+            d = date_parse_or_none(args.date)
+            if d:
+                df = df[df["tourney_date"] == d]
+    return df
+
+@with_backend
+def cmd_match(args, hub: DataHub, con):
+    import pandas as pd
     pid1, p1 = resolve_player_id(hub, args.p1)
     pid2, p2 = resolve_player_id(hub, args.p2)
     if pid1 is None or pid2 is None:
@@ -110,27 +207,18 @@ def cmd_match(args, hub: DataHub):
         this_year = datetime.utcnow().year
         years = list(range(this_year - 9, this_year + 1))
 
-    matches = hub.load_matches(years=years)
-
-    def name_match_col(col: str, target: str) -> pd.Series:
-        return matches[col].str.casefold().str.strip() == target.casefold().strip()
-
-    mask_pair = ( (name_match_col("winner_name", p1) & name_match_col("loser_name", p2)) | (name_match_col("winner_name", p2) & name_match_col("loser_name", p1)) )
-    df = matches[mask_pair].copy()
-    if args.tournament:
-        df = df[df["tourney_name"].str.contains(args.tournament, case=False, na=False)]
-    if args.round:
-        df = df[df["round"].str.fullmatch(args.round, case=False, na=False)]
-    if args.surface:
-        df = df[df["surface"].str.fullmatch(args.surface, case=False, na=False)]
-    if args.date:
-        d = date_parse_or_none(args.date)
-        if d:
-            df = df[df["tourney_date"] == d]
+    if con is not None:
+        from store import find_matches
+        df = find_matches(con, pid1, pid2, years, args.tournament, args.round, args.surface, date_parse_or_none(args.date))
+    else:
+        df = filter_matches_csv(args, hub, pid1, p1, pid2, p2, years)
 
     if df.empty:
         scope = f" (années {min(years)}-{max(years)})" if years else ""
-        print(f"Aucun match {p1} vs {p2}{scope} avec ces filtres.")
+        print_notice(args, f"Aucun match {p1} vs {p2}{scope} avec ces filtres.")
+        if args.format != "text":
+            from output import write_records
+            write_records(df.drop(columns=["year"], errors="ignore"), args.format, out=args.out)
         return 0
 
     if "tourney_date" in df.columns:
@@ -138,47 +226,333 @@ def cmd_match(args, hub: DataHub):
     else:
         df = df.sort_values(["tourney_name", "round"], na_position="last")
 
-    cols = df.columns
-    have_minutes = "minutes" in cols
-    have_score = "score" in cols
-    have_best_of = "best_of" in cols
-    have_round = "round" in cols
-    have_surface = "surface" in cols
-
-    def row_to_str(r):
-        date_str = r["tourney_date"].isoformat() if pd.notna(r.get("tourney_date")) else "????-??-??"
-        parts = [f"{date_str} — {r.get('tourney_name','?')}"]
-        if have_surface and pd.notna(r.get("surface")):
-            parts[-1] += f" ({r['surface']})"
-        if have_round and pd.notna(r.get("round")):
-            parts.append(f"R: {r['round']}")
-        if have_best_of and pd.notna(r.get("best_of")):
-            try:
-                parts.append(f"Best-of-{int(r['best_of'])}")
-            except Exception:
-                pass
-        wl = f"{r.get('winner_name','?')} def. {r.get('loser_name','?')}"
-        if have_score and pd.notna(r.get('score')):
-            wl += f"  {r['score']}"
-        if have_minutes and pd.notna(r.get('minutes')):
-            try:
-                wl += f"  ({int(r['minutes'])} min)"
-            except Exception:
-                pass
-        return " | ".join(parts) + " | " + wl
-
-    for _, r in df.iterrows():
-        print(row_to_str(r))
+    from output import h2h_summary, match_lines, summary_lines, write_records, write_text
+    if args.summary:
+        with span("summary", rows=len(df)):
+            summary = h2h_summary(df, pid1, p1, pid2, p2)
+        if args.format == "text":
+            write_text(summary_lines(summary), sys.stdout, out=args.out)
+        else:
+            write_records(summary, args.format, out=args.out)
+        return 0
+
+    if args.format != "text":
+        # The store adds a year column for its index; keep both backends' records identical.
+        write_records(df.drop(columns=["year"], errors="ignore"), args.format, out=args.out)
+        return 0
+    with span("render", rows=len(df)):
+        lines = match_lines(df).tolist()
+    write_text(lines, sys.stdout, out=args.out)
+    return 0
+
+def profile_lines(profile, section: str) -> list[str]:
+    import pandas as pd
+
+    def fmt_date(v) -> str:
+        return pd.Timestamp(v).date().isoformat() if pd.notna(v) else "?"
+
+    def fmt_rank(v) -> str:
+        return str(int(v)) if pd.notna(v) else "-"
+
+    lines = []
+    s = profile.summary.iloc[0]
+    if section in ("all", "summary"):
+        lines.append(f"{s['name']} (player_id={profile.player_id})")
+        total = int(s["wins"]) + int(s["losses"])
+        pct = f" ({s['wins'] / total:.1%})" if total else ""
+        lines.append(f"Bilan: {int(s['wins'])} V - {int(s['losses'])} D{pct}, {int(s['titles'])} titres ({fmt_date(s['first_match'])} → {fmt_date(s['last_match'])})")
+        if pd.notna(s["peak_rank"]):
+            lines.append(f"Meilleur rang: {fmt_rank(s['peak_rank'])} au {fmt_date(s['peak_rank_date'])}, {int(s['weeks_at_1'])} semaines n°1, dernier rang {fmt_rank(s['last_rank'])} au {fmt_date(s['last_rank_date'])}")
+    if section in ("all", "surfaces") and not profile.surfaces.empty:
+        lines.append("Par surface:")
+        lines += [f"  {r['surface']}: {r['wins']} V - {r['losses']} D" for r in profile.surfaces.to_dict("records")]
+    if section in ("all", "years") and not profile.years.empty:
+        lines.append("Par année:")
+        lines += [
+            f"  {r['year']}: {r['wins']} V - {r['losses']} D, {r['titles']} titres, meilleur rang {fmt_rank(r['best_rank'])}, fin d'année {fmt_rank(r['year_end_rank'])}"
+            for r in profile.years.to_dict("records")
+        ]
+    if section == "rankings":
+        lines += [f"{fmt_date(r['ranking_date'])}  {fmt_rank(r['rank'])}  ({fmt_rank(r['points'])} pts)" for r in profile.rankings.to_dict("records")]
+    return lines
+
+def cmd_player(args, hub: DataHub):
+    from profiles import build_profiles, load_profile, profiles_fresh
+    if args.format != "text" and args.section == "all":
+        print(f"--format {args.format} nécessite --section summary|surfaces|years|rankings", file=sys.stderr)
+        return 1
+    if args.rebuild or not profiles_fresh(hub):
+        print("Construction des agrégats joueurs...", file=sys.stderr)
+        try:
+            build_profiles(hub)
+        except FileNotFoundError as exc:
+            print(str(exc), file=sys.stderr)
+            return 1
+    pid, name = resolve_player_id(hub, args.player)
+    if pid is None:
+        print(f"Joueur introuvable: {args.player}", file=sys.stderr)
+        return 1
+    profile = load_profile(hub, pid)
+    if profile is None:
+        print_notice(args, f"Aucun match ni classement pour {name} (player_id={pid}).")
+        return 0
+    if args.format != "text":
+        from output import write_records
+        write_records(profile.table(args.section), args.format, out=args.out)
+        return 0
+    from output import write_text
+    write_text(profile_lines(profile, args.section), sys.stdout, out=args.out)
+    return 0
+
+def filter_doubles_csv(args, doubles, years: list[int] | None = None):
+    with span("filter", rows=len(doubles)):
+        df = doubles
+        if years:
+            # Year of tourney_date, like the store's year column.
+            df = df[df["tourney_date"].map(lambda d: getattr(d, "year", None)).isin(years)]
+        if args.tournament:
+            df = df[df["tourney_name"].str.contains(args.tournament, case=False, na=False)]
+        if args.round:
+            df = df[df["round"].str.fullmatch(args.round, case=False, na=False)]
+        if args.surface:
+            df = df[df["surface"].str.fullmatch(args.surface, case=False, na=False)]
+    return df
+
+def doubles_row_to_str(r) -> str:
+    import pandas as pd
+    date_str = r["tourney_date"].isoformat() if pd.notna(r.get("tourney_date")) else "????-??-??"
+    head = f"{date_str} — {r.get('tourney_name','?')}"
+    if pd.notna(r.get("surface")):
+        head += f" ({r['surface']})"
+    parts = [head]
+    if pd.notna(r.get("round")):
+        parts.append(f"R: {r['round']}")
+    wl = f"{r.get('winner1_name','?')} / {r.get('winner2_name','?')} def. {r.get('loser1_name','?')} / {r.get('loser2_name','?')}"
+    if pd.notna(r.get("score")):
+        wl += f"  {r['score']}"
+    return " | ".join(parts) + " | " + wl
+
+@with_backend
+def cmd_doubles(args, hub: DataHub, con):
+    pid, name = resolve_player_id(hub, args.player)
+    if pid is None:
+        print(f"Joueur introuvable: {args.player}", file=sys.stderr)
+        return 1
+    partner_pid = partner = None
+    if args.partner:
+        partner_pid, partner = resolve_player_id(hub, args.partner)
+        if partner_pid is None:
+            print(f"Partenaire introuvable: {args.partner}", file=sys.stderr)
+            return 1
+
+    years = None
+    if args.year:
+        try:
+            years = [int(args.year)]
+        except Exception:
+            print("--year doit être un entier (ex: 2019)", file=sys.stderr)
+            return 1
+
+    if con is not None:
+        from store import doubles_partner_record, find_doubles
+        if partner_pid is not None:
+            df = find_doubles(con, pid, partner_pid, years, args.tournament, args.round, args.surface)
+        else:
+            record = doubles_partner_record(con, pid, years, args.tournament, args.round, args.surface)
+    else:
+        from doubles import load_index
+        try:
+            index = load_index(hub)
+        except FileNotFoundError as exc:
+            print(str(exc), file=sys.stderr)
+            return 1
+        if partner_pid is not None:
+            df = filter_doubles_csv(args, index.team_matches(pid, partner_pid), years)
+        else:
+            record = index.partner_record(pid, lambda df: filter_doubles_csv(args, df, years))
+
+    if partner_pid is not None:
+        if df.empty:
+            print(f"Aucun match de double pour {name} / {partner} avec ces filtres.")
+            return 0
+        df = df.sort_values(["tourney_date", "tourney_name", "round"], na_position="last")
+        for r in df.to_dict("records"):
+            print(doubles_row_to_str(r))
+        wins = int(((df["winner1_id"] == pid) | (df["winner2_id"] == pid)).sum())
+        print(f"Bilan {name} / {partner}: {wins} V - {len(df) - wins} D")
+        return 0
+
+    if record.empty:
+        print(f"Aucun match de double pour {name} avec ces filtres.")
+        return 0
+    print(f"{name} — bilan par partenaire")
+    for r in record.to_dict("records"):
+        print(f"  {r['partner_name']}: {int(r['wins'])} V - {int(r['losses'])} D ({int(r['matches'])} matchs)")
+    total_w = int(record["wins"].sum())
+    total = int(record["matches"].sum())
+    print(f"Total: {total_w} V - {total - total_w} D ({len(record)} partenaires)")
+    return 0
+
+def cmd_validate(args, hub: DataHub):
+    import json
+    try:
+        hub.load_matches(years=[int(y) for y in args.years] if args.years else None)
+        hub.load_rankings()
+    except FileNotFoundError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    report = hub.report
+    if args.out:
+        report.write_json(args.out)
+    if args.format == "json":
+        print(json.dumps(report.to_dict(), indent=2, ensure_ascii=False, default=str))
+    else:
+        print(report.summary())
+    return 1 if args.strict and not report.ok else 0
+
+def cmd_ingest(args, hub: DataHub):
+    import json
+    from ingest import ingest
+    store = store_path(args, hub)
+    result = ingest(hub, args.drop_dir, keep=args.keep, rebuild=args.rebuild_indexes, store=store)
+    if args.format == "json":
+        print(json.dumps(result.to_dict(), indent=2, ensure_ascii=False, default=str))
+    elif not result.files and not result.rejected and not args.rebuild_indexes:
+        print(f"Aucun fichier à ingérer dans {args.drop_dir or hub.root / 'incoming'}.")
+    else:
+        print(result.summary())
+    return 1 if result.rejected else 0
+
+def cmd_features(args, hub: DataHub):
+    from features import FEATURE_GROUPS, FeatureStore
+    store = FeatureStore(hub)
+    if args.list:
+        for g in FEATURE_GROUPS.values():
+            state = "à jour" if store.is_fresh(g.name) else "à recalculer"
+            inputs = ", ".join(dict.fromkeys(("matches", *g.inputs)))
+            print(f"{g.name:<9} v{g.version} [{state}] entrées: {inputs} — {', '.join(g.columns)}")
+        return 0
+    names = args.groups or list(FEATURE_GROUPS)
+    try:
+        statuses = store.materialize(names, rebuild=args.rebuild)
+    except (ValueError, FileNotFoundError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if args.format != "text":
+        from output import write_records
+        write_records(store.assemble(names, years=args.years), args.format, out=args.out)
+        return 0
+    for st in statuses:
+        timing = f" en {st.seconds:.1f} s" if st.state == "calculé" else ""
+        print(f"{st.name:<9} {st.state}{timing} ({st.rows} lignes)")
+    print(f"Feature store: {store.root}")
+    return 0
+
+def grid_lines(grid) -> list[str]:
+    import numpy as np
+    players = grid.players.assign(field=np.nanmean(grid.probabilities, axis=1)).sort_values("field", ascending=False)
+    surface = grid.surface or "toutes surfaces"
+    lines = [f"Grille {len(players)}×{len(players)} — {grid.date.date()} ({surface}, best-of-{grid.best_of}, modèle {grid.model_version})"]
+    for r in players.to_dict("records"):
+        rank = f"#{int(r['rank'])}" if r["rank"] == r["rank"] else "-"
+        form = f"{r['form']:.0%}" if r["form"] == r["form"] else "-"
+        lines.append(f"  {rank:>5} {r['name']:<28} Elo {r['elo']:6.0f}  forme {form:>4}  P moy. {r['field']:.1%}")
+    return lines
+
+def cmd_grid(args, hub: DataHub):
+    from matchup_grid import GridService
+    players = None
+    if args.players:
+        players = []
+        for name in args.players:
+            pid, _ = resolve_player_id(hub, name)
+            if pid is None:
+                print(f"Joueur introuvable: {name}", file=sys.stderr)
+                return 1
+            players.append(pid)
+    try:
+        grid = GridService(hub).grid(args.date, args.surface, args.top, players, args.best_of)
+    except (ValueError, FileNotFoundError) as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    if args.format != "text":
+        from output import write_records
+        write_records(grid.to_frame(), args.format, out=args.out)
+        return 0
+    from output import write_text
+    write_text(grid_lines(grid), sys.stdout, out=args.out)
+    return 0
+
+def cmd_grid_serve(args, hub: DataHub):
+    import asyncio
+    from matchup_grid import GridService, serve
+    service = GridService(hub, cache_size=args.cache_size, threads=args.threads)
+    try:
+        service.warm()
+    except FileNotFoundError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    print(f"Grilles servies sur http://{args.host}:{args.port}/grid (Ctrl-C pour arrêter)", file=sys.stderr)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def cmd_store_build(args, hub: DataHub):
+    from store import build_store
+    path = store_path(args, hub)
+    counts = build_store(hub, path)
+    print(f"Store créé: {path} (" + ", ".join(f"{k}={v}" for k, v in counts.items()) + ")")
     return 0
 
+def cmd_query(args, hub: DataHub):
+    import sqlite3
+    import pandas as pd
+    from store import describe_schema, open_store, query
+    try:
+        con = open_store(store_path(args, hub), read_only=True)
+    except FileNotFoundError as exc:
+        print(str(exc), file=sys.stderr)
+        return 1
+    with contextlib.closing(con):
+        if args.schema or not args.sql:
+            print(describe_schema(con))
+            return 0
+        try:
+            df = query(con, args.sql)
+        except (sqlite3.Error, pd.errors.DatabaseError) as exc:
+            print(f"Erreur SQL: {exc}", file=sys.stderr)
+            return 1
+    if df.empty:
+        print("Aucun résultat.")
+        return 0
+    print(df.to_string(index=False))
+    return 0
+
+def cmd_dataset(args, hub: DataHub):
+    import build_dataset
+    extra = ["--no-validate"] if not hub.validate else []
+    return build_dataset.main(["--data-root", str(hub.root), *extra, *args.dataset_args])
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="Output format (default: text)")
+    parser.add_argument("--out", type=Path, metavar="FILE", help="Write the output to FILE instead of stdout (required for parquet)")
+
 def build_parser():
     ap = argparse.ArgumentParser(description="TieBreaker CLI — Parser ATP (rankings & matches)")
     ap.add_argument("--data-root", type=Path, default=Path("data"), help="Data root directory (default: ./data)")
+    ap.add_argument("--backend", choices=["csv", "store"], default="csv", help="Data backend for rank/match: scan the CSV files (default) or use the indexed store")
+    ap.add_argument("--store", type=Path, help="Store file (default: <data-root>/processed/tiebreaker.sqlite)")
+    ap.add_argument("--no-cache", action="store_true", help="Read the CSV files directly, without the Parquet columnar cache")
+    ap.add_argument("--no-validate", action="store_true", help="Skip the validation and deduplication of loaded matches and rankings")
+    add_profile_arguments(ap)
     sp = ap.add_subparsers(dest="cmd", required=True)
 
     ap_rank = sp.add_parser("rank", help="Get a player's ATP ranking on a given date (or the most recent one)")
     ap_rank.add_argument("--player", required=True, help="Player name (ex: 'Novak Djokovic')")
     ap_rank.add_argument("--date", help="Date ISO (YYYY-MM-DD). If absent, take the last available ranking (current if available, otherwise historical).")
+    add_output_arguments(ap_rank)
     ap_rank.set_defaults(func=cmd_rank)
 
     ap_match = sp.add_parser("match", help="Find the result of a specific match between two players")
@@ -190,15 +564,90 @@ def build_parser():
     ap_match.add_argument("--surface", help="Exact surface filter (Hard, Clay, Grass, Carpet)")
     ap_match.add_argument("--date", help="Exact date filter for match/tournament (YYYY-MM-DD)")
     ap_match.add_argument("--all-years", action="store_true", help="Browse all years (slow) if --year is absent")
+    ap_match.add_argument("--summary", action="store_true", help="Print head-to-head wins per surface instead of the matches")
+    add_output_arguments(ap_match)
     ap_match.set_defaults(func=cmd_match)
+
+    ap_player = sp.add_parser("player", help="Career profile of a player: W/L per surface and year, titles, ranking trajectory")
+    ap_player.add_argument("--player", required=True, help="Player name (ex: 'Novak Djokovic')")
+    ap_player.add_argument("--section", choices=("all", "summary", "surfaces", "years", "rankings"), default="all", help="Part of the profile to print (required with machine formats; 'rankings' lists the full trajectory)")
+    ap_player.add_argument("--rebuild", action="store_true", help="Recompute the per-player aggregate tables even if the CSVs did not change")
+    add_output_arguments(ap_player)
+    ap_player.set_defaults(func=cmd_player)
+
+    ap_doubles = sp.add_parser("doubles", help="Doubles matches of a team, or a player's record with each partner")
+    ap_doubles.add_argument("--player", required=True, help="Player name (ex: 'Rohan Bopanna')")
+    ap_doubles.add_argument("--partner", help="Partner name: list the matches of this team")
+    ap_doubles.add_argument("--year", help="Exact year (ex: 2019)")
+    ap_doubles.add_argument("--tournament", help="Filter by tournament name (contains)")
+    ap_doubles.add_argument("--round", help="Exact round filter (ex: F, SF, QF)")
+    ap_doubles.add_argument("--surface", help="Exact surface filter (Hard, Clay, Grass, Carpet)")
+    ap_doubles.set_defaults(func=cmd_doubles)
+
+    ap_validate = sp.add_parser("validate", help="Check the CSVs (schema, duplicate keys, ids, dates) and print the validation report")
+    ap_validate.add_argument("--years", nargs="*", help="Match years to check (default: all)")
+    ap_validate.add_argument("--format", choices=("text", "json"), default="text", help="Report format (default: text)")
+    ap_validate.add_argument("--out", type=Path, metavar="FILE", help="Also write the JSON report to FILE")
+    ap_validate.add_argument("--strict", action="store_true", help="Exit with status 1 when the report contains errors")
+    ap_validate.set_defaults(func=cmd_validate)
+
+    ap_ingest = sp.add_parser("ingest", help="Append new match/ranking rows (CSV or JSONL drop files) and update the derived indexes")
+    ap_ingest.add_argument("--drop-dir", type=Path, help="Directory holding the new files (default: <data-root>/incoming)")
+    ap_ingest.add_argument("--keep", action="store_true", help="Leave ingested files in place instead of moving them to <drop-dir>/done")
+    ap_ingest.add_argument("--rebuild-indexes", action="store_true", help="Rebuild the derived indexes (names, H2H, rankings, Elo) from the full history")
+    ap_ingest.add_argument("--format", choices=("text", "json"), default="text", help="Report format (default: text)")
+    ap_ingest.set_defaults(func=cmd_ingest)
+
+    ap_features = sp.add_parser("features", help="Materialize the cached feature groups (rankings, age, elo, form, serve, h2h) or export them")
+    ap_features.add_argument("--groups", nargs="+", metavar="GROUP", help="Feature groups to materialize/export (default: all)")
+    ap_features.add_argument("--rebuild", action="store_true", help="Recompute the groups even if their inputs and code did not change")
+    ap_features.add_argument("--list", action="store_true", help="List the registered groups, their inputs and whether they are up to date")
+    ap_features.add_argument("--years", type=int, nargs="*", help="Export only these match years (machine formats)")
+    add_output_arguments(ap_features)
+    ap_features.set_defaults(func=cmd_features)
+
+    ap_grid = sp.add_parser("grid", help="N×N matchup win probabilities for the top players (or a list of players) at a date")
+    ap_grid.add_argument("--date", help="Date ISO (YYYY-MM-DD), default: today")
+    ap_grid.add_argument("--surface", help="Surface (Hard, Clay, Grass, Carpet); default: overall ratings only")
+    ap_grid.add_argument("--top", type=int, default=100, help="Size of the field: best-ranked players at the date (1-500, default: 100)")
+    ap_grid.add_argument("--players", nargs="+", metavar="NAME", help="Explicit field instead of --top")
+    ap_grid.add_argument("--best-of", type=int, choices=(3, 5), default=3, help="Match format (default: 3)")
+    add_output_arguments(ap_grid)
+    ap_grid.set_defaults(func=cmd_grid)
+
+    ap_grid_serve = sp.add_parser("grid-serve", help="Serve matchup grids over HTTP (asyncio): GET /grid?date=&surface=&top=&players=&best_of=")
+    ap_grid_serve.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    ap_grid_serve.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    ap_grid_serve.add_argument("--threads", type=int, default=4, help="Grids computed concurrently (default: 4)")
+    ap_grid_serve.add_argument("--cache-size", type=int, default=32, help="Grids kept in the LRU cache (default: 32)")
+    ap_grid_serve.set_defaults(func=cmd_grid_serve)
+
+    ap_store = sp.add_parser("store-build", help="Build (or rebuild) the indexed SQLite store from the CSV files")
+    ap_store.set_defaults(func=cmd_store_build)
+
+    ap_query = sp.add_parser("query", help="Run a read-only SQL query against the store (tables: players, rankings, matches)")
+    ap_query.add_argument("sql", nargs="?", help="SQL statement (ex: \"SELECT COUNT(*) FROM matches WHERE surface = 'Clay'\")")
+    ap_query.add_argument("--schema", action="store_true", help="List tables and columns of the store")
+    ap_query.set_defaults(func=cmd_query)
+
+    # Options are forwarded untouched to build_dataset (see `./TieBreaker dataset --help`).
+    ap_dataset = sp.add_parser("dataset", add_help=False, help="Build the A vs B modelling dataset (options of build_dataset.py)")
+    ap_dataset.set_defaults(func=cmd_dataset)
     return ap
 
 def main(argv=None):
     argv = argv or sys.argv[1:]
     ap = build_parser()
-    args = ap.parse_args(argv)
-    hub = DataHub(args.data_root)
-    return args.func(args, hub)
+    args, extra = ap.parse_known_args(argv)
+    if args.cmd == "dataset":
+        args.dataset_args = extra
+    elif extra:
+        ap.error(f"unrecognized arguments: {' '.join(extra)}")
+    if getattr(args, "format", None) == "parquet" and args.out is None:
+        ap.error("--format parquet requires --out FILE")
+    from models import DataHub
+    hub = DataHub(args.data_root, cache=not args.no_cache, validate=not args.no_validate or args.cmd == "validate")
+    return run_profiled(lambda: args.func(args, hub), args.cmd, args.profile, args.profile_cprofile, args.profile_trace)
 
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""
+TieBreaker validation — schema, key and date checks run on every load.
+
+``validate_matches`` and ``validate_rankings`` check the concatenated frames
+right after ``DataHub`` reads them: required columns and dtypes, duplicate keys
+(tourney_id + match_num, ranking_date + player_id) found by hashing the key
+columns in one vectorized pass, missing or self-referencing player ids and
+out-of-range dates. Rows with duplicate keys or unusable ids are dropped; every
+finding lands in a ``ValidationReport`` that serializes to JSON.
+"""
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from profiling import span
+
+
+MIN_DATE = date(1960, 1, 1)
+MAX_EXAMPLES = 5
+
+# column -> expected kind: "text", "integer" (numeric without fractional ids) or "date".
+MATCH_SCHEMA = {
+    "tourney_id": "text",
+    "tourney_name": "text",
+    "tourney_date": "date",
+    "match_num": "integer",
+    "winner_id": "integer",
+    "loser_id": "integer",
+    "winner_name": "text",
+    "loser_name": "text",
+    "round": "text",
+    "surface": "text",
+}
+RANKING_SCHEMA = {
+    "ranking_date": "date",
+    "player_id": "integer",
+    "rank": "integer",
+}
+MATCH_KEY = ["tourney_id", "match_num"]
+RANKING_KEY = ["ranking_date", "player_id"]
+
+
+@dataclass(slots=True)
+class Issue:
+    table: str
+    check: str
+    severity: str
+    count: int
+    message: str
+    dropped: int = 0
+    examples: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ValidationReport:
+    issues: list[Issue] = field(default_factory=list)
+    rows: dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not any(i.severity == "error" for i in self.issues)
+
+    def add(self, issue: Issue) -> None:
+        self.issues.append(issue)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "seconds": round(self.seconds, 4),
+            "rows": self.rows,
+            "dropped": sum(i.dropped for i in self.issues),
+            "issues": [asdict(i) for i in self.issues],
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+
+    def summary(self) -> str:
+        lines = [f"Validation: {'OK' if self.ok else 'ERREURS'} — " + ", ".join(f"{t} {n} lignes" for t, n in self.rows.items()) + f" ({self.seconds * 1000:.0f} ms)"]
+        for i in self.issues:
+            dropped = f", {i.dropped} supprimées" if i.dropped else ""
+            lines.append(f"  [{i.severity}] {i.table}.{i.check}: {i.count}{dropped} — {i.message}")
+        return "\n".join(lines)
+
+
+def _examples(df: pd.DataFrame, mask: np.ndarray | pd.Series, cols: list[str]) -> list[dict[str, Any]]:
+    cols = [c for c in cols if c in df.columns]
+    sample = df.loc[np.asarray(mask), cols].head(MAX_EXAMPLES)
+    return [{k: (None if pd.isna(v) else str(v)) for k, v in r.items()} for r in sample.to_dict("records")]
+
+
+def _kind_ok(s: pd.Series, kind: str) -> bool:
+    if kind == "integer":
+        return pd.api.types.is_integer_dtype(s) or (pd.api.types.is_float_dtype(s) and bool((s.dropna() % 1 == 0).all()))
+    if kind == "date":
+        return pd.api.types.is_datetime64_any_dtype(s) or s.dtype == object
+    return pd.api.types.is_string_dtype(s) or s.dtype == object
+
+
+def check_schema(df: pd.DataFrame, table: str, schema: dict[str, str], report: ValidationReport) -> list[str]:
+    """
+    Reports missing columns and wrong dtypes; returns the missing columns.
+    """
+    missing = [c for c in schema if c not in df.columns]
+    if missing:
+        report.add(Issue(table, "missing_columns", "error", len(missing), f"colonnes absentes: {', '.join(missing)}"))
+    wrong = [f"{c} ({df[c].dtype}, attendu {k})" for c, k in schema.items() if c in df.columns and not _kind_ok(df[c], k)]
+    if wrong:
+        report.add(Issue(table, "dtypes", "warning", len(wrong), "types inattendus: " + ", ".join(wrong)))
+    return missing
+
+
+def key_codes(df: pd.DataFrame, key: list[str]) -> np.ndarray:
+    """
+    Dense int64 code per distinct key tuple. Each column is factorized through a
+    hash table and the codes are folded pairwise, so nothing hashes strings twice.
+    """
+    codes = np.zeros(len(df), dtype=np.int64)
+    for i, col in enumerate(key):
+        if i:
+            codes, _ = pd.factorize(codes)
+        col_codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        codes = codes.astype(np.int64) * (len(uniques) + 1) + (col_codes.astype(np.int64) + 1)
+    return codes
+
+
+def missing_key_mask(df: pd.DataFrame, key: list[str]) -> np.ndarray:
+    """
+    True for rows where any key column is missing.
+    """
+    return df[key].isna().any(axis=1).to_numpy()
+
+
+def duplicate_mask(df: pd.DataFrame, key: list[str]) -> np.ndarray:
+    """
+    True for every row whose key was already seen earlier (first occurrence kept).
+    Rows with a missing key part are never duplicates: NaN does not identify a row.
+    """
+    incomplete = missing_key_mask(df, key)
+    if not incomplete.any():
+        return pd.Series(key_codes(df, key)).duplicated(keep="first").to_numpy()
+    dup = np.zeros(len(df), dtype=bool)
+    dup[~incomplete] = pd.Series(key_codes(df[~incomplete], key)).duplicated(keep="first").to_numpy()
+    return dup
+
+
+def _check_keys(df: pd.DataFrame, table: str, key: list[str], drop: np.ndarray, report: ValidationReport, message: str, example_cols: list[str]) -> np.ndarray:
+    """
+    Reports rows with an incomplete key and returns the duplicate-key mask over the other rows.
+    """
+    incomplete = missing_key_mask(df, key) & ~drop
+    if incomplete.any():
+        report.add(Issue(table, "missing_keys", "warning", int(incomplete.sum()), f"{' + '.join(key)} incomplet : ligne conservée, exclue du dédoublonnage", examples=_examples(df, incomplete, example_cols)))
+    dup = duplicate_mask(df, key) & ~drop
+    if dup.any():
+        report.add(Issue(table, "duplicate_keys", "error", int(dup.sum()), message, int(dup.sum()), _examples(df, dup, example_cols)))
+    return dup
+
+
+def _check_dates(df: pd.DataFrame, table: str, col: str, key: list[str], report: ValidationReport) -> None:
+    values = df[col]
+    if values.dtype == object:
+        missing = values.isna().to_numpy()
+        present = values[~missing]
+        out_of_range = np.zeros(len(df), dtype=bool)
+        latest = date.today() + timedelta(days=366)
+        # Python date objects: only build the per-row mask when the bounds are actually crossed.
+        if len(present) and (present.min() < MIN_DATE or present.max() > latest):
+            out_of_range[~missing] = ((present < MIN_DATE) | (present > latest)).to_numpy()
+    else:
+        dt = pd.to_datetime(values, errors="coerce")
+        missing = dt.isna().to_numpy()
+        out_of_range = ((dt < pd.Timestamp(MIN_DATE)) | (dt > pd.Timestamp.today() + pd.Timedelta(days=366))).to_numpy()
+    if missing.any():
+        report.add(Issue(table, f"{col}_missing", "warning", int(missing.sum()), f"{col} absente ou illisible", examples=_examples(df, missing, key)))
+    if out_of_range.any():
+        report.add(Issue(table, f"{col}_range", "warning", int(out_of_range.sum()), f"{col} hors de [{MIN_DATE}, aujourd'hui + 1 an]", examples=_examples(df, out_of_range, key)))
+
+
+def _drop(df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+    """
+    Removes the masked rows. A handful of rows is cut out by concatenating the
+    slices in between, which shares the column buffers instead of gathering
+    every column row by row.
+    """
+    if not mask.any():
+        return df
+    drop = np.flatnonzero(mask)
+    if len(drop) > 1000:
+        return df[~mask].reset_index(drop=True)
+    bounds = zip(np.r_[0, drop + 1], np.r_[drop, len(df)])
+    return pd.concat([df.iloc[a:b] for a, b in bounds if b > a], ignore_index=True)
+
+
+def validate_matches(df: pd.DataFrame, report: ValidationReport, table: str = "matches") -> pd.DataFrame:
+    """
+    Checks a singles matches frame and returns it without duplicate keys or unusable player ids.
+    """
+    start = time.perf_counter()
+    with span(f"validate_{table}", rows=len(df)):
+        missing = check_schema(df, table, MATCH_SCHEMA, report)
+        drop = np.zeros(len(df), dtype=bool)
+        if all(c in df.columns for c in ["winner_id", "loser_id"]):
+            w = pd.to_numeric(df["winner_id"], errors="coerce")
+            l = pd.to_numeric(df["loser_id"], errors="coerce")
+            bad = (w.isna() | l.isna() | (w == l)).to_numpy()
+            if bad.any():
+                report.add(Issue(table, "player_ids", "error", int(bad.sum()), "winner_id/loser_id manquant ou identique", int(bad.sum()), _examples(df, bad, [*MATCH_KEY, "winner_id", "loser_id"])))
+                drop |= bad
+        if not any(c in missing for c in MATCH_KEY):
+            drop |= _check_keys(df, table, MATCH_KEY, drop, report, "tourney_id + match_num en double (fichier chargé deux fois ?)", MATCH_KEY + ["tourney_name"])
+        if "tourney_date" not in missing:
+            _check_dates(df, table, "tourney_date", MATCH_KEY + ["tourney_date", "tourney_name"], report)
+        df = _drop(df, drop)
+    report.rows[table] = report.rows.get(table, 0) + len(df)
+    report.seconds += time.perf_counter() - start
+    return df
+
+
+def validate_rankings(df: pd.DataFrame, report: ValidationReport, table: str = "rankings") -> pd.DataFrame:
+    """
+    Checks a rankings frame and returns it without duplicate (ranking_date, player_id) rows or missing ids.
+    """
+    start = time.perf_counter()
+    with span(f"validate_{table}", rows=len(df)):
+        missing = check_schema(df, table, RANKING_SCHEMA, report)
+        drop = np.zeros(len(df), dtype=bool)
+        if "player_id" in df.columns:
+            bad = df["player_id"].isna().to_numpy()
+            if bad.any():
+                report.add(Issue(table, "player_ids", "error", int(bad.sum()), "player_id manquant", int(bad.sum()), _examples(df, bad, RANKING_KEY + ["rank"])))
+                drop |= bad
+        if not any(c in missing for c in RANKING_KEY):
+            drop |= _check_keys(df, table, RANKING_KEY, drop, report, "ranking_date + player_id en double (fichier courant et fichiers par décennie ?)", RANKING_KEY + ["rank", "points"])
+        if "rank" in df.columns:
+            bad_rank = (pd.to_numeric(df["rank"], errors="coerce") <= 0).fillna(False).to_numpy()
+            if bad_rank.any():
+                report.add(Issue(table, "rank_range", "warning", int(bad_rank.sum()), "rang nul ou négatif", examples=_examples(df, bad_rank, RANKING_KEY + ["rank"])))
+        if "ranking_date" not in missing:
+            _check_dates(df, table, "ranking_date", RANKING_KEY, report)
+        df = _drop(df, drop)
+    report.rows[table] = report.rows.get(table, 0) + len(df)
+    report.seconds += time.perf_counter() - start
+    return df
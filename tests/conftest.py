@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+# player_id -> (first name, last name); 5 is a homonym of 2 with another id.
+PLAYERS = {
+    1: ("Ann", "Alpha"),
+    2: ("Bob", "Beta"),
+    3: ("Cid", "Gamma"),
+    4: ("Dan", "Delta"),
+    5: ("Bob", "Beta"),
+}
+
+
+def player_name(pid: int) -> str:
+    first, last = PLAYERS[pid]
+    return f"{first} {last}"
+
+
+def match_row(tourney_id: str, match_num: int, date: str, winner: int, loser: int, surface: str = "Hard",
+              level: str = "A", round_: str = "R32", best_of: int = 3, tourney_name: str | None = None) -> dict:
+    return {
+        "tourney_id": tourney_id,
+        "tourney_name": tourney_name or f"Open {tourney_id}",
+        "surface": surface,
+        "draw_size": 32,
+        "tourney_level": level,
+        "tourney_date": date,
+        "match_num": match_num,
+        "winner_id": winner,
+        "winner_name": player_name(winner),
+        "winner_hand": "R",
+        "winner_ht": 185,
+        "winner_age": 25.0,
+        "loser_id": loser,
+        "loser_name": player_name(loser),
+        "loser_hand": "R",
+        "loser_ht": 185,
+        "loser_age": 25.0,
+        "score": "6-4 6-4",
+        "best_of": best_of,
+        "round": round_,
+        "minutes": 90,
+        "w_svpt": 60, "w_1stIn": 36, "w_1stWon": 28, "w_2ndWon": 12,
+        "l_svpt": 62, "l_1stIn": 37, "l_1stWon": 24, "l_2ndWon": 11,
+    }
+
+
+# Main draw matches of the fixture season, in file order.
+MATCHES_2019 = [
+    match_row("2019-0301", 1, "20190107", 1, 2),
+    match_row("2019-0301", 2, "20190107", 3, 4),
+    match_row("2019-0301", 3, "20190107", 1, 3, round_="F"),
+    match_row("2019-0520", 1, "20190527", 2, 1, surface="Clay", level="G", best_of=5),
+    match_row("2019-0520", 2, "20190527", 5, 4, surface="Clay", level="G", best_of=5),
+    match_row("2019-0520", 3, "20190527", 2, 3, surface="Clay", level="G", best_of=5, round_="F"),
+    match_row("2019-0540", 1, "20190617", 1, 5, surface="Grass", round_="F"),
+]
+RANKINGS = [
+    {"ranking_date": d, "rank": r, "player": pid, "points": 5000 - 1000 * r}
+    for d in ("20190107", "20190603")
+    for r, pid in enumerate((1, 2, 3, 4), start=1)
+]
+
+
+def write_data_root(root: Path, matches: dict[str, list[dict]] | None = None, rankings: list[dict] | None = None) -> Path:
+    """
+    Minimal data tree in the layout DataHub reads. ``matches`` maps a file name
+    (ex: ``atp_matches_2019.csv``) to its rows.
+    """
+    (root / "atp_player").mkdir(parents=True, exist_ok=True)
+    (root / "atp_current_ranking").mkdir(exist_ok=True)
+    (root / "atp_matches").mkdir(exist_ok=True)
+    pd.DataFrame([
+        {"player_id": pid, "name_first": first, "name_last": last, "hand": "R", "dob": 19950101 + pid, "ioc": "FRA", "height": 185}
+        for pid, (first, last) in PLAYERS.items()
+    ]).to_csv(root / "atp_player" / "atp_players.csv", index=False)
+    pd.DataFrame(RANKINGS if rankings is None else rankings).to_csv(root / "atp_current_ranking" / "atp_rankings_current.csv", index=False)
+    for name, rows in (matches if matches is not None else {"atp_matches_2019.csv": MATCHES_2019}).items():
+        pd.DataFrame(rows).to_csv(root / "atp_matches" / name, index=False)
+    return root
+
+
+@pytest.fixture
+def data_root(tmp_path: Path) -> Path:
+    return write_data_root(tmp_path / "data")
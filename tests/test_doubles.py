@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import player_name
+from doubles import INDEX_DIR, DoublesIndex, index_fingerprint, load_index
+from models import DataHub
+
+
+def doubles_row(match_num, date, w1, w2, l1, l2, year="2019", surface="Hard"):
+    return {
+        "tourney_id": f"{year}-0301", "tourney_name": "Open", "surface": surface, "tourney_level": "A",
+        "tourney_date": date, "match_num": match_num,
+        "winner1_id": w1, "winner1_name": player_name(w1), "winner2_id": w2, "winner2_name": player_name(w2),
+        "loser1_id": l1, "loser1_name": player_name(l1), "loser2_id": l2, "loser2_name": player_name(l2),
+        "score": "6-4 6-4", "round": "R16",
+    }
+
+
+@pytest.fixture
+def hub(data_root):
+    pd.DataFrame([
+        doubles_row(1, "20190107", 1, 2, 3, 4),
+        doubles_row(2, "20190107", 3, 4, 2, 1, surface="Clay"),
+        doubles_row(3, "20190107", 1, 3, 2, 4),
+    ]).to_csv(data_root / "atp_matches" / "atp_matches_doubles_2019.csv", index=False)
+    pd.DataFrame([doubles_row(1, "20200106", 2, 1, 4, 3, year="2020")]).to_csv(
+        data_root / "atp_matches" / "atp_matches_doubles_2020.csv", index=False)
+    return DataHub(data_root)
+
+
+def records(df):
+    return {int(r["partner_id"]): (int(r["wins"]), int(r["losses"])) for r in df.to_dict("records")}
+
+
+def test_team_and_partner_lookups(hub):
+    index = DoublesIndex.build(hub.load_doubles())
+    assert list(index.team_matches(2, 1)["match_num"]) == [1, 2, 1]
+    assert index.team_matches(1, 4).empty
+    assert records(index.partner_record(1)) == {2: (2, 1), 3: (1, 0)}
+    only_2019 = index.partner_record(1, lambda df: df[df["tourney_date"].map(lambda d: d.year) == 2019])
+    assert records(only_2019) == {2: (1, 1), 3: (1, 0)}
+
+
+def test_index_is_saved_and_reused_until_the_sources_change(hub):
+    built = load_index(hub)
+    assert (hub.root / INDEX_DIR / "meta.json").exists()
+    reopened = load_index(DataHub(hub.root))
+    pd.testing.assert_frame_equal(reopened.appearances, built.appearances)
+    assert records(reopened.partner_record(1)) == records(built.partner_record(1))
+
+    f = hub.root / "atp_matches" / "atp_matches_doubles_2020.csv"
+    pd.DataFrame([doubles_row(1, "20200106", 1, 3, 2, 4, year="2020")]).to_csv(f, index=False)
+    os.utime(f, ns=(f.stat().st_mtime_ns + 10**9,) * 2)
+    assert records(load_index(DataHub(hub.root)).partner_record(1)) == {2: (1, 1), 3: (2, 0)}
+
+
+def test_stale_or_corrupt_index_is_ignored(hub):
+    load_index(hub)
+    directory = hub.root / INDEX_DIR
+    assert DoublesIndex.open(directory, "other-fingerprint") is None
+    (directory / "by_team.npz").write_bytes(b"not an npz")
+    assert DoublesIndex.open(directory, index_fingerprint(hub)) is None
+    assert records(load_index(hub).partner_record(1)) == {2: (2, 1), 3: (1, 0)}
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import features
+from build_dataset import run
+from conftest import MATCHES_2019, match_row, write_data_root
+from elo import chronological
+from features import FEATURE_GROUPS, FeatureStore
+from ingest import EloState
+from models import DataHub
+
+MATCHES_2018 = [
+    match_row("2018-0301", 1, "20180108", 2, 3),
+    match_row("2018-0301", 2, "20180108", 1, 4, surface="Clay", round_="F"),
+]
+
+
+@pytest.fixture
+def two_seasons(tmp_path: Path) -> Path:
+    return write_data_root(tmp_path / "data", {"atp_matches_2018.csv": MATCHES_2018, "atp_matches_2019.csv": MATCHES_2019})
+
+
+def test_elo_features_match_the_ingest_state(two_seasons: Path) -> None:
+    hub = DataHub(two_seasons)
+    out = FeatureStore(hub).assemble(["elo"])
+    history = chronological(hub.load_matches())
+    for k in range(len(history)):
+        state = EloState.empty()
+        state.update(history.iloc[:k])
+        row = history.iloc[k]
+        pair = out[(out["tourney_id"] == str(row["tourney_id"])) & (out["match_num"] == int(row["match_num"]))].set_index("side")
+        for side, pid in (("winner", int(row["winner_id"])), ("loser", int(row["loser_id"]))):
+            assert pair.loc[side, "elo"] == pytest.approx(state.ratings["all"].get(pid, 1500.0))
+            assert pair.loc[side, "elo_surface"] == pytest.approx(state.ratings[row["surface"]].get(pid, 1500.0))
+            assert pair.loc[side, "elo_matches"] == state.counts["all"].get(pid, 0)
+
+
+def test_code_hash_covers_the_declared_helpers(monkeypatch: pytest.MonkeyPatch) -> None:
+    before = {name: group.code_hash for name, group in FEATURE_GROUPS.items()}
+    original = features._code
+    monkeypatch.setattr(features, "_code", lambda obj: b"edited" if obj is features._prior_window else original(obj))
+    after = {name: group.code_hash for name, group in FEATURE_GROUPS.items()}
+    assert {name for name in before if before[name] != after[name]} == {"form", "serve"}
+
+
+def test_code_hash_covers_the_spine(data_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    store = FeatureStore(DataHub(data_root))
+    store.materialize(["h2h"])
+    before = {name: group.code_hash for name, group in FEATURE_GROUPS.items()}
+    spine_before = store.spine_fingerprint()
+    original = features._code
+    monkeypatch.setattr(features, "_code", lambda obj: b"edited" if obj is features.build_spine else original(obj))
+    assert all(group.code_hash != before[name] for name, group in FEATURE_GROUPS.items())
+    assert store.spine_fingerprint() != spine_before
+
+    # The spine is rewritten along with the groups built on it.
+    assert not store._fresh("spine", store.spine_fingerprint())
+    store.materialize(["h2h"])
+    assert store._fresh("spine", store.spine_fingerprint())
+
+
+def test_rebuild_rewrites_the_spine(data_root: Path) -> None:
+    store = FeatureStore(DataHub(data_root))
+    store.materialize(["h2h"])
+    # A spine whose meta still looks fresh, e.g. written by an older build_spine.
+    pd.DataFrame({"tourney_id": ["stale"]}).to_parquet(store.root / "spine.parquet")
+    store.materialize(["h2h"], rebuild=True)
+    assert len(store.assemble(["h2h"])) == 2 * len(MATCHES_2019)
+
+
+def test_unvalidated_cache_is_not_reused_for_validated_runs(data_root: Path) -> None:
+    loose = FeatureStore(DataHub(data_root, validate=False))
+    strict = FeatureStore(DataHub(data_root))
+    assert loose.group_fingerprint(FEATURE_GROUPS["h2h"]) != strict.group_fingerprint(FEATURE_GROUPS["h2h"])
+    assert loose.spine_fingerprint() != strict.spine_fingerprint()
+
+    assert [s.state for s in loose.materialize(["h2h"])] == ["calculé"]
+    assert [s.state for s in strict.materialize(["h2h"])] == ["calculé"]
+    assert [s.state for s in strict.materialize(["h2h"])] == ["en cache"]
+
+
+def test_join_ab_reads_only_the_dataset_years(two_seasons: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+                                              capsys: pytest.CaptureFixture[str]) -> None:
+    dataset = run(two_seasons, [2019], False, None, tmp_path / "dataset.parquet")
+    store = FeatureStore(DataHub(two_seasons))
+    full = store.join_ab(dataset, ["elo", "h2h"], years=[2018, 2019])
+
+    seen: list[list[int] | None] = []
+    assemble = FeatureStore.assemble
+    monkeypatch.setattr(FeatureStore, "assemble", lambda self, names, years=None: seen.append(years) or assemble(self, names, years))
+    joined = store.join_ab(dataset, ["elo", "h2h"])
+    assert seen == [[2019]]
+    pd.testing.assert_frame_equal(joined, full)
+    # Pre-match ratings carry the 2018 results even though only 2019 rows were read.
+    assert not np.allclose(joined["elo_A"].to_numpy(), 1500.0)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from conftest import match_row
+from ingest import Indexes, index_dir, ingest, load_or_build_indexes
+from models import INGESTED_DIR, DataHub
+
+# 2019-0301 and 2019-0520 are in the base CSV; 2019-0600 comes after every base match.
+NEW_MATCHES = [
+    match_row("2019-0600", 1, "20190701", 3, 1, surface="Grass", level="G", best_of=5),
+    match_row("2019-0600", 2, "20190701", 2, 4, surface="Grass", level="G", best_of=5),
+]
+# Played in February, i.e. before matches already rated.
+LATE_MATCHES = [
+    match_row("2019-0400", 1, "20190211", 4, 1),
+    match_row("2019-0400", 2, "20190211", 4, 2, round_="F"),
+]
+
+
+def drop(root: Path, name: str, rows: list[dict]) -> Path:
+    incoming = root / "incoming"
+    incoming.mkdir(exist_ok=True)
+    path = incoming / name
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+
+def elo_table(idx: Indexes) -> pd.DataFrame:
+    return idx.elo.to_frame().sort_values("player_id").reset_index(drop=True)
+
+
+def assert_same_state(idx: Indexes, root: Path) -> None:
+    rebuilt = Indexes.build(DataHub(root))
+    pd.testing.assert_frame_equal(elo_table(idx), elo_table(rebuilt))
+    pd.testing.assert_frame_equal(idx.h2h.sort_index(), rebuilt.h2h.sort_index(), check_dtype=False)
+    assert sorted(idx.match_keys.tolist()) == sorted(rebuilt.match_keys.tolist())
+    assert sorted(idx.ranking_keys.tolist()) == sorted(rebuilt.ranking_keys.tolist())
+    assert idx.elo.last_key == rebuilt.elo.last_key
+
+
+def parts(root: Path) -> list[str]:
+    return sorted(p.name for p in (root / INGESTED_DIR).rglob("*") if p.is_file())
+
+
+def test_ingest_moves_drop_files_and_commits_parts(data_root: Path) -> None:
+    drop(data_root, "new.csv", NEW_MATCHES)
+    result = ingest(DataHub(data_root))
+    assert result.matches == 2
+    assert not (data_root / "incoming" / "new.csv").exists()
+    assert (data_root / "incoming" / "done" / "new.csv").exists()
+    assert [p for p in parts(data_root) if p.startswith("matches_2019_")]
+    assert not [p for p in parts(data_root) if p.endswith(".tmp")]
+    assert len(DataHub(data_root).load_matches()) == 9
+
+
+def test_same_drop_twice_is_a_no_op(data_root: Path) -> None:
+    drop(data_root, "new.csv", NEW_MATCHES)
+    ingest(DataHub(data_root), keep=True)
+    before = parts(data_root)
+    state = Indexes.load(index_dir(DataHub(data_root)))
+
+    result = ingest(DataHub(data_root), keep=True)
+    assert result.matches == 0
+    assert not result.bootstrapped
+    assert parts(data_root) == before
+    again = Indexes.load(index_dir(DataHub(data_root)))
+    pd.testing.assert_frame_equal(elo_table(again), elo_table(state))
+    assert again.match_keys.tolist() == state.match_keys.tolist()
+    assert len(DataHub(data_root).load_matches()) == 9
+
+
+def test_incremental_state_equals_a_full_rebuild(data_root: Path) -> None:
+    drop(data_root, "a.csv", NEW_MATCHES)
+    drop(data_root, "b.csv", [{"ranking_date": "20190708", "rank": r, "player": pid, "points": 100 * r} for r, pid in enumerate((3, 1, 2), 1)])
+    ingest(DataHub(data_root))
+    assert_same_state(Indexes.load(index_dir(DataHub(data_root))), data_root)
+
+
+def test_late_results_replay_elo_from_the_history(data_root: Path) -> None:
+    ingest(DataHub(data_root), rebuild=True)
+    drop(data_root, "late.csv", LATE_MATCHES)
+    result = ingest(DataHub(data_root))
+    assert result.matches == 2
+    assert_same_state(Indexes.load(index_dir(DataHub(data_root))), data_root)
+
+
+def test_late_results_in_the_same_run_as_new_ones(data_root: Path) -> None:
+    drop(data_root, "1_new.csv", NEW_MATCHES)
+    drop(data_root, "2_late.csv", LATE_MATCHES)
+    ingest(DataHub(data_root))
+    assert_same_state(Indexes.load(index_dir(DataHub(data_root))), data_root)
+
+
+def test_orphan_tmp_parts_are_dropped_on_load(data_root: Path) -> None:
+    hub = DataHub(data_root)
+    load_or_build_indexes(hub)
+    orphan = data_root / INGESTED_DIR / "matches" / "matches_2019_x.parquet.tmp"
+    orphan.parent.mkdir(parents=True)
+    pd.DataFrame(NEW_MATCHES).to_parquet(orphan, index=False)
+
+    idx, rebuilt = load_or_build_indexes(DataHub(data_root))
+    assert not rebuilt
+    assert not orphan.exists()
+    assert len(DataHub(data_root).load_matches()) == len(idx.match_keys) == 7
+
+
+def test_pending_parts_are_committed_on_load(data_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    drop(data_root, "new.csv", NEW_MATCHES)
+    # Stop right after the indexes are saved, before the parts are renamed.
+    monkeypatch.setattr(Path, "replace", lambda self, target: (_ for _ in ()).throw(OSError("crash")))
+    with pytest.raises(OSError):
+        ingest(DataHub(data_root))
+    monkeypatch.undo()
+    assert (data_root / "incoming" / "new.csv").exists()
+    assert len(DataHub(data_root).load_matches()) == 7
+
+    idx, rebuilt = load_or_build_indexes(DataHub(data_root))
+    assert not rebuilt
+    assert len(DataHub(data_root).load_matches()) == len(idx.match_keys) == 9
+    assert ingest(DataHub(data_root)).matches == 0
+
+
+def test_lost_pending_part_triggers_a_rebuild(data_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    drop(data_root, "new.csv", NEW_MATCHES)
+    monkeypatch.setattr(Path, "replace", lambda self, target: (_ for _ in ()).throw(OSError("crash")))
+    with pytest.raises(OSError):
+        ingest(DataHub(data_root))
+    monkeypatch.undo()
+    for tmp in (data_root / INGESTED_DIR).rglob("*.tmp"):
+        tmp.unlink()
+
+    idx, rebuilt = load_or_build_indexes(DataHub(data_root))
+    assert rebuilt
+    assert len(idx.match_keys) == 7
+    assert ingest(DataHub(data_root)).matches == 2
+    assert_same_state(Indexes.load(index_dir(DataHub(data_root))), data_root)
+
+
+
+def test_undated_rows_are_dropped_and_reported(data_root: Path) -> None:
+    drop(data_root, "new.csv", [*NEW_MATCHES, match_row("2019-0600", 3, "garbage", 1, 2), match_row("2019-0600", 4, "", 3, 4)])
+    result = ingest(DataHub(data_root))
+    assert result.matches == 2
+    assert not result.rejected
+    issue = next(i for i in result.report.issues if i.check == "missing_date")
+    assert issue.dropped == 2
+    assert {e["match_num"] for e in issue.examples} == {"3", "4"}
+    assert len(DataHub(data_root).load_matches()) == 9
+    assert_same_state(Indexes.load(index_dir(DataHub(data_root))), data_root)
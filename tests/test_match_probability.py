@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from match_probability import (
+    MatchProbabilityTable,
+    game_win_probability,
+    live_match_win_probability,
+    match_win_probability,
+    set_win_probability,
+    tiebreak_win_probability,
+)
+
+
+def test_game_at_sixty_percent():
+    assert game_win_probability(0.6) == pytest.approx(0.7357, abs=1e-4)
+
+
+def test_game_from_deuce_is_closed_form():
+    p = 0.6
+    assert game_win_probability(p, points=(3, 3)) == pytest.approx(p * p / (p * p + (1 - p) ** 2))
+
+
+@pytest.mark.parametrize("best_of", [3, 5])
+@pytest.mark.parametrize("p", [0.5, 0.62, 0.7])
+def test_equal_players_are_even(p, best_of):
+    assert match_win_probability(p, p, best_of=best_of) == pytest.approx(0.5, abs=1e-12)
+    assert set_win_probability(p, p) + set_win_probability(p, p, a_serves_first=False) == pytest.approx(1.0, abs=1e-12)
+    assert tiebreak_win_probability(p, p) == pytest.approx(0.5, abs=1e-12)
+
+
+@pytest.mark.parametrize("best_of", [3, 5])
+def test_monotonic_in_serve_probability(best_of):
+    p = np.linspace(0.40, 0.85, 46)
+    assert np.all(np.diff(game_win_probability(p)) > 0)
+    assert np.all(np.diff(match_win_probability(p, 0.62, best_of=best_of)) > 0)
+    assert np.all(np.diff(match_win_probability(0.62, p, best_of=best_of)) < 0)
+
+
+def test_best_of_five_amplifies_the_favourite():
+    assert match_win_probability(0.66, 0.62, best_of=5) > match_win_probability(0.66, 0.62, best_of=3) > 0.5
+
+
+def test_arrays_match_scalars():
+    pa = np.array([0.55, 0.63, 0.71])
+    pb = np.array([0.60, 0.63, 0.58])
+    batch = match_win_probability(pa, pb)
+    assert batch == pytest.approx([match_win_probability(a, b) for a, b in zip(pa, pb)])
+
+
+def test_live_state_at_start_matches_pre_match():
+    assert live_match_win_probability(0.65, 0.6, a_serving=True) == pytest.approx(match_win_probability(0.65, 0.6, a_serves_first=True))
+    assert live_match_win_probability(0.65, 0.6, sets=(2, 0)) == 1.0
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        match_win_probability(0.6, 0.6, best_of=4)
+
+
+@pytest.mark.parametrize("best_of", [3, 5])
+def test_table_lookup_agrees_with_exact_dp(best_of):
+    table = MatchProbabilityTable.build(best_of=best_of)
+    rng = np.random.default_rng(0)
+    pa, pb = rng.uniform(0.35, 0.9, 300), rng.uniform(0.35, 0.9, 300)
+    assert np.abs(table.lookup(pa, pb) - match_win_probability(pa, pb, best_of=best_of)).max() < 1e-3
+    # Grid points are exact.
+    assert table.lookup(table.lo, table.lo) == pytest.approx(table.values[0, 0])
+
+
+def test_table_round_trip(tmp_path):
+    table = MatchProbabilityTable.build(best_of=3, lo=0.5, hi=0.7, step=0.05)
+    table.save(tmp_path / "table.npz")
+    loaded = MatchProbabilityTable.load(tmp_path / "table.npz")
+    assert loaded.best_of == 3 and np.array_equal(loaded.values, table.values)
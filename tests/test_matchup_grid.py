@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import tiebreaker_cli
+from features import FeatureStore
+from matchup_grid import MAX_GRID_PLAYERS, GridService, _handle
+from models import DataHub
+
+
+@pytest.fixture
+def service(data_root: Path) -> Iterator[GridService]:
+    service = GridService(DataHub(data_root))
+    service.warm()
+    yield service
+    service.close()
+
+
+def request(service: GridService, path: str) -> tuple[int, dict]:
+    async def exchange() -> bytes:
+        server = await asyncio.start_server(lambda r, w: _handle(service, r, w), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            await writer.drain()
+            raw = await reader.read()
+            writer.close()
+            return raw
+
+    head, _, body = asyncio.run(exchange()).partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_grid_is_complementary(service: GridService) -> None:
+    grid = service.grid("2019-07-01", top=4)
+    assert len(grid.players) == 4
+    p = grid.probabilities
+    assert np.isnan(np.diag(p)).all()
+    iu = np.triu_indices(4, 1)
+    np.testing.assert_allclose(p[iu] + p.T[iu], 1.0)
+
+
+@pytest.mark.parametrize("top", [0, -1, MAX_GRID_PLAYERS + 1])
+def test_top_out_of_bounds_is_rejected(service: GridService, top: int) -> None:
+    with pytest.raises(ValueError, match="top"):
+        service.grid("2019-07-01", top=top)
+
+
+def test_too_many_players_is_rejected(service: GridService) -> None:
+    with pytest.raises(ValueError, match="joueurs"):
+        service.grid("2019-07-01", players=list(range(MAX_GRID_PLAYERS + 1)))
+
+
+def test_history_must_hold_match_pairs(data_root: Path) -> None:
+    history = FeatureStore(DataHub(data_root)).assemble(["elo", "serve"])
+    service = GridService(DataHub(data_root))
+    with pytest.raises(ValueError, match="nombre pair"):
+        service._index_history(history.iloc[1:])
+    with pytest.raises(ValueError, match="ne forment pas un match"):
+        service._index_history(history.iloc[[0, 3, 2, 1, *range(4, len(history))]])
+
+
+def count_scores(service: GridService, monkeypatch: pytest.MonkeyPatch, delay: float = 0.0) -> list[int]:
+    calls: list[int] = []
+    score = service._score
+
+    def counting(states, best_of):
+        calls.append(len(states))
+        time.sleep(delay)
+        return score(states, best_of)
+    monkeypatch.setattr(service, "_score", counting)
+    return calls
+
+
+def test_grid_async_coalesces_identical_requests(service: GridService, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Slow enough that every request is issued while the first computations are in flight.
+    calls = count_scores(service, monkeypatch, delay=0.2)
+
+    async def burst() -> list:
+        return await asyncio.gather(*(
+            [service.grid_async("2019-07-01", top=3) for _ in range(4)]
+            + [service.grid_async("2019-07-01", surface="Clay", top=3) for _ in range(3)]
+        ))
+
+    grids = asyncio.run(burst())
+    assert len(calls) == 2
+    assert all(g is grids[0] for g in grids[:4]) and all(g is grids[4] for g in grids[4:])
+    assert grids[0] is not grids[4]
+    assert (service.hits, service.misses) == (0, 2)
+    assert not service._inflight
+
+
+def test_lru_evicts_the_least_recently_used_grid(data_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    service = GridService(DataHub(data_root), cache_size=1)
+    calls = count_scores(service, monkeypatch)
+    first = service.grid("2019-07-01", top=3)
+    assert service.grid("2019-07-01", top=3) is first
+    service.grid("2019-07-01", surface="Clay", top=3)
+    again = service.grid("2019-07-01", top=3)
+    assert again is not first
+    assert len(calls) == 3
+    assert (service.hits, service.misses) == (1, 3)
+    assert len(service._cache) == 1
+
+
+def test_lru_keeps_recently_read_grids(data_root: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    service = GridService(DataHub(data_root), cache_size=2)
+    calls = count_scores(service, monkeypatch)
+    a = service.grid("2019-07-01", top=3)
+    b = service.grid("2019-07-01", surface="Clay", top=3)
+    assert service.grid("2019-07-01", top=3) is a
+    service.grid("2019-07-01", surface="Grass", top=3)
+    # b was the least recently used, not a (the oldest insertion).
+    assert service.grid("2019-07-01", top=3) is a
+    assert service.grid("2019-07-01", surface="Clay", top=3) is not b
+    assert len(calls) == 4
+    assert (service.hits, service.misses) == (2, 4)
+
+
+def test_http_errors_are_json(service: GridService, monkeypatch: pytest.MonkeyPatch) -> None:
+    status, body = request(service, "/grid?date=2019-07-01&top=3")
+    assert status == 200 and len(body["players"]) == 3
+    assert request(service, "/grid?top=-1")[0] == 400
+    assert request(service, "/grid?top=abc")[0] == 400
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(service, "grid", broken)
+    status, body = request(service, "/grid?date=2019-06-01&top=2")
+    assert status == 500
+    assert body == {"error": "erreur interne"}
+    assert request(service, "/health")[0] == 200
+
+
+def test_grid_text_goes_to_out(data_root: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    out = tmp_path / "grid.txt"
+    assert tiebreaker_cli.main(["--data-root", str(data_root), "grid", "--date", "2019-07-01", "--top", "3", "--out", str(out)]) == 0
+    assert capsys.readouterr().out == ""
+    assert "Ann Alpha" in out.read_text(encoding="utf-8")
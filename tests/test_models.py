@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from models import DataHub
+
+
+def test_csv_is_cached_as_parquet(data_root):
+    hub = DataHub(data_root)
+    first = hub.load_matches()
+    cache = hub.cache_path(data_root / "atp_matches" / "atp_matches_2019.csv")
+    assert cache.exists()
+    pd.testing.assert_frame_equal(DataHub(data_root).load_matches(), first)
+
+
+def test_unwritable_cache_warns_and_still_loads(data_root, capsys):
+    (data_root / "processed").write_text("not a directory")
+    matches = DataHub(data_root).load_matches()
+    assert len(matches) == 7
+    assert "Cache non écrit" in capsys.readouterr().err
+
+
+def test_corrupt_cache_is_reparsed(data_root, capsys):
+    hub = DataHub(data_root)
+    hub.load_matches()
+    cache = hub.cache_path(data_root / "atp_matches" / "atp_matches_2019.csv")
+    cache.write_bytes(b"garbage")
+    assert len(DataHub(data_root).load_matches()) == 7
+    assert "Cache illisible" in capsys.readouterr().err
+    assert len(pd.read_parquet(cache)) == 7
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+
+import pandas as pd
+import pytest
+
+import tiebreaker_cli
+from conftest import match_row
+from output import match_lines, write_records, write_text
+
+
+def run_cli(capsys, data_root, *argv):
+    code = tiebreaker_cli.main(["--data-root", str(data_root), *argv])
+    return code, capsys.readouterr().out
+
+
+def test_write_text_to_file(tmp_path, capsys):
+    write_text(["a", "b"], out=tmp_path / "sub" / "out.txt")
+    assert (tmp_path / "sub" / "out.txt").read_text(encoding="utf-8") == "a\nb\n"
+    assert capsys.readouterr().out == ""
+
+
+def test_match_lines_truncate_fractional_numbers():
+    row = match_row("2019-0301", 1, "20190107", 1, 2)
+    lines = match_lines(pd.DataFrame([
+        {**row, "minutes": 90.5, "best_of": 3.0},
+        {**row, "minutes": "95.9", "best_of": None},
+        {**row, "minutes": None},
+    ]))
+    assert "(90 min)" in lines.iloc[0] and "Best-of-3" in lines.iloc[0]
+    assert "(95 min)" in lines.iloc[1] and "Best-of" not in lines.iloc[1]
+    assert " min)" not in lines.iloc[2]
+
+
+@pytest.mark.parametrize("fmt", ["json", "jsonl", "csv"])
+def test_write_records_formats(tmp_path, fmt):
+    df = pd.DataFrame({"player_id": [1, 2], "tourney_date": pd.to_datetime(["2019-01-07", "2019-05-27"])})
+    write_records(df, fmt, out=tmp_path / f"out.{fmt}")
+    text = (tmp_path / f"out.{fmt}").read_text(encoding="utf-8")
+    if fmt == "json":
+        assert [r["tourney_date"] for r in json.loads(text)] == ["2019-01-07", "2019-05-27"]
+    elif fmt == "jsonl":
+        assert [json.loads(line)["player_id"] for line in text.splitlines()] == [1, 2]
+    else:
+        assert text.splitlines()[0] == "player_id,tourney_date"
+
+
+@pytest.mark.parametrize("argv", [
+    ["match", "--p1", "Ann Alpha", "--p2", "Cid Gamma", "--all-years"],
+    ["match", "--p1", "Ann Alpha", "--p2", "Cid Gamma", "--all-years", "--summary"],
+    ["match", "--p1", "Ann Alpha", "--p2", "Dan Delta", "--all-years"],
+    ["rank", "--player", "Cid Gamma", "--date", "2019-03-01"],
+    ["player", "--player", "Ann Alpha", "--section", "surfaces"],
+])
+def test_text_output_honours_out(data_root, tmp_path, capsys, argv):
+    code, stdout = run_cli(capsys, data_root, *argv)
+    assert code == 0 and stdout
+    out = tmp_path / "out.txt"
+    code, redirected = run_cli(capsys, data_root, *argv, "--out", str(out))
+    assert code == 0 and redirected == ""
+    assert out.read_text(encoding="utf-8") == stdout
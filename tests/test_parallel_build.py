@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_dataset import get_rank_on_or_before, prepare_rankings, run
+from conftest import MATCHES_2019, match_row, write_data_root
+from models import DataHub
+from parallel_build import RankingArrays, partitions_dir, shard_matches
+
+MATCHES_2018 = [
+    match_row("2018-0301", 1, "20180108", 2, 3),
+    match_row("2018-0301", 2, "20180108", 1, 4, round_="F"),
+]
+
+
+def test_ranking_arrays_agree_with_the_frame_lookup(data_root: Path) -> None:
+    rankings = prepare_rankings(DataHub(data_root).load_rankings())
+    arrays = RankingArrays.from_frame(rankings)
+    for pid in (1, 2, 3, 4, 5, None):
+        for day in ("2019-01-06", "2019-01-07", "2019-03-01", "2019-06-03", "2020-05-01", "2021-01-01"):
+            expected = get_rank_on_or_before(rankings, pid, "", pd.Timestamp(day))
+            got = get_rank_on_or_before(arrays, pid, "", pd.Timestamp(day))
+            assert got.keys() == expected.keys()
+            for k, v in expected.items():
+                assert (pd.isna(v) and pd.isna(got[k])) or got[k] == v, (pid, day, k)
+
+
+def test_shard_matches_keeps_year_order_with_undated_last() -> None:
+    matches = pd.DataFrame(MATCHES_2018 + MATCHES_2019 + [match_row("x", 1, None, 1, 2)])
+    matches["tourney_date"] = pd.to_datetime(matches["tourney_date"], format="%Y%m%d")
+    shards = shard_matches(matches)
+    assert [year for year, _ in shards] == [2018, 2019, None]
+    assert [len(s) for _, s in shards] == [2, 7, 1]
+    np.testing.assert_array_equal(pd.concat([s for _, s in shards])["match_num"].to_numpy(), matches["match_num"].to_numpy())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_build_matches_the_in_process_build(tmp_path: Path, workers: int, capsys: pytest.CaptureFixture[str]) -> None:
+    root = write_data_root(tmp_path / "data", {"atp_matches_2018.csv": MATCHES_2018, "atp_matches_2019.csv": MATCHES_2019})
+    run(root, None, True, None, tmp_path / "serial.parquet")
+    run(root, None, True, None, tmp_path / "parallel.parquet", workers=workers)
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "parallel.parquet"), pd.read_parquet(tmp_path / "serial.parquet"))
+    assert sorted(p.name for p in partitions_dir(tmp_path / "parallel.parquet").iterdir()) == ["year=2018", "year=2019"]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from conftest import MATCHES_2019, match_row, write_data_root
+from models import DataHub
+from profiles import build_profiles, load_profile, profiles_fresh
+
+
+def profile_of(root, pid):
+    hub = DataHub(root)
+    build_profiles(hub)
+    return load_profile(hub, pid)
+
+
+def test_career_tables(data_root):
+    profile = profile_of(data_root, 1)
+    s = profile.summary.iloc[0]
+    assert (s["wins"], s["losses"], s["titles"]) == (3, 1, 2)
+    assert s["peak_rank"] == 1 and s["weeks_at_1"] == 2
+    assert {r["surface"]: (r["wins"], r["losses"]) for r in profile.surfaces.to_dict("records")} == {"Hard": (2, 0), "Clay": (0, 1), "Grass": (1, 0)}
+    assert profile.years[["wins", "losses", "titles"]].values.tolist() == [[3, 1, 2]]
+
+
+def test_grand_slam_qualifying_does_not_count(tmp_path):
+    # Same tourney_id as the main draw, level G, like the atp_matches_qual_chall_* files.
+    qualifying = [match_row("2019-0520", 900, "20190527", 4, 1, surface="Clay", level="G", round_="Q1"),
+                  match_row("2019-0520", 901, "20190527", 1, 3, surface="Clay", level="G", round_="Q2")]
+    base = profile_of(write_data_root(tmp_path / "base"), 1)
+    root = write_data_root(tmp_path / "qual", matches={"atp_matches_2019.csv": MATCHES_2019, "atp_matches_qual_chall_2019.csv": qualifying})
+    assert len(DataHub(root).load_matches()) == len(MATCHES_2019) + 2
+    with_qual = profile_of(root, 1)
+    for table in ("summary", "surfaces", "years"):
+        assert with_qual.table(table).equals(base.table(table)), table
+
+
+def test_profiles_go_stale_with_the_sources(data_root):
+    hub = DataHub(data_root)
+    build_profiles(hub)
+    assert profiles_fresh(hub)
+    (data_root / "atp_matches" / "atp_matches_2020.csv").write_text((data_root / "atp_matches" / "atp_matches_2019.csv").read_text())
+    assert not profiles_fresh(DataHub(data_root))
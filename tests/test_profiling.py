@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import profiling
+from profiling import Profiler, run_profiled, span
+
+
+def names(s):
+    return [c.name for c in s.children]
+
+
+def test_spans_nest_and_are_free_without_profiler():
+    with span("noop") as s:
+        assert s.name == ""
+    with Profiler("root", track_memory=False) as prof:
+        with span("load", rows=3):
+            with span("read_csv"):
+                pass
+        with span("build"):
+            pass
+    assert names(prof.root) == ["load", "build"]
+    assert names(prof.root.children[0]) == ["read_csv"]
+    assert prof.root.children[0].rows == 3
+    assert profiling._ACTIVE is None
+
+
+def test_worker_thread_spans_do_not_corrupt_the_main_stack():
+    barrier = threading.Barrier(4)
+
+    def work(i):
+        with span(f"worker_{i}"):
+            barrier.wait(timeout=5)
+            with span("inner"):
+                pass
+        return threading.get_ident()
+
+    with Profiler("root", track_memory=False) as prof:
+        with span("load"):
+            with ThreadPoolExecutor(max_workers=4) as ex:
+                tids = set(ex.map(work, range(4)))
+            with span("after"):
+                pass
+        with span("build"):
+            pass
+
+    assert names(prof.root) == ["load", "build"]
+    load = prof.root.children[0]
+    assert sorted(names(load)) == ["after", "worker_0", "worker_1", "worker_2", "worker_3"]
+    for child in load.children:
+        if child.name.startswith("worker_"):
+            assert names(child) == ["inner"]
+            assert child.tid in tids
+    events = prof.chrome_trace()["traceEvents"]
+    assert {e["tid"] for e in events} >= tids
+
+
+def test_nested_run_profiled_becomes_a_span():
+    out = io.StringIO()
+
+    def inner():
+        with span("stage"):
+            return 42
+
+    def outer():
+        return run_profiled(inner, "inner_run", enabled=True, stream=out)
+
+    assert run_profiled(outer, "outer_run", enabled=True, stream=out) == 42
+    report = out.getvalue()
+    assert report.count("Profil —") == 1
+    assert "inner_run" in report and "stage" in report
+
+
+def test_profiler_refuses_to_nest():
+    with Profiler(track_memory=False):
+        with pytest.raises(RuntimeError):
+            with Profiler(track_memory=False):
+                pass
+    assert profiling._ACTIVE is None
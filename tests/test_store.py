@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+
+import pytest
+
+import store
+import tiebreaker_cli
+from models import DataHub
+
+
+def run_cli(capsys, data_root, *argv):
+    code = tiebreaker_cli.main(["--data-root", str(data_root), *argv])
+    return code, capsys.readouterr().out
+
+
+@pytest.fixture
+def built(data_root):
+    store.build_store(DataHub(data_root), store.default_store_path(data_root))
+    return data_root
+
+
+def test_store_counts_and_read_only_query(built, capsys):
+    code, out = run_cli(capsys, built, "query", "SELECT COUNT(*) AS n FROM matches")
+    assert code == 0 and out.split()[-1] == "7"
+    code, _ = run_cli(capsys, built, "query", "DELETE FROM matches")
+    assert code == 1
+
+
+def test_backends_return_the_same_matches_and_ignore_homonyms(built, capsys):
+    results = {}
+    for backend in ("csv", "store"):
+        code, out = run_cli(capsys, built, "--backend", backend, "match", "--p1", "Ann Alpha", "--p2", "Bob Beta", "--all-years", "--format", "jsonl")
+        assert code == 0
+        results[backend] = [json.loads(line) for line in out.splitlines()]
+    # "Bob Beta" resolves to player 2; the grass final against the homonym (id 5) is not theirs.
+    assert [(r["winner_id"], r["loser_id"]) for r in results["csv"]] == [(1, 2), (2, 1)]
+    assert [(r["tourney_id"], r["match_num"]) for r in results["csv"]] == [(r["tourney_id"], r["match_num"]) for r in results["store"]]
+
+
+def test_store_connections_are_closed(built, capsys, monkeypatch):
+    opened = []
+
+    def tracking_open(path, read_only=False):
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        opened.append(con)
+        return con
+
+    monkeypatch.setattr(store, "open_store", tracking_open)
+    run_cli(capsys, built, "--backend", "store", "rank", "--player", "Ann Alpha")
+    run_cli(capsys, built, "--backend", "store", "match", "--p1", "Ann Alpha", "--p2", "Cid Gamma", "--all-years")
+    run_cli(capsys, built, "query", "SELECT 1")
+    assert len(opened) == 3
+    for con in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            con.execute("SELECT 1")
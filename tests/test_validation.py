@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from validation import ValidationReport, duplicate_mask, validate_matches, validate_rankings
+
+
+def matches(match_nums, tourney_ids=None, winners=None):
+    n = len(match_nums)
+    return pd.DataFrame({
+        "tourney_id": tourney_ids or ["2019-0301"] * n,
+        "tourney_name": ["Open"] * n,
+        "tourney_date": pd.to_datetime(["2019-01-07"] * n).date,
+        "match_num": match_nums,
+        "winner_id": winners or list(range(1, n + 1)),
+        "loser_id": [100 + i for i in range(n)],
+        "winner_name": ["w"] * n,
+        "loser_name": ["l"] * n,
+        "round": ["R32"] * n,
+        "surface": ["Hard"] * n,
+    })
+
+
+def issues(report):
+    return {i.check: i for i in report.issues}
+
+
+def test_duplicate_keys_are_dropped_keeping_the_first():
+    df = matches([1, 2, 1], winners=[1, 2, 3])
+    report = ValidationReport()
+    out = validate_matches(df, report)
+    assert out["winner_id"].tolist() == [1, 2]
+    assert issues(report)["duplicate_keys"].dropped == 1
+    assert not report.ok
+
+
+def test_missing_key_parts_are_not_duplicates():
+    df = matches([np.nan, np.nan, 3, np.nan], tourney_ids=["2019-0301", "2019-0301", "2019-0301", None])
+    assert not duplicate_mask(df, ["tourney_id", "match_num"]).any()
+    report = ValidationReport()
+    out = validate_matches(df, report)
+    assert len(out) == 4
+    found = issues(report)
+    assert "duplicate_keys" not in found
+    assert found["missing_keys"].count == 3 and found["missing_keys"].severity == "warning"
+
+
+def test_complete_keys_still_deduplicated_next_to_missing_ones():
+    df = matches([1, np.nan, 1, np.nan], winners=[1, 2, 3, 4])
+    mask = duplicate_mask(df, ["tourney_id", "match_num"])
+    assert mask.tolist() == [False, False, True, False]
+
+
+def test_bad_player_ids_are_dropped():
+    df = matches([1, 2, 3], winners=[1, 2, 3])
+    df.loc[1, "loser_id"] = 2
+    df.loc[2, "winner_id"] = np.nan
+    report = ValidationReport()
+    assert validate_matches(df, report)["match_num"].tolist() == [1]
+    assert issues(report)["player_ids"].dropped == 2
+
+
+def test_rankings_duplicates_and_ranges():
+    df = pd.DataFrame({
+        "ranking_date": pd.to_datetime(["2019-01-07", "2019-01-07", "2019-01-07", "1900-01-01"]),
+        "player_id": pd.array([1, 1, 2, 3], dtype="Int64"),
+        "rank": pd.array([1, 1, 0, 4], dtype="Int64"),
+    })
+    report = ValidationReport()
+    out = validate_rankings(df, report)
+    assert out["player_id"].tolist() == [1, 2, 3]
+    found = issues(report)
+    assert set(found) == {"duplicate_keys", "rank_range", "ranking_date_range"}
+    assert report.to_dict()["dropped"] == 1